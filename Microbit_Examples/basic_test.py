@@ -12,7 +12,7 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Python_HID_Bridge'))
 
 try:
-    from microbit_hid_bridge import MicrobitHIDBridge
+    from microbit_hid_bridge import MicrobitKeyboardEmuBridge, HIDCommand
 except ImportError:
     print("❌ Could not import bridge. Make sure you're in the right directory.")
     sys.exit(1)
@@ -23,7 +23,11 @@ class DemoTester:
     
     def __init__(self):
         # Create bridge without serial connection
-        self.bridge = MicrobitHIDBridge(debug=True)
+        self.bridge = MicrobitKeyboardEmuBridge(debug=True)
+        
+    def send(self, cmd_type, action, data):
+        """Inject one command as if it had arrived over serial"""
+        self.bridge.process_batch([HIDCommand(cmd_type, action, data)])
         
     def test_keyboard(self):
         """Test keyboard functionality"""
@@ -31,29 +35,17 @@ class DemoTester:
         
         # Test text typing
         print("  - Typing text...")
-        self.bridge.process_command({
-            'type': 'KEY',
-            'action': 'KEY', 
-            'data': 'Hello from micro:bit!'
-        })
+        self.send('KEY', 'TYPE', 'Hello from micro:bit!')
         time.sleep(1)
         
         # Test special keys
         print("  - Pressing Enter...")
-        self.bridge.process_command({
-            'type': 'SPECIAL',
-            'action': 'SPECIAL',
-            'data': 'ENTER'
-        })
+        self.send('KEY', 'PRESS', b'ENTER')
         time.sleep(1)
         
         # Test key combination
         print("  - Key combination (Ctrl+A)...")
-        self.bridge.process_command({
-            'type': 'COMBO',
-            'action': 'COMBO',
-            'data': 'CTRL+A'
-        })
+        self.send('KEY', 'COMBO', b'CTRL+A')
         time.sleep(1)
         
     def test_mouse(self):
@@ -62,36 +54,20 @@ class DemoTester:
         
         # Test mouse movement
         print("  - Moving mouse...")
-        self.bridge.process_command({
-            'type': 'MOUSE',
-            'action': 'MOVE',
-            'data': '50,50'
-        })
+        self.send('MOUSE', 'MOVE', b'50,50')
         time.sleep(0.5)
         
-        self.bridge.process_command({
-            'type': 'MOUSE',
-            'action': 'MOVE',
-            'data': '-25,-25'
-        })
+        self.send('MOUSE', 'MOVE', b'-25,-25')
         time.sleep(0.5)
         
         # Test clicking
         print("  - Left click...")
-        self.bridge.process_command({
-            'type': 'MOUSE',
-            'action': 'CLICK',
-            'data': 'LEFT'
-        })
+        self.send('MOUSE', 'CLICK', b'LEFT')
         time.sleep(0.5)
         
         # Test scrolling
         print("  - Scrolling...")
-        self.bridge.process_command({
-            'type': 'MOUSE',
-            'action': 'SCROLL',
-            'data': '3'
-        })
+        self.send('MOUSE', 'SCROLL', b'3')
         time.sleep(0.5)
         
     def run_demo(self):
@@ -0,0 +1,32 @@
+// Sensor Tilt Mouse - Keyboard Emu for BBC Microbit
+// Paste this into MakeCode JavaScript tab
+//
+// Streams raw accelerometer samples. The Python bridge filters them and
+// turns the tilt into a cursor speed (needs numpy on the computer).
+// Tune it with --sensor-profile smooth, precise or fast.
+
+// Initialize Keyboard Emu system
+serialHID.initialize()
+basic.showString("HOLD")
+
+// Hold still while the bridge takes the rest position, then tilt to move
+serialMouse.streamTilt(20, 4)
+basic.showIcon(IconNames.Target)
+
+// Button A = Left Click
+input.onButtonPressed(Button.A, function ()
+{
+    serialMouse.leftClick()
+})
+
+// Button B = Right Click
+input.onButtonPressed(Button.B, function ()
+{
+    serialMouse.rightClick()
+})
+
+// A+B = Take the current tilt as the new rest position
+input.onButtonPressed(Button.AB, function ()
+{
+    serialMouse.recalibrateTilt()
+})
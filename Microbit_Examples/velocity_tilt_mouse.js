@@ -0,0 +1,66 @@
+// Velocity Tilt Mouse - Keyboard Emu for BBC Microbit
+// Paste this into MakeCode JavaScript tab
+//
+// Instead of sending a move every 50 ms, this sends the cursor speed.
+// The Python bridge moves the cursor smoothly until the speed changes.
+
+// Initialize Keyboard Emu system
+serialHID.initialize()
+basic.showString("READY")
+
+// Settings
+let maxSpeed = 400   // pixels per second at full tilt
+let threshold = 150
+
+// Main mouse movement loop
+basic.forever(function ()
+{
+    let tiltX = input.acceleration(Dimension.X)
+    let tiltY = input.acceleration(Dimension.Y)
+
+    let speedX = 0
+    let speedY = 0
+
+    if (Math.abs(tiltX) > threshold) {
+        speedX = Math.map(tiltX, -1000, 1000, -maxSpeed, maxSpeed)
+    }
+
+    if (Math.abs(tiltY) > threshold) {
+        speedY = Math.map(tiltY, -1000, 1000, maxSpeed, -maxSpeed)
+    }
+
+    // Round to steps of 20 px/s so small wobbles don't count as a change
+    speedX = Math.round(speedX / 20) * 20
+    speedY = Math.round(speedY / 20) * 20
+
+    // Only changes (and a keep-alive) go over the serial link
+    serialMouse.setVelocity(speedX, speedY)
+
+    // Visual feedback
+    basic.clearScreen()
+    led.plot(2, 2)
+    if (speedX > 0) led.plot(3, 2)
+    if (speedX < 0) led.plot(1, 2)
+    if (speedY > 0) led.plot(2, 1)
+    if (speedY < 0) led.plot(2, 3)
+
+    basic.pause(50)
+})
+
+// Button A = Left Click
+input.onButtonPressed(Button.A, function ()
+{
+    serialMouse.leftClick()
+})
+
+// Button B = Right Click
+input.onButtonPressed(Button.B, function ()
+{
+    serialMouse.rightClick()
+})
+
+// Shake = Double Click
+input.onGesture(Gesture.Shake, function ()
+{
+    serialMouse.doubleClick()
+})
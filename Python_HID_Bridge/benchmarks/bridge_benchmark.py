@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark for the micro:bit Keyboard Emu Bridge (Linux and macOS)
+
+A fake micro:bit writes command streams into the master end of a pty while
+MicrobitKeyboardEmuBridge reads the slave end, exactly as it would read a
+real board. Input goes to the null backend, so nothing reaches the desktop.
+Every scenario runs twice:
+
+    burst   - all commands written as fast as the pty takes them
+    paced   - commands written at --rate per second, like a busy micro:bit
+
+and reports commands/s, ingest-to-inject latency (pty write to the end of
+the batch that injected the command) and the CPU time used by the whole
+benchmark process per wall-clock second.
+
+Results can be saved as JSON and compared against an earlier run:
+
+    python benchmarks/bridge_benchmark.py --json before.json
+    python benchmarks/bridge_benchmark.py --compare before.json
+
+Usage:
+    python benchmarks/bridge_benchmark.py [--commands 20000] [--rate 1000] [--asyncio]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from microbit_hid_bridge import (AsyncMicrobitKeyboardEmuBridge, MicrobitKeyboardEmuBridge,
+                                 RecordingBackend)
+
+# Commands written to the pty per os.write() in burst mode
+BURST_CHUNK = 64
+
+
+def tilt_commands(count: int, rng: random.Random) -> List[bytes]:
+    """Tilt-mouse stream: small moves with the odd click and scroll"""
+    lines = []
+    for i in range(count):
+        # Every 200th is also a 50th, so test it first
+        if i % 200 == 199:
+            lines.append(b"HID:MOUSE:SCROLL:%d\n" % rng.choice((-2, -1, 1, 2)))
+        elif i % 50 == 49:
+            lines.append(b"HID:MOUSE:CLICK:LEFT\n")
+        else:
+            lines.append(b"HID:MOUSE:MOVE:%d,%d\n" % (rng.randint(-8, 8), rng.randint(-8, 8)))
+    return lines
+
+
+def type_commands(count: int, rng: random.Random) -> List[bytes]:
+    """Long TYPE strings, like a micro:bit logging sensor readings"""
+    words = ["micro:bit", "temperature", "light", "compass", "heading", "north", "level", "ok"]
+    lines = []
+    for i in range(count):
+        text = " ".join(rng.choice(words) for _ in range(12))
+        lines.append(b"HID:KEY:TYPE:%d %s\n" % (i, text.encode()))
+    return lines
+
+
+def combo_commands(count: int, rng: random.Random) -> List[bytes]:
+    """Shortcut bursts mixed with single key presses"""
+    choices = [
+        b"HID:KEY:COMBO:CTRL+C\n", b"HID:KEY:COMBO:CTRL+V\n", b"HID:KEY:COMBO:ALT+TAB\n",
+        b"HID:KEY:COMBO:CTRL+SHIFT+T\n", b"HID:KEY:PRESS:ENTER\n", b"HID:KEY:PRESS:a\n",
+    ]
+    return [rng.choice(choices) for _ in range(count)]
+
+
+def mixed_commands(count: int, rng: random.Random) -> List[bytes]:
+    """All of the above interleaved"""
+    generators = (tilt_commands, tilt_commands, tilt_commands, combo_commands, type_commands)
+    lines = []
+    while len(lines) < count:
+        lines.extend(rng.choice(generators)(min(20, count - len(lines)), rng))
+    return lines
+
+
+SCENARIOS = {
+    'tilt': tilt_commands,
+    'type': type_commands,
+    'combo': combo_commands,
+    'mixed': mixed_commands,
+}
+
+
+def make_timed_bridge(base: type) -> type:
+    """Subclass a bridge so it records when each batch finished injecting"""
+
+    class TimedBridge(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.completed: List[Tuple[float, int]] = []
+
+        def process_batch(self, commands):
+            super().process_batch(commands)
+            self.completed.append((time.perf_counter(), len(commands)))
+
+    return TimedBridge
+
+
+def answer_pings(master: int, stop: threading.Event) -> None:
+    """Fake micro:bit side: drain what the bridge sends and answer HID:PING"""
+    import select
+
+    while not stop.is_set():
+        if not select.select([master], [], [], 0.05)[0]:
+            continue
+        try:
+            data = os.read(master, 4096)
+        except OSError:
+            return
+        if b"HID:PING" in data:
+            os.write(master, b"HID:PONG\n")
+
+
+def write_commands(master: int, lines: List[bytes], rate: float) -> List[float]:
+    """Write lines to the pty, returning the perf_counter time each one was written"""
+    written = []
+    if rate:
+        period = 1.0 / rate
+        start = time.perf_counter()
+        for i, line in enumerate(lines):
+            delay = start + i * period - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            written.append(time.perf_counter())
+            os.write(master, line)
+        return written
+
+    for offset in range(0, len(lines), BURST_CHUNK):
+        chunk = lines[offset:offset + BURST_CHUNK]
+        now = time.perf_counter()
+        view = memoryview(b"".join(chunk))
+        while view:
+            view = view[os.write(master, view):]
+        written.extend([now] * len(chunk))
+    return written
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def run_once(bridge_class: type, lines: List[bytes], rate: float, timeout: float) -> Dict[str, Any]:
+    """Run one command stream through a fresh bridge and measure it"""
+    import pty
+    import tty
+
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    backend = RecordingBackend()
+    bridge = bridge_class(port=os.ttyname(slave), auto_reconnect=False, backend=backend)
+    stop = threading.Event()
+    pinger = threading.Thread(target=answer_pings, args=(master, stop), daemon=True)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        pinger.start()
+        runner = threading.Thread(target=bridge.run, daemon=True)
+        runner.start()
+
+        # Wait for the link to come up before starting the clock
+        deadline = time.monotonic() + 5.0
+        while time.monotonic() < deadline and not (bridge.links and bridge.links[0].ready.is_set()):
+            time.sleep(0.01)
+        stop.set()
+        pinger.join()
+
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        written = write_commands(master, lines, rate)
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and sum(count for _, count in bridge.completed) < len(lines):
+            time.sleep(0.005)
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+        bridge.running = False
+        os.close(master)
+        runner.join(timeout=5.0)
+        os.close(slave)
+
+    # Commands are injected in order, so walk the batches alongside the writes
+    latencies = []
+    index = 0
+    for finished, count in bridge.completed:
+        for written_at in written[index:index + count]:
+            latencies.append((finished - written_at) * 1000)
+        index += count
+    latencies.sort()
+
+    done = len(latencies)
+    result = {
+        'commands': len(lines),
+        'injected': done,
+        'batches': len(bridge.completed),
+        'backend_events': backend.count,
+        'wall_s': round(wall, 4),
+        'commands_per_s': round(done / wall, 1) if wall else 0.0,
+        'cpu_percent': round(100.0 * cpu / wall, 1) if wall else 0.0,
+    }
+    if latencies:
+        result.update({
+            'latency_p50_ms': round(percentile(latencies, 0.50), 3),
+            'latency_p99_ms': round(percentile(latencies, 0.99), 3),
+            'latency_max_ms': round(latencies[-1], 3),
+        })
+    return result
+
+
+def report(name: str, mode: str, result: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> None:
+    """Print one result line, with the change against a previous run if there is one"""
+    line = (f"  {name:<6} {mode:<6} {result['commands_per_s']:>11,.0f} commands/s"
+            f"  p50 {result.get('latency_p50_ms', 0):8.3f} ms"
+            f"  p99 {result.get('latency_p99_ms', 0):8.3f} ms"
+            f"  cpu {result['cpu_percent']:5.1f}%"
+            f"  batches {result['batches']}")
+    if result['injected'] < result['commands']:
+        line += f"  (only {result['injected']}/{result['commands']} injected)"
+    print(line)
+
+    if previous:
+        def change(key: str) -> str:
+            old, new = previous.get(key), result.get(key)
+            if not old or new is None:
+                return "   n/a"
+            return f"{100.0 * (new - old) / old:+6.1f}%"
+        print(f"  {'':<6} {'vs':<6} {change('commands_per_s'):>11}"
+              f"             {change('latency_p50_ms'):>8}"
+              f"      {change('latency_p99_ms'):>8}"
+              f"      {change('cpu_percent'):>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end bridge benchmark over a pty")
+    parser.add_argument("--commands", type=int, default=20000, help="Commands per burst run")
+    parser.add_argument("--paced-commands", type=int, default=2000, help="Commands per paced run")
+    parser.add_argument("--rate", type=float, default=1000, help="Commands per second in paced runs")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append",
+                        help="Scenario to run, can be repeated (default: all)")
+    parser.add_argument("--asyncio", action="store_true", help="Benchmark the asyncio bridge core")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the command streams")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for one run to finish")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare against results from an earlier --json run")
+    args = parser.parse_args()
+
+    if sys.platform == "win32":
+        print("The pty-based benchmark needs Linux or macOS")
+        return
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f).get('scenarios', {})
+
+    base = AsyncMicrobitKeyboardEmuBridge if args.asyncio else MicrobitKeyboardEmuBridge
+    bridge_class = make_timed_bridge(base)
+    results = {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'bridge': 'asyncio' if args.asyncio else 'threaded',
+        'rate': args.rate,
+        'scenarios': {},
+    }
+
+    print(f"Bridge benchmark ({results['bridge']} bridge, null backend, pty)")
+    for name in args.scenario or sorted(SCENARIOS):
+        generate = SCENARIOS[name]
+        burst = run_once(bridge_class, generate(args.commands, random.Random(args.seed)), 0, args.timeout)
+        paced = run_once(bridge_class, generate(args.paced_commands, random.Random(args.seed)), args.rate,
+                         args.timeout)
+        results['scenarios'][name] = {'burst': burst, 'paced': paced}
+
+        old = previous.get(name, {})
+        report(name, "burst", burst, old.get('burst'))
+        report(name, "paced", paced, old.get('paced'))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Key resolution microbenchmark for the micro:bit Keyboard Emu Bridge
+
+Compares the original per-press parsing of PRESS and COMBO payloads (decode,
+split("+"), strip().upper() and separate special/modifier lookups) against
+the bridge's LRU-cached resolve_key() / resolve_combo() on the same payload
+mix. Only key resolution is timed, nothing is injected.
+
+Usage:
+    python benchmarks/key_benchmark.py [--presses 200000] [--repeat 5]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from microbit_hid_bridge import MicrobitKeyboardEmuBridge, RecordingBackend
+
+# Shortcut-heavy traffic with some single keys and a typo
+PAYLOAD_MIX = [
+    (b"COMBO", b"CTRL+C"),
+    (b"COMBO", b"CTRL+V"),
+    (b"COMBO", b"ALT+TAB"),
+    (b"COMBO", b"CTRL+SHIFT+T"),
+    (b"COMBO", b"CTRL+ALT+DELETE"),
+    (b"PRESS", b"ENTER"),
+    (b"PRESS", b"a"),
+    (b"PRESS", b"PAGE_DOWN"),
+    (b"PRESS", b"NOPE"),
+]
+
+
+def legacy_parse_single_key(bridge: MicrobitKeyboardEmuBridge, key_str: str) -> Optional[str]:
+    """The original parse_single_key, kept here as the baseline"""
+    if not key_str:
+        return None
+
+    key_upper = key_str.upper()
+
+    if key_upper in bridge.special_keys:
+        return bridge.special_keys[key_upper]
+
+    if key_upper in bridge.modifier_keys:
+        return bridge.modifier_keys[key_upper]
+
+    if len(key_str) == 1:
+        return key_str.lower()
+
+    return None
+
+
+def legacy_parse_combo(bridge: MicrobitKeyboardEmuBridge, combo: str) -> List[str]:
+    """The original key list building from handle_key_combination"""
+    keys_to_press = []
+    for part in combo.split("+"):
+        part = part.strip().upper()
+        if part in bridge.modifier_keys:
+            keys_to_press.append(bridge.modifier_keys[part])
+        elif part in bridge.special_keys:
+            keys_to_press.append(bridge.special_keys[part])
+        elif len(part) == 1:
+            keys_to_press.append(part.lower())
+    return keys_to_press
+
+
+def bench_legacy(bridge: MicrobitKeyboardEmuBridge, payloads) -> float:
+    """Decode and parse every payload, as handle_keyboard_command used to"""
+    start = time.perf_counter()
+    for action, data in payloads:
+        if action == b"PRESS":
+            legacy_parse_single_key(bridge, data.decode('ascii', errors='ignore').strip())
+        else:
+            legacy_parse_combo(bridge, data.decode('ascii', errors='ignore'))
+    return time.perf_counter() - start
+
+
+def bench_cached(bridge: MicrobitKeyboardEmuBridge, payloads) -> float:
+    """Resolve every payload through the bridge's LRU caches"""
+    resolve_key = bridge.resolve_key
+    resolve_combo = bridge.resolve_combo
+    start = time.perf_counter()
+    for action, data in payloads:
+        if action == b"PRESS":
+            resolve_key(data)
+        else:
+            resolve_combo(data)
+    return time.perf_counter() - start
+
+
+def best_of(repeat: int, func, *args) -> float:
+    """Fastest of several runs with the GC paused, like timeit does"""
+    gc.disable()
+    try:
+        return min(func(*args) for _ in range(repeat))
+    finally:
+        gc.enable()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Key resolution microbenchmark")
+    parser.add_argument("--presses", type=int, default=200000, help="Number of PRESS/COMBO payloads to resolve")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per resolver, best one is reported")
+    args = parser.parse_args()
+
+    bridge = MicrobitKeyboardEmuBridge(backend=RecordingBackend())
+    payloads = [PAYLOAD_MIX[i % len(PAYLOAD_MIX)] for i in range(args.presses)]
+
+    legacy = best_of(args.repeat, bench_legacy, bridge, payloads)
+    cached = best_of(args.repeat, bench_cached, bridge, payloads)
+
+    print(f"Key resolution: {args.presses} payloads, {len(PAYLOAD_MIX)} distinct")
+    print(f"  legacy parsing:  {legacy / args.presses * 1e9:8.0f} ns per payload")
+    print(f"  LRU cache:       {cached / args.presses * 1e9:8.0f} ns per payload")
+    print(f"  speedup:         {legacy / cached:8.2f}x")
+    print(f"  {bridge.resolve_combo.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+"""
+Software micro:bit for load-testing the Keyboard Emu Bridge (Linux and macOS)
+
+Each simulated board owns a pty and puts on it what main.ts, mouse.ts and
+working_tilt_mouse.js would put on the USB serial line:
+
+    - the HID:INIT:SYSTEM baud handshake, optional HID:INIT:MODE:BIN and
+      HID:INIT:CREDIT, and HID:PONG answers to the bridge's HID:PING
+    - the transmit queue: credit-paced, HID:BATCH packing, and the 10 ms
+      pause per command while no credit has been granted
+    - with --legacy, the original extension instead: a plain HID:INIT:SYSTEM
+      at 9600 baud and a 200 ms pause, then a blocking sendCommand with a
+      fixed 10 ms pause, no binary mode and no credits
+    - UART byte timing: 10 bits per byte at the negotiated baud rate, and
+      garbage both ways while the bridge's end of the pty is set to a
+      different rate than the board's
+    - the tilt loop of working_tilt_mouse.js fed by a synthetic accelerometer
+      trace, with button clicks and shake double-clicks at random
+
+By default every board gets its own in-process MicrobitKeyboardEmuBridge on
+the null backend and a summary is printed at the end. With --no-bridge the
+pty paths are printed instead, for a bridge started by hand:
+
+    python benchmarks/microbit_simulator.py --no-bridge
+    python microbit_hid_bridge.py --port /dev/pts/3 --stats
+
+Usage:
+    python benchmarks/microbit_simulator.py [--boards 8] [--duration 10] [--trace circle]
+"""
+
+import argparse
+import collections
+import contextlib
+import io
+import math
+import os
+import random
+import select
+import sys
+import termios
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from microbit_hid_bridge import (BAUD_RATES, DEFAULT_BAUD_RATE, MicrobitKeyboardEmuBridge, RecordingBackend,
+                                 encode_binary_frame)
+
+# Constants from main.ts
+MAX_BAUD_RATE = 115200
+BAUD_REPLY_TIMEOUT = 0.3
+BAUD_CONFIRM_TIMEOUT = 0.5
+CREDIT_TIMEOUT = 1.0
+FALLBACK_PAUSE = 0.010
+# The original initialize(): HID:INIT:SYSTEM at 9600 baud, then this pause
+LEGACY_INIT_PAUSE = 0.200
+TX_QUEUE_SIZE = 32
+MAX_BATCH_LENGTH = 96
+OP_RAW = 0x7F
+
+# termios speed constant -> baud rate, to see what the bridge set on its end
+TERMIOS_RATES = {getattr(termios, f"B{rate}"): rate for rate in BAUD_RATES if hasattr(termios, f"B{rate}")}
+
+# Binary opcodes from mouse.ts
+OP_MOVE = 0x10
+OP_CLICK = 0x12
+BUTTON_IDS = ("LEFT", "RIGHT", "MIDDLE", "ALL")
+
+# working_tilt_mouse.js
+TILT_SPEED = 4
+TILT_THRESHOLD = 150
+TILT_LOOP_PAUSE = 0.050
+DOUBLE_CLICK_PAUSE = 0.050
+
+
+def circle_trace(rng: random.Random) -> Callable[[float], Tuple[float, float]]:
+    """Board tilted 600 mg and turned round once every 4 seconds"""
+    phase = rng.uniform(0, 2 * math.pi)
+    return lambda t: (600 * math.cos(phase + t * math.pi / 2), 600 * math.sin(phase + t * math.pi / 2))
+
+
+def sway_trace(rng: random.Random) -> Callable[[float], Tuple[float, float]]:
+    """Side-to-side rocking with a little hand tremor"""
+    period = rng.uniform(2.0, 4.0)
+    return lambda t: (700 * math.sin(2 * math.pi * t / period) + rng.gauss(0, 40), rng.gauss(0, 40))
+
+
+def jitter_trace(rng: random.Random) -> Callable[[float], Tuple[float, float]]:
+    """Held nearly flat: noise around the dead zone threshold"""
+    return lambda t: (rng.gauss(0, 180), rng.gauss(0, 180))
+
+
+def random_trace(rng: random.Random) -> Callable[[float], Tuple[float, float]]:
+    """Random walk over the whole +-1000 mg range"""
+    position = [0.0, 0.0]
+
+    def sample(t: float) -> Tuple[float, float]:
+        for axis in range(2):
+            position[axis] = max(-1000.0, min(1000.0, position[axis] + rng.gauss(0, 80)))
+        return position[0], position[1]
+    return sample
+
+
+TRACES = {
+    'circle': circle_trace,
+    'sway': sway_trace,
+    'jitter': jitter_trace,
+    'random': random_trace,
+}
+
+
+def js_number(value: float) -> str:
+    """Format a number the way MakeCode's Array.join() does"""
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def js_round(value: float) -> int:
+    """Math.round(): halves round up"""
+    return int(math.floor(value + 0.5))
+
+
+class SimulatedMicrobit:
+    """One simulated board running working_tilt_mouse.js on the extension"""
+
+    def __init__(self, trace: Callable[[float], Tuple[float, float]], rng: random.Random,
+                 binary: bool = False, legacy: bool = False, max_baud_rate: int = MAX_BAUD_RATE,
+                 click_interval: float = 2.0, loop_pause: float = TILT_LOOP_PAUSE):
+        import pty
+        import tty
+
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+        self.trace = trace
+        self.rng = rng
+        self.use_binary = binary
+        self.legacy = legacy
+        self.max_baud_rate = max_baud_rate
+        self.click_interval = click_interval
+        self.loop_pause = loop_pause
+        self.running = False
+        self.threads: List[threading.Thread] = []
+
+        # Link state, as in main.ts
+        self.baud_rate = DEFAULT_BAUD_RATE
+        self.binary_mode = False
+        self.initialized = False
+        self.handshaking = False
+        self.write_lock = threading.Lock()
+        self.wire_free = 0.0
+        self.replies: "collections.deque[str]" = collections.deque()
+        self.reply_event = threading.Event()
+
+        # Credit flow control and the transmit queue
+        self.state = threading.Condition()
+        self.credit_flow = False
+        self.credits_sent = 0
+        self.credit_limit = 0
+        self.tx_queue: "collections.deque[bytes]" = collections.deque()
+        self.move_remainder = (0.0, 0.0)
+
+        # Counters for the summary
+        self.commands = 0
+        self.writes = 0
+        self.bytes_out = 0
+        self.credit_waits = 0
+        self.queue_full_waits = 0
+
+    # --- serial line ---------------------------------------------------
+
+    def rate_mismatch(self) -> bool:
+        """True while the two ends of the line run at different baud rates"""
+        try:
+            speed = termios.tcgetattr(self.slave)[5]
+        except termios.error:
+            return False
+        return TERMIOS_RATES.get(speed, self.baud_rate) != self.baud_rate
+
+    def write(self, data: bytes) -> None:
+        """Write bytes at UART speed: 10 bits per byte at the current rate"""
+        if self.rate_mismatch():
+            # What a UART at the wrong rate makes of it: no line or frame ends
+            data = b"\xf0" * len(data)
+        with self.write_lock:
+            now = time.perf_counter()
+            self.wire_free = max(self.wire_free, now) + len(data) * 10.0 / self.baud_rate
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self.master, view):]
+            self.writes += 1
+            self.bytes_out += len(data)
+            delay = self.wire_free - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def write_line(self, line: str) -> None:
+        self.write(line.encode() + b"\n")
+
+    def read_bridge(self) -> None:
+        """serial.onDataReceived(NewLine): answer PINGs, collect CREDITs and replies"""
+        buffer = b""
+        while self.running:
+            try:
+                if not select.select([self.master], [], [], 0.05)[0]:
+                    continue
+                data = os.read(self.master, 4096)
+            except OSError:
+                return
+            if self.rate_mismatch():
+                buffer = b""
+                continue
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for raw in lines:
+                line = raw.decode('utf-8', errors='ignore').strip()
+                if line == "HID:PING":
+                    # A new bridge connection is always text, redo the handshake
+                    self.binary_mode = False
+                    self.write_line("HID:PONG")
+                    if self.initialized and not self.legacy and not self.handshaking:
+                        self.handshaking = True
+                        self.spawn(self.rehandshake)
+                elif line.startswith("HID:CREDIT:"):
+                    with self.state:
+                        self.credit_limit = max(self.credit_limit, int(line[11:]))
+                        self.credit_flow = True
+                        self.state.notify_all()
+                elif line:
+                    self.replies.append(line)
+                    self.reply_event.set()
+
+    def wait_for_reply(self, prefix: str, timeout: float) -> str:
+        deadline = time.perf_counter() + timeout
+        while True:
+            while self.replies:
+                reply = self.replies.popleft()
+                if reply.startswith(prefix):
+                    return reply
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return ""
+            self.reply_event.wait(remaining)
+            self.reply_event.clear()
+
+    # --- serialHID.initialize() ----------------------------------------
+
+    def negotiate_baud_rate(self, probe_rate: int) -> bool:
+        self.baud_rate = probe_rate
+        self.write_line("")
+        self.write_line(f"HID:INIT:SYSTEM:{self.max_baud_rate}")
+        reply = self.wait_for_reply("HID:BAUD:", BAUD_REPLY_TIMEOUT)
+        if not reply:
+            return False
+
+        self.baud_rate = int(reply[9:])
+        self.write_line("")
+        self.write_line(f"HID:INIT:BAUD:{self.baud_rate}")
+        if not self.wait_for_reply("HID:BAUD:OK", BAUD_CONFIRM_TIMEOUT):
+            self.baud_rate = DEFAULT_BAUD_RATE
+        return True
+
+    def initialize(self) -> None:
+        if self.legacy:
+            # No baud, binary or credit handshake, the link stays at 9600
+            self.write_line("HID:INIT:SYSTEM")
+            time.sleep(LEGACY_INIT_PAUSE)
+            self.initialized = True
+            return
+
+        if not self.negotiate_baud_rate(DEFAULT_BAUD_RATE) and not self.negotiate_baud_rate(MAX_BAUD_RATE):
+            self.baud_rate = DEFAULT_BAUD_RATE
+
+        self.binary_mode = self.use_binary and self.negotiate_binary_mode()
+        self.request_credits()
+        self.initialized = True
+
+    def negotiate_binary_mode(self) -> bool:
+        self.write_line("HID:INIT:MODE:BIN")
+        if not self.wait_for_reply("HID:MODE:BIN", BAUD_REPLY_TIMEOUT):
+            return False
+        self.write(b"\x00")
+        return True
+
+    def rehandshake(self) -> None:
+        """A bridge (re)connected: agree the protocol and credits again"""
+        self.binary_mode = self.use_binary and self.negotiate_binary_mode()
+        self.request_credits()
+        with self.state:
+            self.handshaking = False
+            self.state.notify_all()
+
+    # --- transmit queue and credits ------------------------------------
+
+    def request_credits(self) -> None:
+        with self.state:
+            self.credit_flow = False
+            self.credits_sent = 0
+            self.credit_limit = 0
+        if self.binary_mode:
+            self.write(encode_binary_frame(OP_RAW, (), b"HID:INIT:CREDIT"))
+        else:
+            self.write_line("HID:INIT:CREDIT")
+
+    def wait_for_credit(self) -> None:
+        """Spend one credit, waiting for a grant if none are left"""
+        with self.state:
+            if self.credit_flow and self.credits_sent >= self.credit_limit:
+                self.credit_waits += 1
+                granted = self.state.wait_for(
+                    lambda: self.credits_sent < self.credit_limit or not self.credit_flow, CREDIT_TIMEOUT)
+            else:
+                granted = True
+        if not granted:
+            # Grant lost or bridge gone: start over, pausing meanwhile
+            self.request_credits()
+        with self.state:
+            self.credits_sent += 1
+
+    def take_spare_credit(self) -> bool:
+        with self.state:
+            if self.credit_flow and self.credits_sent < self.credit_limit:
+                self.credits_sent += 1
+                return True
+            return False
+
+    def send(self, line: str, frame: Optional[bytes]) -> None:
+        """serialHID.sendCommand / sendFrame"""
+        self.commands += 1
+        if self.legacy:
+            # Original extension: write, then a fixed pause, in the caller
+            self.write(frame if self.binary_mode else line.encode() + b"\n")
+            time.sleep(FALLBACK_PAUSE)
+            return
+
+        with self.state:
+            if len(self.tx_queue) >= TX_QUEUE_SIZE:
+                self.queue_full_waits += 1
+                self.state.wait_for(lambda: len(self.tx_queue) < TX_QUEUE_SIZE or not self.running)
+            self.tx_queue.append(frame if self.binary_mode else line.encode())
+            self.state.notify_all()
+
+    def transmit(self) -> None:
+        """The transmit fiber: drain the queue, batching while credits last"""
+        while self.running:
+            with self.state:
+                if not self.state.wait_for(lambda: (self.tx_queue and not self.handshaking) or not self.running,
+                                           0.1) or not self.running:
+                    continue
+            self.wait_for_credit()
+            with self.state:
+                first = self.tx_queue.popleft()
+                self.state.notify_all()
+
+            # Frames queued before a bridge restart still go out as frames
+            if first.endswith(b"\x00"):
+                data = first
+                while True:
+                    with self.state:
+                        if (not self.tx_queue or not self.tx_queue[0].endswith(b"\x00")
+                                or len(data) + len(self.tx_queue[0]) > MAX_BATCH_LENGTH):
+                            break
+                    if not self.take_spare_credit():
+                        break
+                    with self.state:
+                        data += self.tx_queue.popleft()
+                        self.state.notify_all()
+                self.write(data)
+            else:
+                line = first
+                if line.startswith(b"HID:") and b";" not in line:
+                    batch = line[4:]
+                    packed = 1
+                    while True:
+                        with self.state:
+                            if not self.tx_queue:
+                                break
+                            following = self.tx_queue[0]
+                        if (not following.startswith(b"HID:") or following.endswith(b"\x00") or b";" in following
+                                or 10 + len(batch) + len(following) - 3 > MAX_BATCH_LENGTH
+                                or not self.take_spare_credit()):
+                            break
+                        with self.state:
+                            self.tx_queue.popleft()
+                            self.state.notify_all()
+                        batch += b";" + following[4:]
+                        packed += 1
+                    if packed > 1:
+                        line = b"HID:BATCH:" + batch
+                self.write(line + b"\n")
+
+            if not self.credit_flow:
+                time.sleep(FALLBACK_PAUSE)
+
+    # --- mouse.ts and the tilt program ---------------------------------
+
+    def move_mouse(self, x: float, y: float) -> None:
+        if not self.binary_mode:
+            self.send(f"HID:MOUSE:MOVE:{js_number(x)},{js_number(y)}", None)
+            return
+        # sendMove() in mouse.ts: frames carry whole pixels, the rest is carried over
+        x += self.move_remainder[0]
+        y += self.move_remainder[1]
+        dx, dy = js_round(x), js_round(y)
+        self.move_remainder = (x - dx, y - dy)
+        if dx or dy:
+            self.send("", encode_binary_frame(OP_MOVE, (dx, dy)))
+
+    def click_mouse(self, button: str) -> None:
+        frame = encode_binary_frame(OP_CLICK, (BUTTON_IDS.index(button),)) if self.binary_mode else None
+        self.send(f"HID:MOUSE:CLICK:{button}", frame)
+
+    def tilt_loop(self) -> None:
+        """The basic.forever tilt loop from working_tilt_mouse.js"""
+        started = time.perf_counter()
+        while self.running:
+            tilt_x, tilt_y = self.trace(time.perf_counter() - started)
+            move_x = move_y = 0.0
+            if abs(tilt_x) > TILT_THRESHOLD:
+                move_x = tilt_x * TILT_SPEED / 1000
+            if abs(tilt_y) > TILT_THRESHOLD:
+                move_y = -tilt_y * TILT_SPEED / 1000
+            if move_x or move_y:
+                self.move_mouse(move_x, move_y)
+            time.sleep(self.loop_pause)
+
+    def button_presses(self) -> None:
+        """Button A/B clicks and shake double-clicks at random"""
+        while self.running:
+            time.sleep(self.rng.expovariate(1.0 / self.click_interval))
+            if not self.running:
+                return
+            choice = self.rng.random()
+            if choice < 0.6:
+                self.click_mouse("LEFT")
+            elif choice < 0.9:
+                self.click_mouse("RIGHT")
+            else:
+                self.click_mouse("LEFT")
+                time.sleep(DOUBLE_CLICK_PAUSE)
+                self.click_mouse("LEFT")
+
+    # --- lifecycle -----------------------------------------------------
+
+    def start(self) -> None:
+        """Power on: start the serial handler, initialize, then run the program"""
+        self.running = True
+        self.spawn(self.read_bridge)
+        self.initialize()
+        if not self.legacy:
+            self.spawn(self.transmit)
+        self.spawn(self.tilt_loop)
+        self.spawn(self.button_presses)
+
+    def spawn(self, target: Callable[[], None]) -> None:
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def stop(self) -> None:
+        self.running = False
+        with self.state:
+            self.state.notify_all()
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+        os.close(self.master)
+        os.close(self.slave)
+
+
+class CountingBridge(MicrobitKeyboardEmuBridge):
+    """Bridge that counts the input commands it injects"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.injected = 0
+
+    def process_batch(self, commands):
+        super().process_batch(commands)
+        self.injected += len(commands)
+
+
+def run_bridges(boards: List[SimulatedMicrobit], duration: float,
+                start_delay: float = 0.0) -> List[Dict[str, float]]:
+    """Serve every board from its own bridge for duration seconds
+
+    start_delay holds the boards off that long after their bridges open the
+    port, like a program that runs other setup before serialHID.initialize()
+    """
+    bridges = []
+    for board in boards:
+        bridge = CountingBridge(port=board.port, auto_reconnect=False, backend=RecordingBackend())
+        thread = threading.Thread(target=bridge.run, daemon=True)
+        thread.start()
+        bridges.append((bridge, thread))
+
+    # Boards power on once their bridge is listening, like plugging them in
+    while not all(bridge.links for bridge, _ in bridges):
+        time.sleep(0.01)
+    time.sleep(start_delay)
+    for board in boards:
+        board.start()
+
+    time.sleep(duration)
+    for board in boards:
+        board.running = False
+    time.sleep(0.5)
+
+    results = []
+    for (bridge, thread), board in zip(bridges, boards):
+        link = bridge.links[0]
+        results.append({
+            'received': bridge.injected,
+            'malformed': link.malformed_lines + link.text_framer.malformed + link.dropped_frames,
+            'baud': link.baud_rate,
+            'credits': link.credit_flow,
+        })
+        bridge.running = False
+    for board in boards:
+        board.stop()
+    for bridge, thread in bridges:
+        thread.join(timeout=5.0)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated micro:bits over ptys")
+    parser.add_argument("--boards", type=int, default=1, help="Number of simulated micro:bits")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--trace", choices=sorted(TRACES), default="circle", help="Accelerometer trace")
+    parser.add_argument("--click-interval", type=float, default=2.0, help="Mean seconds between button presses")
+    parser.add_argument("--loop-ms", type=float, default=TILT_LOOP_PAUSE * 1000,
+                        help="Pause in the tilt loop (50 in working_tilt_mouse.js), lower for stress runs")
+    parser.add_argument("--binary", action="store_true", help="Use the compact binary protocol")
+    parser.add_argument("--legacy", action="store_true",
+                        help="Behave like the original extension: 9600 baud, blocking sends with a 10 ms pause")
+    parser.add_argument("--max-baud", type=int, default=MAX_BAUD_RATE, help="Fastest rate the boards offer")
+    parser.add_argument("--start-delay", type=float, default=0.0,
+                        help="Seconds between the bridge opening the port and the boards starting")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for traces and buttons")
+    parser.add_argument("--no-bridge", action="store_true",
+                        help="Only print the pty paths and run until Ctrl+C")
+    args = parser.parse_args()
+
+    if sys.platform == "win32":
+        print("The simulator needs ptys, so Linux or macOS")
+        return
+
+    rng = random.Random(args.seed)
+    boards = []
+    for _ in range(args.boards):
+        board_rng = random.Random(rng.random())
+        boards.append(SimulatedMicrobit(TRACES[args.trace](board_rng), board_rng, binary=args.binary,
+                                        legacy=args.legacy, max_baud_rate=args.max_baud,
+                                        click_interval=args.click_interval, loop_pause=args.loop_ms / 1000))
+
+    if args.no_bridge:
+        for board in boards:
+            print(f"Simulated micro:bit on {board.port}")
+        print("Start the bridge with --port <path>, the boards power on once it listens. Ctrl+C to stop.")
+        try:
+            # A board's first handshake needs the bridge, so wait for its PING
+            for board in boards:
+                while not select.select([board.master], [], [], 0.1)[0]:
+                    pass
+                board.start()
+            while True:
+                time.sleep(1.0)
+        except KeyboardInterrupt:
+            pass
+        for board in boards:
+            board.stop()
+        return
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = run_bridges(boards, args.duration, args.start_delay)
+
+    mode = "legacy" if args.legacy else "binary" if args.binary else "text"
+    print(f"{args.boards} simulated micro:bit(s), {mode} extension, {args.trace} trace, {args.duration:g} s")
+    total_sent = total_received = 0
+    for number, (board, result) in enumerate(zip(boards, results)):
+        total_sent += board.commands
+        total_received += result['received']
+        print(f"  board {number}: {board.commands} commands in {board.writes} writes, "
+              f"{board.bytes_out} bytes at {result['baud']} baud, "
+              f"{board.credit_waits} credit waits, {board.queue_full_waits} queue-full waits, "
+              f"bridge injected {result['received']} ({result['malformed']} malformed)")
+    print(f"  total: {total_sent / args.duration:,.0f} commands/s sent, "
+          f"{total_received / args.duration:,.0f} commands/s injected by the bridges")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Parser microbenchmark for the micro:bit Keyboard Emu Bridge
+
+Compares the bytes-level LineFramer against the original str-based
+decode/strip/split parse_command on the same command mix, twice:
+
+    parse only     - the baseline gets its lines pre-split for free, the
+                     LineFramer number includes framing
+    serial ingest  - both read the stream through pyserial from a pty (Linux
+                     and macOS only): readline() per line for the baseline,
+                     one read of everything waiting for the LineFramer
+
+The LineFramer's gain comes from bulk reads. Each feed() has a fixed cost,
+so with --chunk 64 (about three commands per read) it parses no faster
+than the baseline does with its lines handed over pre-split.
+
+Usage:
+    python benchmarks/parse_benchmark.py [--lines 200000] [--chunk 64]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from microbit_hid_bridge import LineFramer, serial
+
+# Typical traffic: tilt-mouse stream with clicks, key presses and some text
+COMMAND_MIX = [
+    b"HID:MOUSE:MOVE:-3,4\r\n",
+    b"HID:MOUSE:MOVE:2,-1\r\n",
+    b"HID:MOUSE:MOVE:0,3\r\n",
+    b"HID:MOUSE:CLICK:LEFT\r\n",
+    b"HID:KEY:PRESS:ENTER\r\n",
+    b"HID:KEY:COMBO:CTRL+C\r\n",
+    b"HID:KEY:TYPE:Hello from micro:bit!\r\n",
+    b"HID:MOUSE:SCROLL:-2\r\n",
+]
+
+
+def legacy_parse_command(line: str) -> Optional[Dict[str, Any]]:
+    """The original parse_command, kept here as the baseline"""
+    line = line.strip()
+
+    if not line.startswith("HID:"):
+        return None
+
+    parts = line[4:].split(":", 2)
+
+    if len(parts) < 2:
+        return None
+
+    return {
+        'type': parts[0],
+        'action': parts[1],
+        'data': parts[2] if len(parts) > 2 else ""
+    }
+
+
+def legacy_process(line: str) -> bool:
+    """Baseline per-line work: parse plus the upper() calls from process_command"""
+    command = legacy_parse_command(line)
+    if command:
+        command['type'].upper()
+        command['action'].upper()
+        return True
+    return False
+
+
+def bench_legacy(lines: List[bytes]) -> float:
+    """Per-line decode and parse of pre-split lines"""
+    start = time.perf_counter()
+    for raw in lines:
+        legacy_process(raw.decode('utf-8', errors='ignore'))
+    return time.perf_counter() - start
+
+
+def bench_framer(chunks: List[bytes]) -> float:
+    """Bulk reads fed through one LineFramer, framing included"""
+    framer = LineFramer()
+    start = time.perf_counter()
+    for chunk in chunks:
+        framer.feed(chunk)
+    return time.perf_counter() - start
+
+
+def best_of(repeat: int, func, *args) -> float:
+    """Fastest of several runs with the GC paused, like timeit does"""
+    gc.disable()
+    try:
+        return min(func(*args) for _ in range(repeat))
+    finally:
+        gc.enable()
+
+
+def write_all(fd: int, data: bytes) -> None:
+    """Write everything to a pty master, blocking while the reader catches up"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def bench_serial_ingest(stream: bytes, count: int, bulk: bool) -> float:
+    """Time reading `count` commands from a pty through pyserial"""
+    import pty
+    import tty
+
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    conn = serial.Serial(os.ttyname(slave), timeout=1.0)
+    writer = threading.Thread(target=write_all, args=(master, stream), daemon=True)
+
+    start = time.perf_counter()
+    writer.start()
+    parsed = 0
+    if bulk:
+        # The bridge's reader thread: one read of everything waiting
+        framer = LineFramer()
+        while parsed < count:
+            parsed += len(framer.feed(conn.read(conn.in_waiting or 1)))
+    else:
+        # The original run() loop: readline() per command
+        while parsed < count:
+            parsed += legacy_process(conn.readline().decode('utf-8', errors='ignore'))
+    elapsed = time.perf_counter() - start
+
+    writer.join()
+    conn.close()
+    os.close(master)
+    os.close(slave)
+    return elapsed
+
+
+def report(title: str, count: int, legacy: float, framer: float) -> None:
+    """Print one comparison"""
+    print(title)
+    print(f"  legacy parse_command: {count / legacy:12,.0f} commands/s")
+    print(f"  LineFramer:           {count / framer:12,.0f} commands/s")
+    print(f"  speedup:              {legacy / framer:12.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parser microbenchmark")
+    parser.add_argument("--lines", type=int, default=200000, help="Number of command lines to parse")
+    parser.add_argument("--serial-lines", type=int, default=20000, help="Number of command lines sent through the pty")
+    parser.add_argument("--chunk", type=int, default=64, help="Bytes per simulated serial read")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per parser, best one is reported")
+    args = parser.parse_args()
+
+    lines = [COMMAND_MIX[i % len(COMMAND_MIX)] for i in range(args.lines)]
+    stream = b"".join(lines)
+    chunks = [stream[offset:offset + args.chunk] for offset in range(0, len(stream), args.chunk)]
+
+    legacy = best_of(args.repeat, bench_legacy, lines)
+    framer = best_of(args.repeat, bench_framer, chunks)
+    report(f"Parse only: {args.lines} commands, {args.chunk}-byte reads", args.lines, legacy, framer)
+
+    if sys.platform == "win32":
+        return
+
+    serial_stream = b"".join(lines[:args.serial_lines])
+    legacy = bench_serial_ingest(serial_stream, args.serial_lines, bulk=False)
+    framer = bench_serial_ingest(serial_stream, args.serial_lines, bulk=True)
+    report(f"Serial ingest: {args.serial_lines} commands through a pty", args.serial_lines, legacy, framer)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,15 +20,40 @@ Arguments:
     --debug      Enable detailed debug logging
     --no-reconnect  Disable auto-reconnection on disconnect
     --list-ports    List all available serial ports
+    --all-devices   Serve every connected micro:bit from one process
+    --asyncio       Use the asyncio bridge core instead of reader threads
+    --backend       Input backend: pynput (default), uinput or null
+    --stats [N]     Print latency and rate statistics every N seconds
+    --metrics-port  Serve Prometheus metrics on this port (localhost)
+    --macros FILE   Load a JSON macro table for HID:MACRO:<id>
+    --record FILE   Append every serial read to a session recording
+    --replay FILE   Play a recording through the bridge (--speed N or --max)
+    --sensor-profile  Tuning for HID:SENSOR tilt streams: smooth, precise or fast
+    --jitter-buffer [MS]  Replay device-stamped commands with their original spacing
+    --max-lag [MS]  Drop mouse motion that has waited longer than MS under overload
 """
 
 import time
 import sys
 import argparse
+import asyncio
+import bisect
+import functools
+import http.server
+import json
+import socketserver
 import threading
 import platform
+import glob
+import heapq
+import itertools
+import os
+import queue
+import re
+import struct
 import subprocess
-from typing import Optional, Dict, Any, Set
+from typing import Optional, Dict, Any, Set, List, Tuple, Union, Callable
+from concurrent.futures import ThreadPoolExecutor
 
 def install_package(package_name: str) -> bool:
     """Install a package using pip"""
@@ -58,235 +83,2047 @@ except ImportError:
         print("ERROR: Could not install pyserial. Please install manually: pip install pyserial")
         sys.exit(1)
 
-# Try to import pynput, install if missing
+# Try to import pynput, install if missing. Only the default backend needs
+# it, so a failure is reported when that backend is created.
+PYNPUT_ERROR: Optional[str] = None
+keyboard = mouse = Key = Button = None
 try:
     from pynput import keyboard, mouse
     from pynput.keyboard import Key, Listener as KeyboardListener
     from pynput.mouse import Button, Listener as MouseListener
-except ImportError:
-    print("⚠️  pynput not found. Attempting to install...")
-    if install_package("pynput"):
-        try:
-            from pynput import keyboard, mouse
-            from pynput.keyboard import Key, Listener as KeyboardListener
-            from pynput.mouse import Button, Listener as MouseListener
-        except ImportError:
-            print("ERROR: Failed to import pynput even after installation.")
-            sys.exit(1)
+except ImportError as e:
+    if getattr(e, "name", None) != "pynput":
+        # Installed but cannot start, e.g. no X display
+        PYNPUT_ERROR = f"pynput is not usable here: {e}"
     else:
-        print("ERROR: Could not install pynput. Please install manually: pip install pynput")
-        sys.exit(1)
+        print("⚠️  pynput not found. Attempting to install...")
+        if install_package("pynput"):
+            try:
+                from pynput import keyboard, mouse
+                from pynput.keyboard import Key, Listener as KeyboardListener
+                from pynput.mouse import Button, Listener as MouseListener
+            except ImportError:
+                PYNPUT_ERROR = "Failed to import pynput even after installation."
+        else:
+            PYNPUT_ERROR = "Could not install pynput. Please install manually: pip install pynput"
 
+# NumPy is only needed for the HID:SENSOR accelerometer pipeline, so it is not
+# auto-installed; without it the samples are dropped with a warning
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-class MicrobitKeyboardEmuBridge:
-    """Bridge between BBC micro:bit serial commands and system keyboard/mouse input emulation"""
 
-    def __init__(self, port: Optional[str] = None, debug: bool = False, auto_reconnect: bool = True):
-        self.port = port
-        self.debug = debug
-        self.auto_reconnect = auto_reconnect
-        self.serial_conn: Optional[serial.Serial] = None
-        self.running = False
-        
-        # Initialize input controllers
-        self.keyboard_controller = keyboard.Controller()
-        self.mouse_controller = mouse.Controller()
-        
-        # Held mouse buttons tracking  
-        self.held_mouse_buttons = set()
+# Commands answered by the connection that received them instead of being
+# queued for input injection
+SYSTEM_COMMAND_TYPES = ('INIT', 'SYSTEM', 'PING')
+
+# Commands queued for the input backend; anything else is counted as malformed
+INPUT_COMMAND_TYPES = ('KEY', 'MOUSE', 'MACRO', 'STATE', 'SENSOR')
+
+# Maximum number of received lines waiting for dispatch. When full, the reader
+# thread blocks and the backlog stays in the OS serial buffer.
+COMMAND_QUEUE_SIZE = 256
+
+# Load shedding (--max-lag): queued commands older than the limit are dropped
+# if they only matter while fresh. Clicks, keys and releases are never dropped,
+# and the last VEL of a backlog is kept so a stop is never lost. Velocity
+# ticks are posted by the bridge itself and only make room in a full queue.
+SHEDDABLE_COMMANDS = {('MOUSE', 'MOVE'), ('MOUSE', 'SCROLL'), ('MOUSE', 'VEL'), ('MOUSE', 'TICK'),
+                      ('SENSOR', 'ACC')}
+# With --max-lag the queue still has a hard cap. At the cap the oldest queued
+# move, scroll or sensor block makes room; with none left, readers wait.
+SHED_QUEUE_SIZE = COMMAND_QUEUE_SIZE * 8
+
+# Credit flow control (HID:INIT:CREDIT): the bridge grants each micro:bit a
+# running total of commands it may send, HID:CREDIT:<limit>, keeping at most
+# CREDIT_WINDOW outstanding and topping up once half of them are used
+CREDIT_WINDOW = 32
+
+# Serial link speed: every connection starts at the default rate, and the
+# HID:INIT handshake may move it up to the highest rate both sides support
+DEFAULT_BAUD_RATE = 9600
+MAX_BAUD_RATE = 115200
+BAUD_RATES = (9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600)
+BAUD_CONFIRM_TIMEOUT = 1.0
+
+# The virtual cursor is checked against the OS pointer at most this often,
+# since the user may move the real mouse too
+CURSOR_RESYNC_INTERVAL = 0.25
+# ...and after every move that ends this close to the screen edge, where the
+# OS may have stopped the pointer short
+CURSOR_EDGE_MARGIN = 2
+
+# Connection readiness: after opening the port the bridge sends HID:PING with
+# exponential backoff until the micro:bit answers HID:PONG (or sends anything)
+PING_RETRY_DELAY = 0.02
+READY_TIMEOUT = 1.0
+# In the second half of that wait a single PING also goes out at the fast
+# rate, for a micro:bit still at the rate it agreed with an earlier bridge.
+# The line only stays there this long, since a micro:bit that is just
+# starting sends its HID:INIT at the default rate.
+FAST_PROBE_WINDOW = 0.05
+
+# Port discovery retries back off exponentially between these delays
+RECONNECT_MIN_DELAY = 0.05
+RECONNECT_MAX_DELAY = 1.0
+
+# USB IDs of the micro:bit's interface chip
+MICROBIT_VID = 0x0D28
+MICROBIT_PIDS = {0x0204: "v1", 0x0206: "v2"}
+
+# Ports tried when no micro:bit is found by USB ID. They are opened in
+# parallel, each with this timeout.
+if platform.system() == "Darwin":
+    FALLBACK_PORTS = ("/dev/cu.usbmodem*", "/dev/tty.usbmodem*")
+elif platform.system() == "Linux":
+    FALLBACK_PORTS = ("/dev/ttyACM*", "/dev/ttyUSB*")
+else:
+    FALLBACK_PORTS = ("COM3", "COM4", "COM5", "COM6")
+PROBE_TIMEOUT = 0.2
+
+# While searching, /dev is re-listed this often so a plugged-in micro:bit is
+# picked up right away (Linux and macOS)
+HOTPLUG_POLL_INTERVAL = 0.1
+
+# Velocity mode (HID:MOUSE:VEL): cursor update rate, and how long a velocity
+# stays in effect without a refresh from the micro:bit
+VELOCITY_TICK_RATE = 125
+VELOCITY_TIMEOUT = 1.0
+
+# Held keys (HID:KEY:HOLD): the bridge repeats the last held key like the OS
+# keyboard driver would, after a delay and then at a fixed rate
+KEY_REPEAT_DELAY = 0.5
+KEY_REPEAT_RATE = 30
+
+# Streamed accelerometer (HID:SENSOR:ACC:x,y,z[;x,y,z...], in mg) -> cursor
+# velocity. Each profile sets the dead zone around the calibrated rest tilt,
+# the filter (ema with alpha, or one_euro with min_cutoff in Hz and beta), and
+# the curve: speed = max_speed * (tilt / full tilt) ** exponent.
+SENSOR_PROFILES = {
+    'smooth': {'dead_zone': 120, 'filter': 'one_euro', 'min_cutoff': 1.0, 'beta': 0.01,
+               'exponent': 1.6, 'max_speed': 900},
+    'precise': {'dead_zone': 80, 'filter': 'one_euro', 'min_cutoff': 0.5, 'beta': 0.004,
+                'exponent': 2.2, 'max_speed': 500},
+    'fast': {'dead_zone': 150, 'filter': 'ema', 'alpha': 0.5,
+             'exponent': 1.2, 'max_speed': 1600},
+}
+SENSOR_FULL_TILT = 1000
+# Samples averaged for the rest position after start-up or HID:SENSOR:CAL
+SENSOR_CALIBRATION_SAMPLES = 20
+# Bounds for the time between two samples, which the bridge infers from when
+# each block is processed
+SENSOR_MIN_DT = 0.005
+SENSOR_MAX_DT = 0.1
+
+# HID:STATE:<hex bitmask>: bit n set means STATE_NAMES[n] is down. The same
+# table is in main.ts; only ever append to it.
+STATE_NAMES = (
+    'MOUSE_LEFT', 'MOUSE_RIGHT', 'MOUSE_MIDDLE',
+    'CTRL', 'SHIFT', 'ALT', 'WIN',
+    'UP', 'DOWN', 'LEFT', 'RIGHT',
+    'ENTER', 'SPACE', 'ESC', 'TAB', 'BACKSPACE', 'DELETE', 'HOME', 'END', 'PAGE_UP', 'PAGE_DOWN',
+    'F1', 'F2', 'F3', 'F4', 'F5', 'F6', 'F7', 'F8', 'F9', 'F10', 'F11', 'F12',
+) + tuple("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
+
+# Device timestamps ("HID:@<ms>:<type>:..." or a TIME frame before a binary
+# frame) let the bridge replay the micro:bit's own spacing of commands that
+# arrive in clumps. The device clock is fitted to the lower envelope of
+# arrival times: the fastest arrival in each CLOCK_BUCKET seconds of device
+# time, over the last CLOCK_WINDOW buckets.
+CLOCK_BUCKET = 1.0
+CLOCK_WINDOW = 30
+# Fits steeper than this (1000 ppm) are noise, not a real crystal
+CLOCK_MAX_DRIFT = 0.001
+
+# Longest line kept while waiting for a newline; anything longer is noise
+MAX_LINE_LENGTH = 4096
+
+# Resolved PRESS/COMBO payloads remembered per bridge, unknown keys included
+KEY_CACHE_SIZE = 256
+
+# Command types and actions the extension sends
+KNOWN_COMMAND_TYPES = ('KEY', 'MOUSE', 'INIT', 'SYSTEM', 'PING', 'SENSOR')
+KNOWN_ACTIONS = (
+    'TYPE', 'PRESS', 'COMBO',
+    'MOVE', 'VEL', 'CLICK', 'DOUBLE_CLICK', 'SCROLL', 'HOLD', 'RELEASE',
+    'SYSTEM', 'BAUD', 'MODE', 'CREDIT',
+    'ACC', 'CAL', 'TIME',
+)
+
+# Raw "TYPE:ACTION" header bytes -> (type, action), so known headers are
+# resolved with a single lookup and never decoded. TYPE headers are left out
+# on purpose: their payload is text and takes the make_command() path.
+_HEADERS: Dict[bytes, Tuple[str, str]] = {
+    f"{cmd_type}:{action}".encode('ascii'): (cmd_type, action)
+    for cmd_type in KNOWN_COMMAND_TYPES
+    for action in KNOWN_ACTIONS
+    if action != 'TYPE'
+}
+# Bare "HID:PING" / "HID:PONG" lines carry no action
+_HEADERS[b"PING"] = ('SYSTEM', 'PING')
+_HEADERS[b"PONG"] = ('SYSTEM', 'PONG')
+
+# One complete line "HID:<type>[:<action>[:<data>]]". Scanning the receive
+# buffer with this in C is cheaper in CPython than walking it line by line
+# with find() and slicing in Python. Non-text payloads keep any trailing
+# blanks; the handlers strip them where it matters.
+HID_LINE_PATTERN = re.compile(rb"(?m)^[ \t]*HID:([^:\r\n]*(?::[^:\r\n]*)?)(?::([^\r\n]*))?\r?\n")
+
+# Bytes of ordinary text; anything else in front of a command is line noise
+PRINTABLE_ASCII = bytes(range(0x20, 0x7F)) + b"\t\r"
+
+# The same, but any other non-empty line is matched whole as a third group,
+# so the framer sorts commands, debug output and garbled lines in one pass
+FRAMER_LINE_PATTERN = re.compile(
+    rb"(?m)^[ \t]*(?:HID:([^:\r\n]*(?::[^:\r\n]*)?)(?::([^\r\n]*))?\r?|([^\n]+))\n")
+
+# "HID:BATCH:<cmd>;<cmd>;..." packs several commands, each without its "HID:"
+# prefix, into one line. The extension never batches a command containing ";".
+BATCH_HEADER = b"BATCH:"
+BATCH_ITEM_PATTERN = re.compile(rb"([^:;]*(?::[^:;]*)?)(?::([^;]*))?(?:;|$)")
+
+# A stamped command, "@<ms>:" in front of the usual "<type>:<action>:<data>"
+STAMPED_PATTERN = re.compile(rb"@(\d+):([^:]*(?::[^:]*)?)(?::(.*))?$", re.S)
+
+
+class HIDCommand:
+    """Parsed HID command: TYPE payloads are text, all other payloads stay bytes"""
+
+    # received/parsed are perf_counter() timestamps, only set while stats are on.
+    # sent is the micro:bit's runningTime() stamp in ms, if it sent one, and
+    # due the perf_counter() time the bridge scheduled the command for.
+    # source is the DeviceLink it came from, set for per-board state only.
+    __slots__ = ('type', 'action', 'data', 'received', 'parsed', 'sent', 'due', 'source')
+
+    def __init__(self, cmd_type: str, action: str, data: Union[str, bytes]):
+        self.type = cmd_type
+        self.action = action
+        self.data = data
+
+    def __repr__(self) -> str:
+        return f"HIDCommand({self.type}:{self.action}:{self.data!r})"
+
+
+def parse_move(data: bytes) -> Tuple[float, float]:
+    """Parse an "x,y" MOVE payload; MakeCode may send decimals"""
+    comma = data.index(b",")
+    return float(data[:comma]), float(data[comma + 1:])
+
+
+def make_command(header: bytes, payload: bytes) -> HIDCommand:
+    """Build an HIDCommand from the raw header and payload of one line"""
+    names = _HEADERS.get(header)
+    if names is not None:
+        return HIDCommand(names[0], names[1], payload)
+    
+    # TYPE, unknown or lower-case header, decode the slow way
+    raw_type, _, raw_action = header.decode('ascii', errors='ignore').partition(":")
+    cmd_type, action = raw_type.strip().upper(), raw_action.strip().upper()
+    
+    if action == 'TYPE':
+        # Only typed text is ever decoded
+        return HIDCommand(cmd_type, action, payload.decode('utf-8', errors='ignore').rstrip())
+    return HIDCommand(cmd_type, action, payload.strip())
+
+
+def make_stamped_command(header: bytes, payload: bytes) -> Optional[HIDCommand]:
+    """Build an HIDCommand from "@<ms>:<type>:<action>:<data>", keeping the stamp"""
+    match = STAMPED_PATTERN.match(header + b":" + payload if payload else header)
+    if match is None:
+        return None
+    command = make_command(match.group(2), match.group(3) or b"")
+    command.sent = int(match.group(1))
+    return command
+
+
+def unpack_batch(header: bytes, payload: bytes) -> List[HIDCommand]:
+    """Split a HID:BATCH line into its commands"""
+    # The line pattern took "BATCH:<first type>" as the header
+    body = header[len(BATCH_HEADER):] + b":" + payload
+    get_header = _HEADERS.get
+    commands = []
+    for item_header, item_payload in BATCH_ITEM_PATTERN.findall(body.rstrip()):
+        if not item_header:
+            continue
+        names = get_header(item_header)
+        if names is None:
+            command = (make_stamped_command(item_header, item_payload) if item_header.startswith(b"@")
+                       else make_command(item_header, item_payload))
+            if command is not None:
+                commands.append(command)
+        else:
+            commands.append(HIDCommand(names[0], names[1], item_payload))
+    return commands
+
+
+class LineFramer:
+    """Incremental line framer and parser over one reusable receive buffer"""
+
+    __slots__ = ('buffer', 'on_text', 'malformed')
+
+    def __init__(self, on_text: Optional[Callable[[bytes], None]] = None):
+        self.buffer = bytearray()
+        # Called with non-HID lines (micro:bit debug output), if set
+        self.on_text = on_text
+        # HID lines that did not parse, and overlong lines thrown away
+        self.malformed = 0
+
+    def feed(self, data: bytes) -> List[HIDCommand]:
+        """Append received bytes and return the commands of all complete lines"""
+        buf = self.buffer
+        buf += data
         
-        # Key mappings
-        self.special_keys = {
-            'ENTER': Key.enter,
-            'SPACE': Key.space,
-            'ESC': Key.esc,
-            'ESCAPE': Key.esc,  # Allow both ESC and ESCAPE
-            'DELETE': Key.delete,
-            'BACKSPACE': Key.backspace,
-            'TAB': Key.tab,
-            'UP': Key.up,
-            'DOWN': Key.down,
-            'LEFT': Key.left,
-            'RIGHT': Key.right,
-            'HOME': Key.home,
-            'END': Key.end,
-            'PAGE_UP': Key.page_up,
-            'PAGE_DOWN': Key.page_down,
-            'F1': Key.f1, 'F2': Key.f2, 'F3': Key.f3, 'F4': Key.f4,
-            'F5': Key.f5, 'F6': Key.f6, 'F7': Key.f7, 'F8': Key.f8,
-            'F9': Key.f9, 'F10': Key.f10, 'F11': Key.f11, 'F12': Key.f12,
-        }
+        end = buf.rfind(b"\n") + 1
+        if not end:
+            if len(buf) > MAX_LINE_LENGTH:
+                # No newline in sight, drop the garbage instead of growing forever
+                del buf[:]
+                self.malformed += 1
+            return []
         
-        self.modifier_keys = {
-            'CTRL': Key.ctrl,
-            'SHIFT': Key.shift,
-            'ALT': Key.alt,
-            'WIN': Key.cmd,  # Works for both Windows key and Mac Cmd key
-            'CMD': Key.cmd,
-        }
+        commands = []
+        get_header = _HEADERS.get
+        for header, payload, other in FRAMER_LINE_PATTERN.findall(buf, 0, end):
+            names = get_header(header)
+            if names is not None:
+                commands.append(HIDCommand(names[0], names[1], payload))
+                continue
+            if other:
+                # Not a command line: debug output, or a command garbled in transit
+                start = other.rfind(b"HID:")
+                if start < 0:
+                    if self.on_text is not None:
+                        other = other.strip()
+                        if other:
+                            self.on_text(other)
+                    continue
+                self.malformed += 1
+                # Line noise, e.g. from a baud rate switch, can run into the
+                # next command; that command is still good. Printable text
+                # in front of "HID:" is a debug message and is not run.
+                if not other[:start].translate(None, PRINTABLE_ASCII):
+                    continue
+                match = HID_LINE_PATTERN.match(other[start:] + b"\n")
+                if match is None:
+                    continue
+                header, payload = match.groups(b"")
+                names = get_header(header)
+                if names is not None:
+                    commands.append(HIDCommand(names[0], names[1], payload))
+                    continue
+            if header.startswith(BATCH_HEADER):
+                commands += unpack_batch(header, payload)
+            elif header.startswith(b"@"):
+                command = make_stamped_command(header, payload)
+                if command is None:
+                    self.malformed += 1
+                else:
+                    commands.append(command)
+            else:
+                commands.append(make_command(header, payload))
         
-        self.mouse_buttons = {
-            'LEFT': Button.left,
-            'RIGHT': Button.right,
-            'MIDDLE': Button.middle,
-        }
+        del buf[:end]
+        return commands
 
-    def log(self, message: str) -> None:
-        """Log debug messages if debug mode is enabled"""
-        if self.debug:
-            print(f"[DEBUG] {message}")
 
+# Binary protocol, selected with HID:INIT:MODE:BIN. Each frame is
+# COBS(opcode, zigzag varint args..., text bytes, CRC8) followed by 0x00.
+MOUSE_BUTTON_IDS = (b"LEFT", b"RIGHT", b"MIDDLE", b"ALL")
 
 
-    def find_microbit_port(self) -> Optional[str]:
-        """Auto-detect micro:bit serial port across platforms"""
-        self.log("Searching for micro:bit...")
+def mouse_button_id(button: int) -> bytes:
+    """Button name for a binary button argument; IndexError if out of range"""
+    # A plain index would turn -1 into ALL
+    if not 0 <= button < len(MOUSE_BUTTON_IDS):
+        raise IndexError(button)
+    return MOUSE_BUTTON_IDS[button]
+
+
+# Opcode -> (type, action, number of varint args, payload formatter)
+BINARY_OPCODES: Dict[int, Tuple[str, str, int, Optional[Callable[..., bytes]]]] = {
+    0x01: ('KEY', 'TYPE', 0, None),
+    0x02: ('KEY', 'PRESS', 0, None),
+    0x03: ('KEY', 'COMBO', 0, None),
+    0x04: ('KEY', 'HOLD', 0, None),
+    0x05: ('KEY', 'RELEASE', 0, None),
+    0x10: ('MOUSE', 'MOVE', 2, lambda x, y: b"%d,%d" % (x, y)),
+    0x11: ('MOUSE', 'VEL', 2, lambda x, y: b"%d,%d" % (x, y)),
+    0x12: ('MOUSE', 'CLICK', 1, mouse_button_id),
+    0x13: ('MOUSE', 'DOUBLE_CLICK', 0, None),
+    0x14: ('MOUSE', 'SCROLL', 1, lambda amount: b"%d" % amount),
+    0x15: ('MOUSE', 'HOLD', 1, mouse_button_id),
+    0x16: ('MOUSE', 'RELEASE', 1, mouse_button_id),
+    0x20: ('SYSTEM', 'PING', 0, None),
+    0x21: ('SYSTEM', 'PONG', 0, None),
+    # runningTime() stamp for the frame that follows
+    0x22: ('SYSTEM', 'TIME', 1, lambda ms: b"%d" % ms),
+}
+
+# Any text command wrapped in a frame (serialHID.sendCommand in binary mode)
+BINARY_RAW_OPCODE = 0x7F
+
+
+def _crc8_table() -> bytes:
+    """CRC-8 lookup table, polynomial 0x07"""
+    table = bytearray(256)
+    for value in range(256):
+        crc = value
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table[value] = crc
+    return bytes(table)
+
+
+CRC8_TABLE = _crc8_table()
+
+
+def crc8(data: bytes) -> int:
+    """CRC-8 (polynomial 0x07, initial value 0) of data"""
+    crc = 0
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def cobs_decode(frame: bytes) -> Optional[bytes]:
+    """Undo COBS byte stuffing; None if the frame is malformed"""
+    out = bytearray()
+    index = 0
+    length = len(frame)
+    while index < length:
+        code = frame[index]
+        end = index + code
+        if code == 0 or end > length:
+            return None
+        out += frame[index + 1:end]
+        index = end
+        if code < 0xFF and index < length:
+            out.append(0)
+    return bytes(out)
+
+
+def encode_binary_frame(opcode: int, args: Tuple[int, ...] = (), data: bytes = b"") -> bytes:
+    """Encode one binary frame the way the extension does, delimiter included"""
+    raw = bytearray([opcode])
+    for value in args:
+        zigzag = (value << 1) ^ (value >> 63)
+        while zigzag >= 0x80:
+            raw.append((zigzag & 0x7F) | 0x80)
+            zigzag >>= 7
+        raw.append(zigzag)
+    raw += data
+    raw.append(crc8(raw))
+    
+    # COBS: every block starts with the distance to the next zero
+    out = bytearray()
+    block = bytearray()
+    for byte in raw:
+        if byte == 0:
+            out.append(len(block) + 1)
+            out += block
+            block.clear()
+        else:
+            block.append(byte)
+            if len(block) == 0xFE:
+                out.append(0xFF)
+                out += block
+                block.clear()
+    out.append(len(block) + 1)
+    out += block
+    out.append(0)
+    return bytes(out)
+
+
+def decode_binary_frame(frame: bytes) -> Optional[HIDCommand]:
+    """Decode one COBS frame (without the 0x00 delimiter) into an HIDCommand"""
+    raw = cobs_decode(frame)
+    if not raw or len(raw) < 2 or crc8(raw[:-1]) != raw[-1]:
+        return None
+    
+    if raw[0] == BINARY_RAW_OPCODE:
+        match = HID_LINE_PATTERN.match(raw[1:-1].strip() + b"\n")
+        return make_command(*match.groups(b"")) if match else None
+    
+    spec = BINARY_OPCODES.get(raw[0])
+    if spec is None:
+        return None
+    cmd_type, action, arg_count, formatter = spec
+    
+    # Zigzag varint arguments
+    args = []
+    index = 1
+    end = len(raw) - 1
+    for _ in range(arg_count):
+        value = shift = 0
+        while True:
+            if index >= end:
+                return None
+            byte = raw[index]
+            index += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        args.append((value >> 1) ^ -(value & 1))
+    
+    if formatter is not None:
+        try:
+            return HIDCommand(cmd_type, action, formatter(*args))
+        except IndexError:
+            return None
+    
+    # Remaining bytes are text: only TYPE is decoded, like the text protocol
+    data = raw[index:end]
+    if action == 'TYPE':
+        return HIDCommand(cmd_type, action, data.decode('utf-8', errors='ignore'))
+    return HIDCommand(cmd_type, action, data)
+
+
+class BinaryFramer:
+    """Incremental framer for 0x00-delimited binary frames"""
+
+    __slots__ = ('buffer', 'dropped')
+
+    def __init__(self):
+        self.buffer = bytearray()
+        # Frames that failed COBS, CRC or opcode checks
+        self.dropped = 0
+
+    def feed(self, data: bytes) -> List[HIDCommand]:
+        """Append received bytes and return the commands of all complete frames"""
+        buf = self.buffer
+        buf += data
         
-        ports = serial.tools.list_ports.comports()
+        commands = []
+        start = 0
+        while True:
+            end = buf.find(b"\x00", start)
+            if end < 0:
+                break
+            if end > start:
+                command = decode_binary_frame(bytes(buf[start:end]))
+                if command is None:
+                    # Corrupted frame: drop it rather than guess
+                    self.dropped += 1
+                else:
+                    commands.append(command)
+            start = end + 1
         
-        # micro:bit identifiers
-        microbit_patterns = [
-            # Windows
-            "VID:PID=0D28:0204",  # micro:bit v1
-            "VID:PID=0D28:0206",  # micro:bit v2
-            # Linux/Mac
-            "USB VID:PID=0D28:0204",
-            "USB VID:PID=0D28:0206",
-        ]
+        del buf[:start]
+        if len(buf) > MAX_LINE_LENGTH:
+            del buf[:]
+        return commands
+
+    def take_text_init(self) -> Optional[bytes]:
+        """Return and clear pending bytes holding a text HID:INIT line, if any"""
+        # Text never contains 0x00, so a restarted micro:bit's INIT line
+        # piles up here waiting for a delimiter that never comes
+        start = self.buffer.find(b"HID:INIT:")
+        if start < 0 or self.buffer.find(b"\n", start) < 0:
+            return None
         
-        for port in ports:
-            self.log(f"Checking port: {port.device} - {port.description}")
+        text = bytes(self.buffer[start:])
+        del self.buffer[:]
+        return text
+
+
+# Latency histogram bucket upper bounds in seconds: 10 us to about 15 s, each 1.5x the last
+LATENCY_BUCKETS = tuple(1e-5 * 1.5 ** i for i in range(36))
+
+# Stages timed for every command while stats are on
+LATENCY_STAGES = ('parse', 'queue', 'inject', 'total')
+
+
+class LatencyHistogram:
+    """Fixed log-scale latency buckets, cheap enough to update on every command"""
+
+    __slots__ = ('counts', 'total', 'sum', 'max')
+
+    def __init__(self):
+        # One count per bucket in LATENCY_BUCKETS plus one for anything slower
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Add one measurement; only ever called from one thread"""
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def snapshot(self) -> "LatencyHistogram":
+        """Copy for reading while the original keeps changing"""
+        copy = LatencyHistogram()
+        copy.counts = list(self.counts)
+        copy.total = sum(copy.counts)
+        copy.sum = self.sum
+        copy.max = self.max
+        return copy
+
+    def since(self, earlier: "LatencyHistogram") -> "LatencyHistogram":
+        """Measurements added after an earlier snapshot"""
+        delta = LatencyHistogram()
+        delta.counts = [now - then for now, then in zip(self.counts, earlier.counts)]
+        delta.total = sum(delta.counts)
+        delta.sum = self.sum - earlier.sum
+        delta.max = self.max
+        return delta
+
+    def percentile(self, fraction: float) -> float:
+        """Estimated latency in seconds below which `fraction` of measurements fall"""
+        if not self.total:
+            return 0.0
+        
+        rank = fraction * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                # Interpolate inside the bucket
+                low = LATENCY_BUCKETS[index - 1] if index else 0.0
+                high = LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else self.max
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return self.max
+
+
+class BridgeStats:
+    """Per-command-type latency histograms; written only by the dispatching thread"""
+
+    def __init__(self):
+        # (type, action) -> stage -> histogram
+        self.latency: Dict[Tuple[str, str], Dict[str, LatencyHistogram]] = {}
+        self.started = time.monotonic()
+        self.last_command = 0.0
+        # Commands whose handler raised, e.g. a MOVE without numbers
+        self.errors = 0
+
+    def record_batch(self, commands: List[HIDCommand], dispatched: float, done: float) -> None:
+        """Record the stage latencies of one injected batch"""
+        latency = self.latency
+        for command in commands:
+            received = getattr(command, 'received', None)
+            if received is None:
+                continue
             
-            # Check by hardware ID
-            if hasattr(port, 'hwid'):
-                for pattern in microbit_patterns:
-                    if pattern in port.hwid:
-                        self.log(f"Found micro:bit by hwid: {port.device}")
-                        return port.device
+            stages = latency.get((command.type, command.action))
+            if stages is None:
+                stages = latency[(command.type, command.action)] = {
+                    stage: LatencyHistogram() for stage in LATENCY_STAGES
+                }
+            stages['parse'].record(command.parsed - received)
+            stages['queue'].record(dispatched - command.parsed)
+            stages['inject'].record(done - dispatched)
+            stages['total'].record(done - received)
+        self.last_command = time.monotonic()
+
+    def snapshot(self) -> Dict[Tuple[str, str], Dict[str, LatencyHistogram]]:
+        """Copy of every histogram, safe to read from another thread"""
+        return {
+            key: {stage: histogram.snapshot() for stage, histogram in stages.items()}
+            for key, stages in list(self.latency.items())
+        }
+
+
+class SensorPipeline:
+    """Accelerometer sample blocks -> cursor velocity; needs NumPy"""
+
+    def __init__(self, profile: Dict[str, Any]):
+        self.profile = profile
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the filter state and recalibrate on the next samples"""
+        self.calibration: List["np.ndarray"] = []
+        self.calibrated = 0
+        self.offset: Optional["np.ndarray"] = None
+        self.value: Optional["np.ndarray"] = None
+        self.slope = np.zeros(2)
+        self.last_time: Optional[float] = None
+
+    @staticmethod
+    def parse(data: bytes) -> "np.ndarray":
+        """Parse "x,y,z;x,y,z;..." into one row per sample"""
+        return np.array(data.replace(b";", b",").split(b","), dtype=float).reshape(-1, 3)
+
+    def feed(self, samples: "np.ndarray", now: float) -> Optional[Tuple[float, float]]:
+        """Run one block through the pipeline; None while still calibrating"""
+        tilt = samples[:, :2]
+        last_time, self.last_time = self.last_time, now
+
+        if self.offset is None:
+            # The board is assumed to be at rest in the user's hand
+            self.calibration.append(tilt)
+            self.calibrated += len(tilt)
+            if self.calibrated < SENSOR_CALIBRATION_SAMPLES:
+                return None
+            self.offset = np.concatenate(self.calibration).mean(axis=0)
+            self.value = np.zeros(2)
+            self.calibration = []
+            return None
+
+        # The samples are spread evenly over the time since the last block
+        count = len(tilt)
+        dt = min(max((now - last_time) / count, SENSOR_MIN_DT), SENSOR_MAX_DT)
+        tilt = tilt - self.offset
+
+        profile = self.profile
+        if profile['filter'] == 'ema':
+            # Closed form of count EMA steps: one weighted sum over the block
+            keep = 1.0 - profile['alpha']
+            weights = profile['alpha'] * keep ** np.arange(count - 1, -1, -1)
+            self.value = keep ** count * self.value + weights @ tilt
+        else:
+            # One-euro filter: the cutoff rises with speed, so slow tilts are
+            # smoothed hard and fast ones follow with little lag
+            rate = 2 * np.pi * dt
+            slope_alpha = 1.0 / (1.0 + 1.0 / rate)
+            min_cutoff, beta = profile['min_cutoff'], profile['beta']
+            value, slope = self.value.copy(), self.slope.copy()
+            # Each sample depends on the last, so this runs on plain floats:
+            # NumPy's per-call overhead dwarfs the math on 2-vectors
+            for axis in (0, 1):
+                v, s = float(value[axis]), float(slope[axis])
+                for sample in tilt[:, axis].tolist():
+                    s += slope_alpha * ((sample - v) / dt - s)
+                    v += (sample - v) / (1.0 + 1.0 / (rate * (min_cutoff + beta * abs(s))))
+                value[axis], slope[axis] = v, s
+            self.value, self.slope = value, slope
+
+        # Dead zone, then the curve from its edge (0) to full tilt (1)
+        dead_zone = profile['dead_zone']
+        reach = np.clip((np.abs(self.value) - dead_zone) / (SENSOR_FULL_TILT - dead_zone), 0.0, 1.0)
+        vx, vy = np.sign(self.value) * reach ** profile['exponent'] * profile['max_speed']
+        # Tilting towards the user (positive y) moves the cursor up
+        return float(vx), float(-vy)
+
+
+# Session recordings (--record / --replay): RECORD_MAGIC starts every session,
+# then one RECORD_HEADER (seconds since session start, link number, length)
+# before the raw bytes of each serial read. Sessions are appended.
+RECORD_MAGIC = b"MBHIDREC1\n"
+RECORD_HEADER = struct.Struct("<dBI")
+
+
+class SessionRecorder:
+    """Appends every serial read, with its arrival time, to a recording"""
+
+    def __init__(self, path: str):
+        self.file = open(path, "ab")
+        self.file.write(RECORD_MAGIC)
+        self.started = time.perf_counter()
+        self.link_numbers: Dict[int, int] = {}
+        self.lock = threading.Lock()
+
+    def write(self, link: "DeviceLink", data: bytes, received: float) -> None:
+        """Record one read; several reader threads may call this"""
+        with self.lock:
+            number = self.link_numbers.setdefault(id(link), len(self.link_numbers) % 256)
+            self.file.write(RECORD_HEADER.pack(received - self.started, number, len(data)))
+            self.file.write(data)
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.close()
+
+
+def read_recording(path: str):
+    """Yield (seconds, link number, bytes) per read; seconds restart with each session"""
+    with open(path, "rb") as f:
+        content = f.read()
+    
+    offset = 0
+    size = RECORD_HEADER.size
+    while offset < len(content):
+        if content.startswith(RECORD_MAGIC, offset):
+            offset += len(RECORD_MAGIC)
+            yield None
+            continue
+        if offset + size > len(content):
+            break
+        seconds, number, length = RECORD_HEADER.unpack_from(content, offset)
+        offset += size
+        data = content[offset:offset + length]
+        offset += length
+        if len(data) < length:
+            # Cut short by a crash while recording
+            break
+        yield seconds, number, data
+
+
+class PortDiscovery:
+    """Finds micro:bit serial ports and remembers the ones it has seen"""
+
+    def __init__(self, log: Callable[[str], None] = print):
+        self.log = log
+        # (vid, pid, serial number) -> device path it was last seen on
+        self.known_devices: Dict[Tuple[int, int, str], str] = {}
+        self.last_good: Optional[Tuple[int, int, str]] = None
+        self.last_good_port: Optional[str] = None
+        self.device_nodes = self.list_device_nodes()
+
+    @staticmethod
+    def device_key(port) -> Optional[Tuple[int, int, str]]:
+        """Index key for a micro:bit port, None for anything else"""
+        if port.vid != MICROBIT_VID or port.pid not in MICROBIT_PIDS:
+            return None
+        return (port.vid, port.pid, port.serial_number or port.device)
+
+    def scan(self) -> List[str]:
+        """All micro:bit ports currently present, the last good one first"""
+        found = []
+        for port in serial.tools.list_ports.comports():
+            self.log(f"Checking port: {port.device} - {port.description}")
             
-            # Check by description (fallback)
-            desc = port.description.lower()
-            if any(name in desc for name in ['microbit', 'micro:bit', 'mbed']):
+            key = self.device_key(port)
+            if key:
+                self.known_devices[key] = port.device
+                version = MICROBIT_PIDS[port.pid]
+                self.log(f"Found micro:bit {version} by USB ID: {port.device}")
+                rank = 0 if key == self.last_good else 1
+            elif any(name in (port.description or "").lower() for name in ['microbit', 'micro:bit', 'mbed']):
                 self.log(f"Found micro:bit by description: {port.device}")
-                return port.device
-        
-        # Platform-specific fallbacks
-        if platform.system() == "Darwin":  # macOS
-            common_ports = ["/dev/tty.usbmodem*", "/dev/cu.usbmodem*"]
-        elif platform.system() == "Linux":
-            common_ports = ["/dev/ttyACM0", "/dev/ttyUSB0"]
-        else:  # Windows
-            common_ports = ["COM3", "COM4", "COM5", "COM6"]
-        
-        self.log(f"No micro:bit found by ID, checking common ports: {common_ports}")
-        
-        # Try common ports
-        for port_pattern in common_ports:
-            if "*" in port_pattern:
-                # Handle wildcards (macOS)
-                import glob
-                matches = glob.glob(port_pattern)
-                if matches:
-                    return matches[0]
+                rank = 0 if port.device == self.last_good_port else 2
             else:
-                # Try direct port
-                try:
-                    test_serial = serial.Serial(port_pattern, 115200, timeout=1)
-                    test_serial.close()
-                    self.log(f"Found working port: {port_pattern}")
-                    return port_pattern
-                except:
-                    continue
+                continue
+            found.append((rank, port.device))
         
+        found.sort(key=lambda item: item[0])
+        return [device for _, device in found]
+
+    def fallback_ports(self) -> List[str]:
+        """Platform default ports, the last good one first"""
+        ports = []
+        for pattern in FALLBACK_PORTS:
+            ports.extend(sorted(glob.glob(pattern)) if "*" in pattern else [pattern])
+        if self.last_good_port in ports:
+            ports.remove(self.last_good_port)
+            ports.insert(0, self.last_good_port)
+        return ports
+
+    @staticmethod
+    def try_open(port: str) -> bool:
+        """Check that a port exists and can be opened"""
+        try:
+            serial.Serial(port, DEFAULT_BAUD_RATE, timeout=PROBE_TIMEOUT).close()
+            return True
+        except (serial.SerialException, OSError, ValueError):
+            return False
+
+    def probe(self, ports: List[str]) -> Optional[str]:
+        """Open all ports at once, return the first one in order that worked"""
+        if not ports:
+            return None
+        
+        self.log(f"No micro:bit found by ID, probing: {ports}")
+        with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+            results = list(pool.map(self.try_open, ports))
+        
+        for port, ok in zip(ports, results):
+            if ok:
+                self.log(f"Found working port: {port}")
+                return port
         return None
 
-    def connect_serial(self) -> bool:
+    def find_port(self) -> Optional[str]:
+        """Best micro:bit port right now, or None"""
+        ports = self.scan()
+        if ports:
+            return ports[0]
+        return self.probe(self.fallback_ports())
+
+    def mark_good(self, port: str) -> None:
+        """Remember the port we connected to so it is tried first next time"""
+        self.last_good_port = port
+        for key, device in self.known_devices.items():
+            if device == port:
+                self.last_good = key
+
+    @staticmethod
+    def list_device_nodes() -> Set[str]:
+        """Serial device nodes currently in /dev (empty on Windows)"""
+        if platform.system() == "Windows":
+            return set()
+        nodes = set()
+        for pattern in FALLBACK_PORTS:
+            nodes.update(glob.glob(pattern))
+        return nodes
+
+    def device_added(self) -> bool:
+        """Re-list /dev and report whether a serial device node appeared"""
+        nodes = self.list_device_nodes()
+        added = nodes - self.device_nodes
+        self.device_nodes = nodes
+        if added:
+            self.log(f"New serial device: {', '.join(sorted(added))}")
+            return True
+        return False
+
+    def wait_for_device(self, timeout: float) -> bool:
+        """Sleep up to timeout, returning True early when a serial device appears"""
+        if platform.system() == "Windows":
+            time.sleep(timeout)
+            return False
+        
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.device_added():
+                return True
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(HOTPLUG_POLL_INTERVAL, remaining))
+
+
+class DeviceClock:
+    """Maps micro:bit runningTime() stamps onto the bridge's perf_counter() clock"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the fit, e.g. after the micro:bit restarted"""
+        # (device time, lowest arrival offset) per bucket, oldest first
+        self.minima: List[Tuple[float, float]] = []
+        self.bucket = -1
+        self.last_sent = 0.0
+        # offset(t) = base + drift * (t - origin)
+        self.base = 0.0
+        self.drift = 0.0
+        self.origin = 0.0
+
+    def observe(self, sent: float, received: float) -> None:
+        """Add one stamp, in device seconds, and its arrival time"""
+        if sent < self.last_sent - CLOCK_BUCKET:
+            self.reset()
+        self.last_sent = sent
+        
+        offset = received - sent
+        bucket = int(sent // CLOCK_BUCKET)
+        if bucket != self.bucket:
+            self.bucket = bucket
+            self.minima.append((sent, offset))
+            del self.minima[:-CLOCK_WINDOW]
+        elif offset < self.minima[-1][1]:
+            self.minima[-1] = (sent, offset)
+        else:
+            return
+        self.fit()
+
+    def fit(self) -> None:
+        """Fit drift to the bucket minima, then lower the line onto the envelope"""
+        points = self.minima
+        self.origin = points[-1][0]
+        drift = 0.0
+        if len(points) >= 3:
+            mean_t = sum(t for t, _ in points) / len(points)
+            mean_offset = sum(offset for _, offset in points) / len(points)
+            spread = sum((t - mean_t) ** 2 for t, _ in points)
+            if spread:
+                drift = sum((t - mean_t) * (offset - mean_offset) for t, offset in points) / spread
+                drift = max(-CLOCK_MAX_DRIFT, min(CLOCK_MAX_DRIFT, drift))
+        self.drift = drift
+        self.base = min(offset - drift * (t - self.origin) for t, offset in points)
+
+    def to_host(self, sent: float) -> float:
+        """Earliest perf_counter() time a command stamped at sent could have arrived"""
+        return sent + self.base + self.drift * (sent - self.origin)
+
+
+class DeviceLink:
+    """One micro:bit serial connection: its reader thread, handshakes and replies"""
+
+    def __init__(self, bridge: "MicrobitKeyboardEmuBridge", port: Optional[str] = None):
+        self.bridge = bridge
+        self.port = port
+        self.requested_port = port
+        self.serial_conn: Optional[serial.Serial] = None
+        self.write_lock = threading.Lock()
+        self.reader_thread: Optional[threading.Thread] = None
+        
+        # Baud rate negotiation state
+        self.baud_rate = DEFAULT_BAUD_RATE
+        self.pending_baud_rate: Optional[int] = None
+        self.baud_fallback_timer: Optional[Union[threading.Timer, asyncio.TimerHandle]] = None
+        
+        # Binary protocol, switched on by HID:INIT:MODE:BIN
+        self.binary_mode = False
+        self.text_framer = LineFramer()
+        self.binary_framer = BinaryFramer()
+        
+        # Credit flow control, switched on by HID:INIT:CREDIT
+        self.credit_flow = False
+        self.credit_lock = threading.Lock()
+        self.credits_used = 0
+        self.credit_limit = 0
+        
+        # Last HID:STATE mask from this board, kept by the dispatcher
+        self.state_mask = 0
+        
+        # Device timestamps: the fitted clock, and a binary TIME stamp waiting
+        # for the frame it belongs to
+        self.clock = DeviceClock()
+        self.pending_stamp: Optional[int] = None
+        # Stamped commands waiting for their due time, a heap of
+        # (due, sequence, command) guarded by bridge.schedule_ready
+        self.scheduled: List[Tuple[float, int, HIDCommand]] = []
+        self.last_due = 0.0
+        
+        # This board's HID:SENSOR filter state, used by the dispatcher
+        self.sensor = SensorPipeline(bridge.sensor_profile) if np is not None else None
+        
+        # Readiness and reconnect timing
+        self.ready = threading.Event()
+        self.connected_at = 0.0
+        self.disconnected_at: Optional[float] = None
+        self.first_event_pending = False
+        self.fast_probed = False
+        self.reconnect_times: List[float] = []
+        self.commands_received = 0
+        
+        # Counters for --stats, each only written by this link's reader
+        self.connects = 0
+        self.bytes_in = 0
+        self.dropped_frames = 0
+        self.malformed_lines = 0
+        
+        # Set when the asyncio bridge stops reading this link
+        self.lost: Optional[asyncio.Event] = None
+
+    @property
+    def name(self) -> str:
+        """Short device name used to tag logs, e.g. ttyACM0 or COM3"""
+        return os.path.basename(self.port) if self.port else "micro:bit"
+
+    @property
+    def tag(self) -> str:
+        """Log prefix, only needed when several micro:bits share the bridge"""
+        return f"[{self.name}] " if self.bridge.all_devices else ""
+
+    def log(self, message: str) -> None:
+        """Log debug messages tagged with this device"""
+        self.bridge.log(self.tag + message)
+
+    def is_connected(self) -> bool:
+        """True while the serial port is open"""
+        return bool(self.serial_conn and self.serial_conn.is_open)
+
+    def connect(self) -> bool:
         """Connect to micro:bit serial port"""
-        # Always search for port (in case it changed after reconnect)
-        self.port = self.find_microbit_port()
+        # Search for the port every time (in case it changed after reconnect),
+        # unless one was given on the command line
+        self.port = self.requested_port or self.bridge.find_microbit_port()
         
         if not self.port:
             self.log("Could not find micro:bit port")
             return False
         
         try:
+            # Always start at the default rate, the micro:bit does the same
+            # and HID:INIT negotiates anything faster
             self.serial_conn = serial.Serial(
                 self.port,
-                baudrate=9600,  # Match micro:bit's slower, more reliable rate
+                baudrate=DEFAULT_BAUD_RATE,
                 timeout=1.0,
                 write_timeout=1.0
             )
+            self.baud_rate = DEFAULT_BAUD_RATE
+            self.pending_baud_rate = None
+            self.binary_mode = False
+            self.credit_flow = False
+            self.malformed_lines += self.text_framer.malformed
+            self.text_framer = LineFramer(on_text=self.print_device_text if self.bridge.debug else None)
+            self.binary_framer = BinaryFramer()
+            self.clock.reset()
+            self.pending_stamp = None
+            self.fast_probed = False
+            if self.sensor is not None:
+                # A replugged board may rest at a different angle
+                self.sensor.reset()
+            self.ready.clear()
+            self.connects += 1
+            self.connected_at = time.monotonic()
+            self.first_event_pending = True
+            self.bridge.discovery.mark_good(self.port)
             
-            # Wait for connection to stabilize
-            time.sleep(2)
-            
-            print(f"✅ Connected to micro:bit on {self.port} (9600 baud)")
+            print(f"✅ Connected to micro:bit on {self.port} ({self.baud_rate} baud, "
+                  f"negotiates up to {self.bridge.max_baud_rate})")
             return True
             
         except serial.SerialException as e:
             self.log(f"Failed to connect to {self.port}: {e}")
             return False
 
-    def parse_command(self, line: str) -> Optional[Dict[str, Any]]:
-        """Parse HID command from serial line"""
-        line = line.strip()
+    def disconnect(self) -> None:
+        """Close the serial port, the reader thread stops on its own"""
+        if self.baud_fallback_timer:
+            self.baud_fallback_timer.cancel()
+        
+        if self.state_mask and self.bridge.running:
+            # Queued behind the last input, so nothing this board holds stays
+            # down while it is gone; its next HID:STATE presses them again
+            release = HIDCommand('STATE', '0', b"")
+            release.source = self
+            self.bridge.submit([release])
+        
+        if self.serial_conn:
+            try:
+                self.serial_conn.close()
+            except:
+                pass
+            self.serial_conn = None
+
+    def send_line(self, line: bytes) -> bool:
+        """Send one line back to the micro:bit"""
+        if not self.serial_conn:
+            return False
+        
+        try:
+            with self.write_lock:
+                self.serial_conn.write(line + b"\n")
+            return True
+        except:
+            return False
+
+    def set_baud_rate(self, rate: int) -> None:
+        """Switch the open serial connection to another baud rate"""
+        with self.write_lock:
+            # Let the last reply leave at the old rate first
+            self.serial_conn.flush()
+            self.serial_conn.baudrate = rate
+        self.baud_rate = rate
+
+    def negotiate_baud_rate(self, offered: int) -> None:
+        """Answer a HID:INIT offer with the rate to use and switch to it"""
+        limit = min(offered, self.bridge.max_baud_rate)
+        rate = max((r for r in BAUD_RATES if r <= limit), default=DEFAULT_BAUD_RATE)
+        self.log(f"micro:bit offers {offered} baud, answering {rate}")
+        
+        # Reply at the current rate; the micro:bit probes rates until it hears one
+        if not self.send_line(b"HID:BAUD:%d" % rate):
+            return
+        
+        if self.baud_fallback_timer:
+            self.baud_fallback_timer.cancel()
+        if rate != self.baud_rate:
+            self.set_baud_rate(rate)
+        
+        # Fall back unless the micro:bit confirms at the new rate
+        self.pending_baud_rate = rate
+        self.baud_fallback_timer = self.bridge.call_later(BAUD_CONFIRM_TIMEOUT, self.baud_rate_fallback, rate)
+
+    def confirm_baud_rate(self, rate: int) -> None:
+        """Handle the micro:bit's confirmation that it switched rates"""
+        if rate != self.pending_baud_rate:
+            self.log(f"Ignoring confirmation for {rate} baud")
+            return
+        
+        self.baud_fallback_timer.cancel()
+        self.pending_baud_rate = None
+        self.send_line(b"HID:BAUD:OK")
+        print(f"⚡ Link speed negotiated: {rate} baud on {self.port}")
+
+    def baud_rate_fallback(self, rate: int) -> None:
+        """Go back to the default rate when a negotiated rate was never confirmed"""
+        if self.pending_baud_rate != rate or not self.serial_conn:
+            return
+        
+        self.pending_baud_rate = None
+        try:
+            self.set_baud_rate(DEFAULT_BAUD_RATE)
+        except (serial.SerialException, OSError) as e:
+            self.log(f"Baud rate fallback failed: {e}")
+            return
+        print(f"⚠️  {self.tag}No confirmation at {rate} baud, staying at {DEFAULT_BAUD_RATE} baud")
+
+    def handle_system_command(self, action: str, data: bytes) -> None:
+        """Handle system-related commands"""
+        if action == "PING":
+            # Respond to ping
+            self.send_line(b"HID:PONG")
+            
+        elif action == "PONG":
+            # Answer to our readiness probe, see wait_until_ready()
+            self.ready.set()
+            
+        elif action == "SYSTEM" and data.isdigit():
+            # HID:INIT:SYSTEM:<max baud> - the micro:bit offers a faster link
+            self.negotiate_baud_rate(int(data))
+            
+        elif action == "BAUD" and data.isdigit():
+            # HID:INIT:BAUD:<rate> - sent by the micro:bit after switching
+            self.confirm_baud_rate(int(data))
+            
+        elif action == "MODE":
+            # HID:INIT:MODE:BIN - everything after our reply is binary frames.
+            # Flip the flag before replying so the reader is ready for them.
+            if data.upper() == b"BIN":
+                self.binary_mode = True
+                self.send_line(b"HID:MODE:BIN")
+                print(f"📦 {self.tag}Binary protocol enabled")
+            else:
+                self.binary_mode = False
+                self.send_line(b"HID:MODE:TEXT")
+            
+        elif action == "CREDIT":
+            # HID:INIT:CREDIT - the micro:bit paces itself by our grants from
+            # now on. Sent at start-up and again after every HID:PING, so both
+            # sides restart counting from zero.
+            with self.credit_lock:
+                self.credit_flow = True
+                self.credits_used = 0
+                self.credit_limit = 0
+            self.log("Credit flow control enabled")
+            self.grant_credits()
+
+    def grant_credits(self) -> None:
+        """Top up the micro:bit's send window from the free queue slots"""
+        if not self.credit_flow:
+            return
+        
+        with self.credit_lock:
+            if self.credit_limit - self.credits_used > CREDIT_WINDOW // 2:
+                return
+            # The connected micro:bits share one queue; unplugged ones keep no slots
+            free = (COMMAND_QUEUE_SIZE - self.bridge.queue_depth()) // max(self.bridge.connected_count(), 1)
+            limit = self.credits_used + min(CREDIT_WINDOW, free)
+            if limit <= self.credit_limit:
+                return
+            self.credit_limit = limit
+        
+        # The limit is a running total, so a late or repeated grant is harmless
+        self.send_line(b"HID:CREDIT:%d" % limit)
+
+    def print_device_text(self, line: bytes) -> None:
+        """Show non-HID messages from the micro:bit in debug mode"""
+        print(f"{self.tag}micro:bit: {line.decode('utf-8', errors='ignore').strip()}")
+
+    def handle_data(self, data: bytes, received: float = 0.0) -> None:
+        """Frame received bytes, answer system commands and submit the rest"""
+        self.bytes_in += len(data)
+        if self.bridge.recorder is not None:
+            self.bridge.recorder.write(self, data, received or time.perf_counter())
+        if self.binary_mode:
+            commands = self.binary_framer.feed(data)
+            if self.binary_framer.dropped:
+                self.log(f"Dropped {self.binary_framer.dropped} corrupted binary frame(s)")
+                self.dropped_frames += self.binary_framer.dropped
+                self.binary_framer.dropped = 0
+            
+            text = self.binary_framer.take_text_init()
+            if text is not None:
+                # The micro:bit restarted and is talking text again
+                self.log("Text HID:INIT seen, leaving binary mode")
+                self.binary_mode = False
+                commands += self.text_framer.feed(text)
+        else:
+            commands = self.text_framer.feed(data)
+        
+        if not commands:
+            return
+        
+        # Any traffic proves the link is up
+        self.commands_received += len(commands)
+        if not self.ready.is_set():
+            self.ready.set()
+        
+        inputs = []
+        spent = len(commands)
+        for command in commands:
+            if command.type in INPUT_COMMAND_TYPES:
+                if command.type == 'STATE' or command.type == 'SENSOR':
+                    # Kept per board, see apply_state() and sensor_pipeline()
+                    command.source = self
+                if self.pending_stamp is not None:
+                    command.sent = self.pending_stamp
+                    self.pending_stamp = None
+                inputs.append(command)
+            elif command.type == 'SYSTEM' and command.action == 'TIME':
+                # Binary stamp frame, sent together with the frame it stamps
+                spent -= 1
+                if command.data.isdigit():
+                    self.pending_stamp = int(command.data)
+                else:
+                    self.malformed_lines += 1
+                    self.log(f"Bad time stamp: {command.data!r}")
+            elif command.type in SYSTEM_COMMAND_TYPES:
+                # Handshakes and PONGs are sent without spending a credit
+                if command.type == 'INIT' or command.action == 'PONG':
+                    spent -= 1
+                # Replies go back on this connection, so answer here
+                self.handle_system_command(command.action, command.data)
+            else:
+                self.malformed_lines += 1
+                self.log(f"Unknown command: {command}")
+        
+        if inputs:
+            if self.first_event_pending:
+                self.report_first_event()
+            if self.bridge.stats is not None or self.bridge.max_lag:
+                # Every command in one read shares its arrival and parse times
+                parsed = time.perf_counter()
+                for command in inputs:
+                    command.received = received or parsed
+                    command.parsed = parsed
+            if self.bridge.schedule_delay:
+                inputs = self.schedule(inputs, received or time.perf_counter())
+            if inputs:
+                self.bridge.submit(inputs)
         
-        if not line.startswith("HID:"):
+        if self.credit_flow and spent:
+            with self.credit_lock:
+                self.credits_used += spent
+            self.grant_credits()
+
+    def schedule(self, commands: List[HIDCommand], received: float) -> List[HIDCommand]:
+        """Hold stamped commands until the time that restores the device's spacing
+
+        Returns the unstamped commands, which are submitted straight away.
+        """
+        bridge = self.bridge
+        delay = bridge.schedule_delay
+        latest = received + delay
+        now = time.perf_counter()
+        immediate = []
+        with bridge.schedule_ready:
+            for command in commands:
+                sent = getattr(command, 'sent', None)
+                if sent is None:
+                    immediate.append(command)
+                    continue
+                sent /= 1000.0
+                self.clock.observe(sent, received)
+                # A clump is spread back out over at most the jitter buffer.
+                # Due times never go backwards, so a refitted clock cannot
+                # swap a press and its release.
+                due = max(min(self.clock.to_host(sent) + delay, latest), self.last_due)
+                self.last_due = command.due = due
+                if due <= now:
+                    bridge.late_commands += 1
+                heapq.heappush(self.scheduled, (due, next(bridge.schedule_sequence), command))
+            if len(immediate) < len(commands):
+                bridge.schedule_ready.notify_all()
+        return immediate
+
+    def read_serial(self, conn: serial.Serial) -> None:
+        """Reader thread: block on the serial port and queue parsed commands"""
+        try:
+            while self.bridge.running and conn.is_open:
+                # Block for the first byte, then take whatever else has arrived
+                data = conn.read(conn.in_waiting or 1)
+                if data:
+                    self.handle_data(data, time.perf_counter())
+        except (serial.SerialException, OSError, TypeError) as e:
+            # pyserial raises TypeError/OSError when the port is closed under us
+            self.log(f"Serial reader stopped: {e}")
+
+    def start_reader(self) -> None:
+        """Start the reader thread for the current serial connection"""
+        self.reader_thread = threading.Thread(
+            target=self.read_serial,
+            args=(self.serial_conn,),
+            name=f"microbit-serial-reader-{self.name}",
+            daemon=True
+        )
+        self.reader_thread.start()
+
+    def wait_until_ready(self) -> bool:
+        """Probe a fresh connection with HID:PING until the micro:bit answers"""
+        # Anything the micro:bit sends also counts, older extensions never PONG
+        delay = PING_RETRY_DELAY
+        deadline = self.connected_at + READY_TIMEOUT
+        
+        while self.bridge.running:
+            self.send_line(b"HID:PING")
+            if self.fast_probe_due():
+                self.start_fast_probe()
+                self.ready.wait(FAST_PROBE_WINDOW)
+                self.end_fast_probe()
+            remaining = deadline - time.monotonic()
+            if self.ready.wait(min(delay, max(remaining, 0))):
+                self.report_ready()
+                return True
+            if remaining <= 0:
+                break
+            delay *= 2
+        
+        self.probe_failed()
+        return False
+
+    def fast_probe_due(self) -> bool:
+        """True once the micro:bit has been silent at the default rate for half the wait"""
+        return (not self.fast_probed and self.baud_rate == DEFAULT_BAUD_RATE
+                and self.bridge.max_baud_rate != DEFAULT_BAUD_RATE
+                and time.monotonic() - self.connected_at >= READY_TIMEOUT / 2)
+
+    def start_fast_probe(self) -> None:
+        """Ping once at the fast rate, where an earlier bridge may have left the micro:bit"""
+        self.fast_probed = True
+        self.log(f"No answer at {DEFAULT_BAUD_RATE} baud, pinging at {self.bridge.max_baud_rate}")
+        self.set_baud_rate(self.bridge.max_baud_rate)
+        self.send_line(b"HID:PING")
+
+    def end_fast_probe(self) -> None:
+        """Back to the default rate unless the fast PING was answered"""
+        if not self.ready.is_set() and self.serial_conn is not None:
+            self.set_baud_rate(DEFAULT_BAUD_RATE)
+
+    def report_ready(self) -> None:
+        """Print how long the micro:bit took to answer"""
+        elapsed = (time.monotonic() - self.connected_at) * 1000
+        rate = f" (still at {self.baud_rate} baud)" if self.baud_rate != DEFAULT_BAUD_RATE else ""
+        print(f"✅ {self.tag}micro:bit ready in {elapsed:.0f} ms{rate}")
+
+    def probe_failed(self) -> None:
+        """Go back to the default rate, where a restarting micro:bit sends HID:INIT"""
+        if self.baud_rate != DEFAULT_BAUD_RATE and self.serial_conn is not None:
+            self.set_baud_rate(DEFAULT_BAUD_RATE)
+        self.log("No answer to HID:PING yet, is serialHID.initialize() running?")
+
+    def report_first_event(self) -> None:
+        """Report how long it took from losing the connection to the next input"""
+        self.first_event_pending = False
+        
+        now = time.monotonic()
+        since_open = (now - self.connected_at) * 1000
+        if self.disconnected_at is None:
+            self.log(f"First command {since_open:.0f} ms after opening the port")
+            return
+        
+        total = (now - self.disconnected_at) * 1000
+        self.reconnect_times.append(total)
+        print(f"⏱️  {self.tag}Reconnected: first input {total:.0f} ms after disconnect "
+              f"({since_open:.0f} ms after the port reopened)")
+
+
+class InputBackend:
+    """Where keyboard and mouse input ends up
+
+    Keys are single characters or the names in KEY_NAMES, buttons are
+    'left', 'right' or 'middle'. Backends may buffer events until flush().
+    """
+
+    name = ""
+
+    def press_key(self, key: str) -> None:
+        raise NotImplementedError
+
+    def release_key(self, key: str) -> None:
+        raise NotImplementedError
+
+    def repeat_key(self, key: str) -> None:
+        """Auto-repeat a held key"""
+        self.press_key(key)
+
+    def type_text(self, text: str) -> None:
+        """Type a string one character at a time"""
+        for char in text:
+            self.press_key(char)
+            self.release_key(char)
+
+    def press_button(self, button: str) -> None:
+        raise NotImplementedError
+
+    def release_button(self, button: str) -> None:
+        raise NotImplementedError
+
+    def click(self, button: str, count: int = 1) -> None:
+        """Press and release a mouse button count times"""
+        for _ in range(count):
+            self.press_button(button)
+            self.release_button(button)
+
+    def scroll(self, dx: int, dy: int) -> None:
+        raise NotImplementedError
+
+    def get_pointer(self) -> Optional[Tuple[int, int]]:
+        """Current pointer position, None if the backend cannot tell"""
+        return None
+
+    def get_screen_bounds(self) -> Optional[Tuple[int, int, int, int]]:
+        """(left, top, right, bottom) around all screens, exclusive of right and bottom; None if unknown"""
+        return None
+
+    def move_pointer(self, position: Tuple[int, int], delta: Tuple[int, int]) -> None:
+        """Move the pointer to position, which is delta away from the last position set"""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Deliver buffered events"""
+
+    def close(self) -> None:
+        """Release the backend's resources"""
+
+
+# Backend-neutral names for the non-character keys
+KEY_NAMES = (
+    'enter', 'space', 'esc', 'delete', 'backspace', 'tab', 'up', 'down', 'left', 'right',
+    'home', 'end', 'page_up', 'page_down', 'ctrl', 'shift', 'alt', 'cmd',
+    'f1', 'f2', 'f3', 'f4', 'f5', 'f6', 'f7', 'f8', 'f9', 'f10', 'f11', 'f12',
+)
+
+
+class PynputBackend(InputBackend):
+    """Inject input through pynput (X11, Windows, macOS)"""
+
+    name = "pynput"
+
+    def __init__(self):
+        if PYNPUT_ERROR:
+            raise RuntimeError(PYNPUT_ERROR)
+        self.keyboard = keyboard.Controller()
+        self.mouse = mouse.Controller()
+        self.keys = {name: getattr(Key, name) for name in KEY_NAMES}
+        self.buttons = {'left': Button.left, 'right': Button.right, 'middle': Button.middle}
+
+    def press_key(self, key: str) -> None:
+        self.keyboard.press(self.keys.get(key, key))
+
+    def release_key(self, key: str) -> None:
+        self.keyboard.release(self.keys.get(key, key))
+
+    def type_text(self, text: str) -> None:
+        self.keyboard.type(text)
+
+    def press_button(self, button: str) -> None:
+        self.mouse.press(self.buttons[button])
+
+    def release_button(self, button: str) -> None:
+        self.mouse.release(self.buttons[button])
+
+    def click(self, button: str, count: int = 1) -> None:
+        self.mouse.click(self.buttons[button], count)
+
+    def scroll(self, dx: int, dy: int) -> None:
+        self.mouse.scroll(dx, dy)
+
+    def get_pointer(self) -> Optional[Tuple[int, int]]:
+        return self.mouse.position
+
+    def get_screen_bounds(self) -> Optional[Tuple[int, int, int, int]]:
+        # Through what pynput itself is built on, on each platform
+        system = platform.system()
+        try:
+            if system == "Windows":
+                import ctypes
+                metrics = ctypes.windll.user32.GetSystemMetrics
+                # SM_XVIRTUALSCREEN ... SM_CYVIRTUALSCREEN: the box around all monitors
+                left, top = metrics(76), metrics(77)
+                return (left, top, left + metrics(78), top + metrics(79))
+            if system == "Darwin":
+                import Quartz
+                _, displays, count = Quartz.CGGetActiveDisplayList(16, None, None)
+                rects = [Quartz.CGDisplayBounds(display) for display in displays[:count]]
+                return (int(min(r.origin.x for r in rects)), int(min(r.origin.y for r in rects)),
+                        int(max(r.origin.x + r.size.width for r in rects)),
+                        int(max(r.origin.y + r.size.height for r in rects)))
+            from Xlib import display
+            connection = display.Display()
+            try:
+                screen = connection.screen()
+                return (0, 0, screen.width_in_pixels, screen.height_in_pixels)
+            finally:
+                connection.close()
+        except Exception:
             return None
+
+    def move_pointer(self, position: Tuple[int, int], delta: Tuple[int, int]) -> None:
+        self.mouse.position = position
+
+
+# Linux input event codes (linux/input-event-codes.h)
+EV_SYN, EV_KEY, EV_REL = 0x00, 0x01, 0x02
+SYN_REPORT = 0
+REL_X, REL_Y, REL_HWHEEL, REL_WHEEL = 0x00, 0x01, 0x06, 0x08
+UINPUT_KEYS = {
+    'esc': 1, 'backspace': 14, 'tab': 15, 'enter': 28, 'ctrl': 29, 'shift': 42, 'alt': 56,
+    'space': 57, 'home': 102, 'up': 103, 'page_up': 104, 'left': 105, 'right': 106,
+    'end': 107, 'down': 108, 'page_down': 109, 'delete': 111, 'cmd': 125,
+    'f1': 59, 'f2': 60, 'f3': 61, 'f4': 62, 'f5': 63, 'f6': 64, 'f7': 65, 'f8': 66,
+    'f9': 67, 'f10': 68, 'f11': 87, 'f12': 88,
+}
+UINPUT_BUTTONS = {'left': 0x110, 'right': 0x111, 'middle': 0x112}
+def _us_layout() -> Dict[str, Tuple[int, bool]]:
+    """Key code and shift state for each character on a US keyboard layout"""
+    rows = (
+        ("1234567890-=", "!@#$%^&*()_+", 2),
+        ("qwertyuiop[]", "QWERTYUIOP{}", 16),
+        ("asdfghjkl;'`", 'ASDFGHJKL:"~', 30),
+        ("\\zxcvbnm,./", "|ZXCVBNM<>?", 43),
+    )
+    layout = {' ': (57, False), '\n': (28, False), '\t': (15, False)}
+    for plain, shifted, first_code in rows:
+        for offset, char in enumerate(plain):
+            layout[char] = (first_code + offset, False)
+        for offset, char in enumerate(shifted):
+            layout[char] = (first_code + offset, True)
+    return layout
+
+
+UINPUT_CHARS = _us_layout()
+
+# uinput ioctls (linux/uinput.h)
+UI_SET_EVBIT = 0x40045564
+UI_SET_KEYBIT = 0x40045565
+UI_SET_RELBIT = 0x40045566
+UI_DEV_CREATE = 0x5501
+UI_DEV_DESTROY = 0x5502
+
+# Time for udev and the desktop to pick up a new uinput device; events sent
+# before then are lost
+UINPUT_SETTLE_DELAY = 0.2
+# How long flush() retries while the kernel's event buffer is full before
+# giving up on everything but key and button releases
+UINPUT_WRITE_TIMEOUT = 0.05
+
+
+class UinputBackend(InputBackend):
+    """Write input events straight to /dev/uinput (Linux, works without X11)
+
+    Events are buffered and written with one write() per flush, with a
+    SYN_REPORT closing each group of events that belong together.
+    Text is typed with a US keyboard layout.
+    """
+
+    name = "uinput"
+
+    def __init__(self, path: str = "/dev/uinput"):
+        import fcntl
+        
+        self.event_format = "llHHi"
+        self.event_size = struct.calcsize(self.event_format)
+        self.events = bytearray()
+        self.lock = threading.Lock()
+        try:
+            self.fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            raise RuntimeError(f"Cannot open {path} ({e.strerror}). Load the uinput module and "
+                               f"give your user write access to it, or run as root.")
+        
+        fcntl.ioctl(self.fd, UI_SET_EVBIT, EV_KEY)
+        fcntl.ioctl(self.fd, UI_SET_EVBIT, EV_REL)
+        for code in set(UINPUT_KEYS.values()) | {code for code, _ in UINPUT_CHARS.values()}:
+            fcntl.ioctl(self.fd, UI_SET_KEYBIT, code)
+        for code in UINPUT_BUTTONS.values():
+            fcntl.ioctl(self.fd, UI_SET_KEYBIT, code)
+        for code in (REL_X, REL_Y, REL_WHEEL, REL_HWHEEL):
+            fcntl.ioctl(self.fd, UI_SET_RELBIT, code)
+        
+        # struct uinput_user_dev: name, input_id, ff_effects_max, abs tables
+        device = struct.pack("80sHHHHi", b"micro:bit Keyboard Emu", 0x06, 0x0D28, 0x0001, 1, 0)
+        os.write(self.fd, device + bytes(4 * 64 * 4))
+        fcntl.ioctl(self.fd, UI_DEV_CREATE)
+        self.ioctl = fcntl.ioctl
+        time.sleep(UINPUT_SETTLE_DELAY)
+
+    def emit(self, event_type: int, code: int, value: int) -> None:
+        """Buffer one event; the kernel fills in the timestamp"""
+        self.events += struct.pack(self.event_format, 0, 0, event_type, code, value)
+
+    def key_event(self, key: str, value: int) -> None:
+        """Buffer a key going down (1), up (0) or auto-repeating (2), with shift for shifted characters"""
+        code = UINPUT_KEYS.get(key)
+        shifted = False
+        if code is None:
+            if key not in UINPUT_CHARS:
+                return
+            code, shifted = UINPUT_CHARS[key]
+        
+        with self.lock:
+            if shifted and value == 1:
+                self.emit(EV_KEY, UINPUT_KEYS['shift'], 1)
+            self.emit(EV_KEY, code, value)
+            if shifted and not value:
+                self.emit(EV_KEY, UINPUT_KEYS['shift'], 0)
+            self.emit(EV_SYN, SYN_REPORT, 0)
+
+    def press_key(self, key: str) -> None:
+        self.key_event(key, 1)
+
+    def release_key(self, key: str) -> None:
+        self.key_event(key, 0)
+
+    def repeat_key(self, key: str) -> None:
+        # The kernel and desktop treat value 2 as a repeat, not a new press
+        self.key_event(key, 2)
+
+    def button_event(self, button: str, value: int) -> None:
+        with self.lock:
+            self.emit(EV_KEY, UINPUT_BUTTONS[button], value)
+            self.emit(EV_SYN, SYN_REPORT, 0)
+
+    def press_button(self, button: str) -> None:
+        self.button_event(button, 1)
+
+    def release_button(self, button: str) -> None:
+        self.button_event(button, 0)
+
+    def scroll(self, dx: int, dy: int) -> None:
+        with self.lock:
+            if dx:
+                self.emit(EV_REL, REL_HWHEEL, dx)
+            if dy:
+                self.emit(EV_REL, REL_WHEEL, dy)
+            self.emit(EV_SYN, SYN_REPORT, 0)
+
+    def move_pointer(self, position: Tuple[int, int], delta: Tuple[int, int]) -> None:
+        # uinput pointers are relative; both axes go out in one report
+        with self.lock:
+            if delta[0]:
+                self.emit(EV_REL, REL_X, delta[0])
+            if delta[1]:
+                self.emit(EV_REL, REL_Y, delta[1])
+            self.emit(EV_SYN, SYN_REPORT, 0)
+
+    def flush(self) -> None:
+        with self.lock:
+            if not self.events:
+                return
+            data, self.events = bytes(self.events), bytearray()
+        
+        deadline = time.monotonic() + UINPUT_WRITE_TIMEOUT
+        while data:
+            try:
+                data = data[os.write(self.fd, data):]
+            except BlockingIOError:
+                # The kernel buffer is full: wait a little, then keep only
+                # the releases, so no key or button is left stuck down
+                if time.monotonic() > deadline:
+                    data = self.releases_only(data)
+                time.sleep(0.001)
+
+    def releases_only(self, data: bytes) -> bytes:
+        """The key and button releases among buffered events, each with its SYN_REPORT"""
+        kept = bytearray()
+        size = self.event_size
+        syn = struct.pack(self.event_format, 0, 0, EV_SYN, SYN_REPORT, 0)
+        for offset in range(0, len(data) - size + 1, size):
+            event = data[offset:offset + size]
+            _, _, event_type, _, value = struct.unpack(self.event_format, event)
+            if event_type == EV_KEY and value == 0:
+                kept += event + syn
+        return bytes(kept)
+
+    def close(self) -> None:
+        self.flush()
+        try:
+            self.ioctl(self.fd, UI_DEV_DESTROY)
+        finally:
+            os.close(self.fd)
+
+
+class RecordingBackend(InputBackend):
+    """Discard input, optionally recording it; for benchmarks and tests"""
+
+    name = "null"
+
+    def __init__(self, record: bool = False):
+        self.record = record
+        self.events: List[Tuple[float, str, Any]] = []
+        self.count = 0
+        self.position = (0, 0)
+
+    def add(self, event: str, value: Any) -> None:
+        """Count an event and record it with a perf_counter timestamp"""
+        self.count += 1
+        if self.record:
+            self.events.append((time.perf_counter(), event, value))
+
+    def press_key(self, key: str) -> None:
+        self.add("press", key)
+
+    def release_key(self, key: str) -> None:
+        self.add("release", key)
+
+    def type_text(self, text: str) -> None:
+        self.add("type", text)
+
+    def press_button(self, button: str) -> None:
+        self.add("button_press", button)
+
+    def release_button(self, button: str) -> None:
+        self.add("button_release", button)
+
+    def click(self, button: str, count: int = 1) -> None:
+        self.add("click", (button, count))
+
+    def scroll(self, dx: int, dy: int) -> None:
+        self.add("scroll", (dx, dy))
+
+    def get_pointer(self) -> Optional[Tuple[int, int]]:
+        return self.position
+
+    def move_pointer(self, position: Tuple[int, int], delta: Tuple[int, int]) -> None:
+        self.position = position
+        self.add("move", delta)
+
+
+BACKENDS = {
+    'pynput': PynputBackend,
+    'uinput': UinputBackend,
+    'null': RecordingBackend,
+}
+
+
+class MicrobitKeyboardEmuBridge:
+    """Bridge between BBC micro:bit serial commands and system keyboard/mouse input emulation"""
+
+    def __init__(self, port: Optional[str] = None, debug: bool = False, auto_reconnect: bool = True,
+                 max_baud_rate: int = MAX_BAUD_RATE, all_devices: bool = False,
+                 backend: Optional[InputBackend] = None, stats_interval: float = 0.0,
+                 metrics_port: int = 0, metrics_host: str = "127.0.0.1",
+                 record: Optional[str] = None, sensor_profile: str = 'smooth',
+                 schedule_delay: float = 0.0, max_lag: float = 0.0):
+        self.requested_port = port
+        self.debug = debug
+        self.auto_reconnect = auto_reconnect
+        self.max_baud_rate = max_baud_rate
+        self.all_devices = all_devices
+        self.discovery = PortDiscovery(log=self.log)
+        self.running = False
+        
+        # One link per micro:bit; each has its own reader thread
+        self.links: List[DeviceLink] = []
+        
+        # Latency histograms, only collected when something reads them
+        self.stats_interval = stats_interval
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
+        self.metrics_server: Optional[http.server.HTTPServer] = None
+        self.stats: Optional[BridgeStats] = BridgeStats() if stats_interval or metrics_port else None
+        
+        # Jitter buffer for device-stamped commands, in seconds; 0 injects on arrival.
+        # The scheduler thread sleeps on schedule_ready until the next due time.
+        self.schedule_delay = schedule_delay
+        self.schedule_ready = threading.Condition()
+        self.schedule_sequence = itertools.count()
+        self.scheduler_thread: Optional[threading.Thread] = None
+        self.schedule_in_flight = False
+        self.late_commands = 0
+        
+        # Oldest a sheddable command may be when injected, in seconds; 0 keeps everything
+        self.max_lag = max_lag
+        self.shed_commands = 0
+        
+        # Raw serial reads are appended here with --record
+        self.recorder = SessionRecorder(record) if record else None
+        
+        # Reader threads push parsed commands, one dispatch thread drains them.
+        # With --max-lag the queue is deeper, so stale commands are shed here
+        # instead of piling up unseen in the OS serial buffer.
+        self.queue_limit = SHED_QUEUE_SIZE if max_lag else COMMAND_QUEUE_SIZE
+        self.command_queue: "queue.Queue[Optional[HIDCommand]]" = queue.Queue(maxsize=self.queue_limit)
+        self.dispatch_thread: Optional[threading.Thread] = None
+        
+        # Where keyboard and mouse input goes, pynput unless told otherwise
+        self.backend = backend or PynputBackend()
+        
+        # Held mouse buttons tracking  
+        self.held_mouse_buttons = set()
+        
+        # Virtual cursor: MOVE deltas are applied here instead of re-reading
+        # the OS position before every move
+        self.cursor_position: Optional[Tuple[float, float]] = None
+        self.cursor_synced = 0.0
+        self.cursor_lock = threading.Lock()
+        # Read from the backend on the first move
+        self.screen_bounds: Optional[Tuple[int, int, int, int]] = None
+        self.screen_bounds_read = False
+        
+        # Velocity mode: pixels per second, integrated by the velocity thread
+        self.mouse_velocity = (0.0, 0.0)
+        self.velocity_deadline = 0.0
+        self.velocity_lock = threading.Lock()
+        self.velocity_changed = threading.Event()
+        self.velocity_thread: Optional[threading.Thread] = None
+        
+        # Held keys tracking, and the one key currently auto-repeating
+        self.held_keys: Set[str] = set()
+        self.repeat_key: Optional[str] = None
+        self.repeat_changed = threading.Event()
+        self.repeat_thread: Optional[threading.Thread] = None
+        
+        # Key mappings
+        self.special_keys = {
+            'ENTER': 'enter',
+            'SPACE': 'space',
+            'ESC': 'esc',
+            'ESCAPE': 'esc',  # Allow both ESC and ESCAPE
+            'DELETE': 'delete',
+            'BACKSPACE': 'backspace',
+            'TAB': 'tab',
+            'UP': 'up',
+            'DOWN': 'down',
+            'LEFT': 'left',
+            'RIGHT': 'right',
+            'HOME': 'home',
+            'END': 'end',
+            'PAGE_UP': 'page_up',
+            'PAGE_DOWN': 'page_down',
+            'F1': 'f1', 'F2': 'f2', 'F3': 'f3', 'F4': 'f4',
+            'F5': 'f5', 'F6': 'f6', 'F7': 'f7', 'F8': 'f8',
+            'F9': 'f9', 'F10': 'f10', 'F11': 'f11', 'F12': 'f12',
+        }
         
-        parts = line[4:].split(":", 2)  # Remove "HID:" prefix
+        self.modifier_keys = {
+            'CTRL': 'ctrl',
+            'SHIFT': 'shift',
+            'ALT': 'alt',
+            'WIN': 'cmd',  # Works for both Windows key and Mac Cmd key
+            'CMD': 'cmd',
+        }
+        
+        # Keyed by bytes: mouse payloads are looked up without decoding
+        self.mouse_buttons = {
+            b'LEFT': 'left',
+            b'RIGHT': 'right',
+            b'MIDDLE': 'middle',
+        }
+        
+        # Special and modifier names in one table, so a key is one lookup
+        self.key_names = {**self.special_keys, **self.modifier_keys}
+        # Modifiers are held without auto-repeat
+        self.modifier_names = set(self.modifier_keys.values())
+        
+        # HID:STATE bit -> (is mouse button, backend name), and the state applied:
+        # the OR of every board's last mask
+        self.state_bits = [
+            (True, self.mouse_buttons[name[6:].encode()]) if name.startswith('MOUSE_')
+            else (False, self.parse_single_key(name))
+            for name in STATE_NAMES
+        ]
+        self.state_mask = 0
+        
+        # Raw PRESS/COMBO payload -> resolved key name(s); shortcuts repeat a
+        # lot, so each distinct payload is only parsed once
+        self.resolve_key = functools.lru_cache(maxsize=KEY_CACHE_SIZE)(self.parse_single_key)
+        self.resolve_combo = functools.lru_cache(maxsize=KEY_CACHE_SIZE)(self.parse_combo)
+        
+        # HID:MACRO:<id> -> precompiled (backend call, args) steps, see load_macros()
+        self.macros: Dict[str, List[Tuple[Callable, tuple]]] = {}
+        
+        # HID:SENSOR accelerometer stream -> velocity mode, NumPy permitting.
+        # Each DeviceLink filters its own board's samples with this profile.
+        self.sensor_profile = SENSOR_PROFILES[sensor_profile]
+        self.sensor_warned = False
+
+    def log(self, message: str) -> None:
+        """Log debug messages if debug mode is enabled"""
+        if self.debug:
+            print(f"[DEBUG] {message}")
+
+    def submit(self, commands: List[HIDCommand]) -> None:
+        """Hand parsed input commands to the dispatch thread"""
+        # Blocks while the queue is full, leaving the backlog in the OS buffer
+        for command in commands:
+            if self.max_lag and self.command_queue.full():
+                with self.command_queue.mutex:
+                    self.shed_oldest(self.command_queue.queue)
+            self.command_queue.put(command)
+
+    def submit_threadsafe(self, commands: List[HIDCommand]) -> None:
+        """submit() from a thread other than the readers, e.g. the scheduler"""
+        self.submit(commands)
+
+    def shed_oldest(self, backlog) -> bool:
+        """Make room in a full --max-lag backlog by dropping its oldest move, scroll or sensor block"""
+        for index, command in enumerate(backlog):
+            # VELs stay, the last one may be a stop
+            if command is not None and (command.type, command.action) in SHEDDABLE_COMMANDS \
+                    and command.action != 'VEL':
+                del backlog[index]
+                self.shed_commands += 1
+                return True
+        return False
+
+    def call_later(self, delay: float, callback: Callable, *args) -> threading.Timer:
+        """Run callback after delay seconds on a timer thread"""
+        timer = threading.Timer(delay, callback, args=args)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+
+
+    def find_microbit_port(self) -> Optional[str]:
+        """Auto-detect micro:bit serial port across platforms"""
+        self.log("Searching for micro:bit...")
+        return self.discovery.find_port()
+
+    def parse_command(self, line: Union[str, bytes]) -> Optional[HIDCommand]:
+        """Parse HID command from a single serial line"""
+        if isinstance(line, str):
+            line = line.encode('utf-8')
         
-        if len(parts) < 2:
+        match = HID_LINE_PATTERN.match(line.strip() + b"\n")
+        if not match:
             return None
         
-        command = {
-            'type': parts[0],
-            'action': parts[1],
-            'data': parts[2] if len(parts) > 2 else ""
-        }
-        
+        command = make_command(*match.groups(b""))
         self.log(f"Parsed command: {command}")
         return command
 
-    def handle_keyboard_command(self, action: str, data: str) -> None:
+    def handle_keyboard_command(self, action: str, data: Union[str, bytes]) -> None:
         """Handle keyboard-related commands with new protocol"""
         try:
             if action == "TYPE":
                 # Type text string
                 self.log(f"Typing text: '{data}' (length: {len(data)})")
-                self.keyboard_controller.type(data)
+                self.backend.type_text(data)
                 
             elif action == "PRESS":
                 # Press and immediately release a single key
-                key = self.parse_single_key(data)
+                key = self.resolve_key(data)
                 if key:
-                    self.log(f"Pressing key: {data} -> {key}")
-                    self.keyboard_controller.press(key)
-                    self.keyboard_controller.release(key)
+                    self.log(f"Pressing key: {data!r} -> {key}")
+                    self.backend.press_key(key)
+                    self.backend.release_key(key)
                 else:
-                    self.log(f"Invalid single key: {data}")
+                    self.log(f"Invalid single key: {data!r}")
                     
             elif action == "COMBO":
                 # Handle key combinations (e.g., "CTRL+C")
                 self.handle_key_combination(data)
+                
+            elif action == "HOLD":
+                # Hold a key down until RELEASE, repeating it like a real keyboard
+                key = self.resolve_key(data)
+                if key:
+                    self.hold_key(key)
+                        
+            elif action == "RELEASE":
+                if data.strip().upper() == b"ALL":
+                    self.release_held_keys()
+                else:
+                    key = self.resolve_key(data)
+                    if key in self.held_keys:
+                        self.release_held_key(key)
+                        
+            elif action == "REPEAT":
+                # Posted by the repeat thread; a RELEASE may have overtaken it
+                if data == self.repeat_key:
+                    self.backend.repeat_key(data)
                         
         except Exception as e:
             self.log(f"Keyboard command error: {e}")
 
-    def parse_single_key(self, key_str: str) -> Any:
-        """Parse a single key string into pynput key object"""
+    def parse_single_key(self, key_str: Union[str, bytes]) -> Optional[str]:
+        """Parse a single key string into a backend key name or character"""
+        if isinstance(key_str, bytes):
+            key_str = key_str.decode('ascii', errors='ignore')
+        key_str = key_str.strip()
         if not key_str:
             return None
-            
-        key_upper = key_str.upper()
         
-        # Check special keys first
-        if key_upper in self.special_keys:
-            return self.special_keys[key_upper]
-            
-        # Check modifier keys
-        if key_upper in self.modifier_keys:
-            return self.modifier_keys[key_upper]
+        # Special or modifier key
+        name = self.key_names.get(key_str.upper())
+        if name:
+            return name
             
         # Single character key
         if len(key_str) == 1:
@@ -294,96 +2131,413 @@ class MicrobitKeyboardEmuBridge:
             
         return None
 
-    def handle_key_combination(self, combo: str) -> None:
-        """Handle key combinations like CTRL+C"""
-        parts = combo.split("+")
-        keys_to_press = []
-        
-        for part in parts:
+    def parse_combo(self, combo: Union[str, bytes]) -> Tuple[str, ...]:
+        """Parse a combination like CTRL+C into backend key names"""
+        if isinstance(combo, bytes):
+            combo = combo.decode('ascii', errors='ignore')
+        keys = []
+        for part in combo.split("+"):
             part = part.strip().upper()
-            if part in self.modifier_keys:
-                keys_to_press.append(self.modifier_keys[part])
-            elif part in self.special_keys:
-                keys_to_press.append(self.special_keys[part])
+            name = self.key_names.get(part)
+            if name:
+                keys.append(name)
             elif len(part) == 1:
-                keys_to_press.append(part.lower())
+                keys.append(part.lower())
+        return tuple(keys)
+
+    def hold_key(self, key: str) -> None:
+        """Press and keep holding a key, auto-repeating it unless it is a modifier"""
+        if key in self.held_keys:
+            return
+        self.log(f"Holding key: {key}")
+        self.backend.press_key(key)
+        self.held_keys.add(key)
+        if key not in self.modifier_names:
+            self.set_repeat_key(key)
+
+    def release_held_key(self, key: str) -> None:
+        """Release one held key and stop repeating it"""
+        if self.repeat_key == key:
+            self.set_repeat_key(None)
+        self.held_keys.discard(key)
+        self.backend.release_key(key)
+
+    def release_held_keys(self) -> None:
+        """Release every held key"""
+        for key in self.held_keys.copy():
+            self.release_held_key(key)
+
+    def set_repeat_key(self, key: Optional[str]) -> None:
+        """Choose the key to auto-repeat, starting the repeat thread if needed"""
+        self.repeat_key = key
+        if key and (not self.repeat_thread or not self.repeat_thread.is_alive()):
+            self.repeat_thread = threading.Thread(
+                target=self.run_key_repeat,
+                name="microbit-key-repeat",
+                daemon=True
+            )
+            self.repeat_thread.start()
+        self.repeat_changed.set()
+
+    def run_key_repeat(self) -> None:
+        """Repeat thread: re-press the held key after a delay, then at a fixed rate"""
+        while self.running:
+            self.repeat_changed.wait()
+            self.repeat_changed.clear()
+            
+            key = self.repeat_key
+            delay = KEY_REPEAT_DELAY
+            while key and self.running:
+                # Any HOLD or RELEASE restarts the delay, as on a real keyboard
+                if self.repeat_changed.wait(delay):
+                    break
+                # Through the dispatcher, so the backend is only ever used from one thread
+                self.submit_threadsafe([HIDCommand('KEY', 'REPEAT', key)])
+                delay = 1.0 / KEY_REPEAT_RATE
+
+    def apply_state(self, mask_hex: str, source: Optional[DeviceLink] = None) -> None:
+        """Handle HID:STATE: press or release whatever changed since the last state"""
+        try:
+            mask = int(mask_hex or "0", 16)
+        except ValueError:
+            self.log(f"Invalid state mask: {mask_hex!r}")
+            return
+        
+        if source is not None:
+            # Each board owns its mask; a key is down while any board holds it
+            source.state_mask = mask
+            for link in self.links:
+                mask |= link.state_mask
+        
+        changed = mask ^ self.state_mask
+        if not changed:
+            # Periodic or repeated states cost nothing
+            return
+        self.state_mask = mask
+        
+        # Releases first, so a changed modifier never leaks into a new press
+        for pressed in (False, True):
+            bits = changed & mask if pressed else changed & ~mask
+            while bits:
+                low = bits & -bits
+                bits ^= low
+                bit = low.bit_length() - 1
+                if bit >= len(self.state_bits):
+                    continue
+                is_button, name = self.state_bits[bit]
+                if is_button:
+                    if pressed:
+                        self.backend.press_button(name)
+                        self.held_mouse_buttons.add(name)
+                    elif name in self.held_mouse_buttons:
+                        self.backend.release_button(name)
+                        self.held_mouse_buttons.discard(name)
+                elif pressed:
+                    self.hold_key(name)
+                elif name in self.held_keys:
+                    self.release_held_key(name)
+
+    def handle_key_combination(self, combo: Union[str, bytes]) -> None:
+        """Handle key combinations like CTRL+C"""
+        keys_to_press = self.resolve_combo(combo)
         
         # Press all keys
         for key in keys_to_press:
-            self.keyboard_controller.press(key)
+            self.backend.press_key(key)
         
         # Release in reverse order
         for key in reversed(keys_to_press):
-            self.keyboard_controller.release(key)
+            self.backend.release_key(key)
+
+    def load_macros(self, path: str) -> None:
+        """Load and compile a JSON macro table: {"<id>": "text" or [steps...]}"""
+        with open(path, encoding="utf-8") as f:
+            table = json.load(f)
+        if not isinstance(table, dict):
+            raise ValueError(f"{path}: expected an object mapping macro IDs to macros")
+        
+        macros = {}
+        for macro_id, steps in table.items():
+            macro_id = str(macro_id).strip().upper()
+            if not macro_id or ":" in macro_id or ";" in macro_id:
+                raise ValueError(f"{path}: macro ID {macro_id!r} must be non-empty without ':' or ';'")
+            try:
+                macros[macro_id] = self.compile_macro(steps)
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"{path}: macro {macro_id}: {e}")
+        
+        self.macros = macros
+        print(f"🧩 Loaded {len(macros)} macro(s) from {path}")
+
+    def compile_macro(self, steps: Union[str, List[Any]]) -> List[Tuple[Callable, tuple]]:
+        """Resolve macro steps into backend calls, so playback does no parsing"""
+        if isinstance(steps, str):
+            steps = [steps]
+        if not isinstance(steps, list):
+            raise ValueError("expected a text snippet or a list of steps")
+        
+        backend = self.backend
+        compiled = []
+        for step in steps:
+            # A bare string is a text snippet
+            if isinstance(step, str):
+                step = {"type": step}
+            if not isinstance(step, dict) or len(step) != 1:
+                raise ValueError(f"each step needs exactly one action: {step!r}")
+            (action, value), = step.items()
+            
+            if action == "type":
+                compiled.append((backend.type_text, (str(value),)))
+                
+            elif action == "press":
+                key = self.parse_single_key(str(value))
+                if not key:
+                    raise ValueError(f"unknown key {value!r}")
+                compiled += [(backend.press_key, (key,)), (backend.release_key, (key,))]
+                
+            elif action == "combo":
+                # One combination, or a list of them pressed one after another
+                for combo in ([value] if isinstance(value, str) else value):
+                    keys = self.parse_combo(str(combo))
+                    if not keys:
+                        raise ValueError(f"empty combination {combo!r}")
+                    compiled += [(backend.press_key, (key,)) for key in keys]
+                    compiled += [(backend.release_key, (key,)) for key in reversed(keys)]
+                    
+            elif action == "move":
+                dx, dy = value
+                compiled.append((self.move_mouse, (float(dx), float(dy))))
+                
+            elif action in ("click", "double_click", "hold", "release"):
+                button = self.mouse_buttons.get(str(value).upper().encode())
+                if not button:
+                    raise ValueError(f"unknown mouse button {value!r}")
+                if action == "click":
+                    compiled.append((backend.click, (button,)))
+                elif action == "double_click":
+                    compiled.append((backend.click, (button, 2)))
+                elif action == "hold":
+                    # Tracked like HID:MOUSE:HOLD, so moves drag and cleanup releases it
+                    compiled.append((self.hold_mouse_button, (button,)))
+                else:
+                    compiled.append((self.release_mouse_button, (button,)))
+                    
+            elif action == "scroll":
+                compiled.append((backend.scroll, (0, int(value))))
+                
+            elif action == "delay":
+                # Seconds; buffered input goes out before the pause
+                compiled += [(backend.flush, ()), (time.sleep, (float(value),))]
+                
+            else:
+                raise ValueError(f"unknown step {action!r}")
+        
+        return compiled
+
+    def run_macro(self, macro_id: str) -> None:
+        """Replay a precompiled macro"""
+        steps = self.macros.get(macro_id)
+        if steps is None:
+            self.log(f"Unknown macro: {macro_id}")
+            return
+        
+        self.log(f"Running macro {macro_id} ({len(steps)} steps)")
+        for call, args in steps:
+            call(*args)
+
+    def handle_sensor_command(self, action: str, data: bytes, source: Optional[DeviceLink] = None) -> None:
+        """Handle HID:SENSOR:ACC sample blocks and HID:SENSOR:CAL from the board source"""
+        if np is None:
+            if not self.sensor_warned:
+                print("⚠️  HID:SENSOR needs NumPy (pip install numpy), ignoring accelerometer samples")
+                self.sensor_warned = True
+            return
+        if source is None:
+            return
+        
+        if action == 'CAL':
+            self.log(f"{source.tag}Sensor recalibrating")
+            source.sensor.reset()
+        elif action == 'ACC':
+            velocity = source.sensor.feed(SensorPipeline.parse(data), time.monotonic())
+            if velocity is not None:
+                self.set_mouse_velocity(*velocity)
 
-    def handle_mouse_command(self, action: str, data: str) -> None:
+    def handle_mouse_command(self, action: str, data: bytes) -> None:
         """Handle mouse-related commands"""
         try:
+            if isinstance(data, str):
+                data = data.encode('ascii', errors='ignore')
+            data = data.strip()
+            
             if action == "MOVE":
                 # Move mouse relatively - handle decimal numbers from MakeCode
-                x, y = map(float, data.split(","))
-                x, y = int(round(x)), int(round(y))  # Round to nearest integer
-                current_x, current_y = self.mouse_controller.position
-                new_x, new_y = current_x + x, current_y + y
-                self.log(f"Mouse MOVE: ({x},{y}) -> from ({current_x},{current_y}) to ({new_x},{new_y})")
-                self.mouse_controller.position = (new_x, new_y)
+                self.move_mouse(*parse_move(data))
+                
+            elif action == "VEL":
+                # Keep moving at vx,vy pixels per second until told otherwise
+                self.set_mouse_velocity(*parse_move(data))
+                
+            elif action == "TICK":
+                # Posted by the velocity thread; a stop may have overtaken it
+                vx, vy = self.mouse_velocity
+                if vx or vy:
+                    elapsed = float(data)
+                    self.move_mouse(vx * elapsed, vy * elapsed, log=False)
                 
             elif action == "CLICK":
                 # Single click
                 button = self.mouse_buttons.get(data.upper())
                 if button:
-                    self.log(f"Mouse CLICK: {data.upper()} button")
-                    self.mouse_controller.click(button)
+                    self.log(f"Mouse CLICK: {data.upper()!r} button")
+                    self.backend.click(button)
                 else:
-                    self.log(f"Unknown mouse button: {data.upper()}")
+                    self.log(f"Unknown mouse button: {data.upper()!r}")
                     
             elif action == "DOUBLE_CLICK":
                 # Double click
-                self.mouse_controller.click(Button.left, 2)
+                self.backend.click('left', 2)
                 
             elif action == "SCROLL":
                 # Scroll wheel
-                scroll_amount = int(data)
-                self.mouse_controller.scroll(0, scroll_amount)
+                self.backend.scroll(0, int(data))
                 
-            elif action == "HOLD":
-                # Hold mouse button
+            elif action in ("HOLD", "PRESS"):
+                # Hold mouse button (serialMouse.pressMouse sends PRESS)
                 button = self.mouse_buttons.get(data.upper())
                 if button:
-                    self.mouse_controller.press(button)
-                    self.held_mouse_buttons.add(button)
+                    self.hold_mouse_button(button)
                     
             elif action == "RELEASE":
-                if data.upper() == "ALL":
+                if data.upper() == b"ALL":
                     # Release all held buttons
                     for button in self.held_mouse_buttons.copy():
-                        self.mouse_controller.release(button)
-                        self.held_mouse_buttons.remove(button)
+                        self.release_mouse_button(button)
                 else:
                     # Release specific button
                     button = self.mouse_buttons.get(data.upper())
                     if button and button in self.held_mouse_buttons:
-                        self.mouse_controller.release(button)
-                        self.held_mouse_buttons.remove(button)
+                        self.release_mouse_button(button)
                         
         except Exception as e:
             self.log(f"Mouse command error: {e}")
 
-    def handle_system_command(self, action: str, data: str) -> None:
-        """Handle system-related commands"""
-        if action == "PING":
-            # Respond to ping
-            if self.serial_conn:
-                try:
-                    self.serial_conn.write(b"HID:PONG\n")
-                except:
-                    pass
+    def hold_mouse_button(self, button: str) -> None:
+        """Press and keep holding a mouse button"""
+        self.backend.press_button(button)
+        self.held_mouse_buttons.add(button)
+
+    def release_mouse_button(self, button: str) -> None:
+        """Release a mouse button and stop tracking it as held"""
+        self.held_mouse_buttons.discard(button)
+        self.backend.release_button(button)
+
+    def move_mouse(self, dx: float, dy: float, log: bool = True) -> None:
+        """Move the cursor relative to the tracked virtual cursor position"""
+        with self.cursor_lock:
+            now = time.monotonic()
+            if not self.screen_bounds_read:
+                self.screen_bounds = self.backend.get_screen_bounds()
+                self.screen_bounds_read = True
+            if self.cursor_position is None or now - self.cursor_synced > CURSOR_RESYNC_INTERVAL:
+                self.sync_cursor(now)
+            
+            # Keep fractions in the virtual position so small moves add up
+            current_x, current_y = self.cursor_position
+            new_x, new_y = current_x + dx, current_y + dy
+            bounds = self.screen_bounds
+            if bounds is not None:
+                # Stop at the screen edge like the OS does, so moving back starts at once
+                new_x = min(max(new_x, bounds[0]), bounds[2] - 1)
+                new_y = min(max(new_y, bounds[1]), bounds[3] - 1)
+            if log:
+                self.log(f"Mouse MOVE: ({dx:g},{dy:g}) -> from ({current_x:g},{current_y:g}) to ({new_x:g},{new_y:g})")
+            
+            target = (int(round(new_x)), int(round(new_y)))
+            start = (int(round(current_x)), int(round(current_y)))
+            if target != start:
+                self.backend.move_pointer(target, (target[0] - start[0], target[1] - start[1]))
+            self.cursor_position = (new_x, new_y)
+            
+            if bounds is not None and (target[0] - bounds[0] < CURSOR_EDGE_MARGIN
+                                       or bounds[2] - 1 - target[0] < CURSOR_EDGE_MARGIN
+                                       or target[1] - bounds[1] < CURSOR_EDGE_MARGIN
+                                       or bounds[3] - 1 - target[1] < CURSOR_EDGE_MARGIN):
+                # Monitors of different sizes leave parts of the box off screen
+                self.sync_cursor(now)
 
-    def process_command(self, command: Dict[str, Any]) -> None:
+    def sync_cursor(self, now: float) -> None:
+        """Follow the OS pointer if it is not where the virtual cursor is (cursor_lock held)"""
+        self.cursor_synced = now
+        actual = self.backend.get_pointer()
+        if actual is None:
+            # Relative-only backends cannot tell, keep the virtual position
+            if self.cursor_position is None:
+                self.cursor_position = (0.0, 0.0)
+            return
+        
+        position = self.cursor_position
+        if position is None or (int(round(position[0])), int(round(position[1]))) != \
+                (int(round(actual[0])), int(round(actual[1]))):
+            self.cursor_position = (float(actual[0]), float(actual[1]))
+
+    def set_mouse_velocity(self, vx: float, vy: float) -> None:
+        """Set the velocity-mode cursor speed in pixels per second"""
+        self.log(f"Mouse VEL: ({vx:g},{vy:g}) px/s")
+        with self.velocity_lock:
+            self.mouse_velocity = (vx, vy)
+            self.velocity_deadline = time.monotonic() + VELOCITY_TIMEOUT
+        
+        if not self.velocity_thread or not self.velocity_thread.is_alive():
+            self.velocity_thread = threading.Thread(
+                target=self.run_velocity,
+                name="microbit-velocity",
+                daemon=True
+            )
+            self.velocity_thread.start()
+        self.velocity_changed.set()
+
+    def run_velocity(self) -> None:
+        """Velocity thread: move the cursor at a fixed tick rate while a velocity is set"""
+        period = 1.0 / VELOCITY_TICK_RATE
+        last_tick = time.monotonic()
+        
+        while self.running:
+            vx, vy = self.mouse_velocity
+            if vx == 0 and vy == 0:
+                # Nothing to do, sleep until the next VEL command
+                self.velocity_changed.wait()
+                self.velocity_changed.clear()
+                last_tick = time.monotonic()
+                continue
+            
+            next_tick = last_tick + period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            
+            now = time.monotonic()
+            velocity, deadline = self.mouse_velocity, self.velocity_deadline
+            if now > deadline:
+                # The micro:bit stopped refreshing, e.g. it was unplugged.
+                # A VEL that arrived since the check keeps the cursor going.
+                with self.velocity_lock:
+                    if self.mouse_velocity == velocity and self.velocity_deadline == deadline:
+                        self.log("Mouse VEL timed out, stopping cursor")
+                        self.mouse_velocity = (0.0, 0.0)
+                continue
+            
+            elapsed = now - last_tick
+            last_tick = now
+            # Through the dispatcher, so the backend is only ever used from one thread
+            self.submit_threadsafe([HIDCommand('MOUSE', 'TICK', b"%r" % elapsed)])
+
+    def process_command(self, command: HIDCommand) -> None:
         """Process a parsed HID command"""
-        cmd_type = command['type'].upper()
-        action = command['action'].upper()  
-        data = command['data']
+        # Type and action names are already upper-case from make_command
+        cmd_type = command.type
+        action = command.action
+        data = command.data
         
         # New keyboard commands: HID:KEY:TYPE:text, HID:KEY:PRESS:a, HID:KEY:HOLD:SHIFT, etc.
         if cmd_type == 'KEY':
@@ -392,81 +2546,870 @@ class MicrobitKeyboardEmuBridge:
         elif cmd_type == 'MOUSE':
             self.handle_mouse_command(action, data)
             
-        elif cmd_type in ['INIT', 'SYSTEM', 'PING']:
-            self.handle_system_command(action, data)
+        elif cmd_type == 'MACRO':
+            # HID:MACRO:<id> - the ID ends up as the action
+            self.run_macro(action)
+            
+        elif cmd_type == 'STATE':
+            # HID:STATE:<hex> - likewise the mask
+            self.apply_state(action, getattr(command, 'source', None))
+            
+        elif cmd_type == 'SENSOR':
+            self.handle_sensor_command(action, data, getattr(command, 'source', None))
+
+    def process_batch(self, commands: List[HIDCommand]) -> None:
+        """Process queued commands, merging runs of MOVE or SCROLL into one injection"""
+        move_x = move_y = 0.0
+        moves = 0
+        scroll = 0
+        scrolls = 0
+        # Queued accelerometer blocks from one board go through its sensor pipeline as one
+        sensor_blocks: List[bytes] = []
+        sensor_source: Optional[DeviceLink] = None
+        dispatched = time.perf_counter() if self.stats is not None else 0.0
+        if self.max_lag and commands:
+            commands = self.shed_stale(commands)
+        
+        for command in commands:
+            if self.debug:
+                self.log(f"Parsed command: {command}")
+            
+            try:
+                if command.type == 'MOUSE' and command.action == 'MOVE':
+                    if scrolls:
+                        self.backend.scroll(0, scroll)
+                        scroll = scrolls = 0
+                    dx, dy = parse_move(command.data)
+                    move_x += dx
+                    move_y += dy
+                    moves += 1
+                    continue
+                
+                if command.type == 'MOUSE' and command.action == 'SCROLL':
+                    if moves:
+                        self.move_mouse(move_x, move_y)
+                        move_x = move_y = 0.0
+                        moves = 0
+                    scroll += int(command.data)
+                    scrolls += 1
+                    continue
+                
+                if command.type == 'SENSOR' and command.action == 'ACC':
+                    source = getattr(command, 'source', None)
+                    if sensor_blocks and source is not sensor_source:
+                        # Never mix two boards' samples in one pipeline
+                        self.handle_sensor_command('ACC', b";".join(sensor_blocks), sensor_source)
+                        sensor_blocks = []
+                    sensor_source = source
+                    sensor_blocks.append(command.data)
+                    continue
+                
+                # Anything else (clicks, holds, keys) keeps its place in the order
+                if sensor_blocks:
+                    self.handle_sensor_command('ACC', b";".join(sensor_blocks), sensor_source)
+                    sensor_blocks = []
+                if moves:
+                    self.move_mouse(move_x, move_y)
+                    move_x = move_y = 0.0
+                    moves = 0
+                if scrolls:
+                    self.backend.scroll(0, scroll)
+                    scroll = scrolls = 0
+                self.process_command(command)
+            except Exception as e:
+                self.log(f"Processing error: {e}")
+                if self.stats is not None:
+                    self.stats.errors += 1
+        
+        try:
+            if sensor_blocks:
+                self.handle_sensor_command('ACC', b";".join(sensor_blocks), sensor_source)
+            if moves:
+                if moves > 1:
+                    self.log(f"Coalesced {moves} MOVE commands")
+                self.move_mouse(move_x, move_y)
+            if scrolls:
+                self.backend.scroll(0, scroll)
+            self.backend.flush()
+        except Exception as e:
+            self.log(f"Processing error: {e}")
+        
+        if self.stats is not None:
+            self.stats.record_batch(commands, dispatched, time.perf_counter())
+
+    def shed_stale(self, commands: List[HIDCommand]) -> List[HIDCommand]:
+        """Drop queued motion that is older than max_lag; the rest keeps its order"""
+        now = time.perf_counter()
+        cutoff = now - self.max_lag
+        
+        # Later VELs replace earlier ones, but the last one (maybe a stop) must stay
+        last_velocity = max((index for index, command in enumerate(commands)
+                             if command.type == 'MOUSE' and command.action == 'VEL'), default=-1)
+        # Moves made with a button down are drags, which keep their path
+        buttons = set(self.held_mouse_buttons)
+        kept = []
+        oldest = now
+        for index, command in enumerate(commands):
+            key = (command.type, command.action)
+            if key in SHEDDABLE_COMMANDS:
+                # Each command's own age counts; bridge-made commands have none
+                received = getattr(command, 'received', now)
+                if received < cutoff and index != last_velocity and not (buttons and key == ('MOUSE', 'MOVE')):
+                    oldest = min(oldest, received)
+                    continue
+            elif command.type == 'MOUSE' and command.action in ('HOLD', 'PRESS', 'RELEASE'):
+                button = self.mouse_buttons.get(command.data.upper())
+                if command.action != 'RELEASE':
+                    buttons.add(button)
+                elif command.data.upper() == b"ALL":
+                    buttons.clear()
+                else:
+                    buttons.discard(button)
+                buttons.discard(None)
+            kept.append(command)
+        
+        shed = len(commands) - len(kept)
+        if shed:
+            self.shed_commands += shed
+            self.log(f"Shed {shed} stale commands, the oldest was {(now - oldest) * 1000:.0f} ms old")
+        return kept
+
+    def run_scheduler(self) -> None:
+        """Scheduler thread: submit held stamped commands as they fall due"""
+        while self.running:
+            with self.schedule_ready:
+                now = time.perf_counter()
+                ready = []
+                next_due = None
+                for link in list(self.links):
+                    heap = link.scheduled
+                    while heap and heap[0][0] <= now:
+                        ready.append(heapq.heappop(heap))
+                    if heap and (next_due is None or heap[0][0] < next_due):
+                        next_due = heap[0][0]
+                if not ready:
+                    # Sleep until the next due time, or until something is scheduled
+                    self.schedule_ready.wait(None if next_due is None else next_due - now)
+                    continue
+                self.schedule_in_flight = True
+            
+            # Outside the lock, so a full queue never holds up the readers
+            ready.sort(key=lambda item: item[:2])
+            self.submit_threadsafe([command for _, _, command in ready])
+            with self.schedule_ready:
+                self.schedule_in_flight = False
+                self.schedule_ready.notify_all()
+
+    def take_scheduled(self) -> List[HIDCommand]:
+        """Remove and return every held stamped command, in due order"""
+        with self.schedule_ready:
+            # Let a batch the scheduler is submitting go first
+            self.schedule_ready.wait_for(lambda: not self.schedule_in_flight, timeout=1.0)
+            held = []
+            for link in self.links:
+                held.extend(link.scheduled)
+                link.scheduled = []
+            self.schedule_ready.notify_all()
+        held.sort(key=lambda item: item[:2])
+        return [command for _, _, command in held]
+
+    def wait_scheduled(self) -> None:
+        """Block until the scheduler has submitted every held command"""
+        with self.schedule_ready:
+            self.schedule_ready.wait_for(
+                lambda: not self.schedule_in_flight and not any(link.scheduled for link in self.links))
+
+    def dispatch_commands(self) -> None:
+        """Dispatch thread: process queued commands until a None sentinel arrives"""
+        while True:
+            command = self.command_queue.get()
+            if command is None:
+                break
+            
+            # Take the whole backlog in one go so runs of moves can be merged
+            batch = [command]
+            stop = False
+            while True:
+                try:
+                    command = self.command_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if command is None:
+                    stop = True
+                    break
+                batch.append(command)
+            
+            self.process_batch(batch)
+            self.grant_credits()
+            if stop:
+                break
+
+    def queue_depth(self) -> int:
+        """Commands received but not injected yet"""
+        return self.command_queue.qsize()
+
+    def grant_credits(self) -> None:
+        """Hand freed queue slots back to micro:bits using credit flow control"""
+        for link in self.links:
+            if link.credit_flow:
+                link.grant_credits()
+
+    def link_totals(self) -> Dict[str, int]:
+        """Serial counters summed over all links"""
+        return {
+            'bytes_in': sum(link.bytes_in for link in self.links),
+            'malformed': sum(link.malformed_lines + link.text_framer.malformed for link in self.links),
+            'dropped_frames': sum(link.dropped_frames for link in self.links),
+            'reconnects': sum(max(link.connects - 1, 0) for link in self.links),
+        }
+
+    def start_stats_reporter(self) -> None:
+        """Start printing a stats summary every stats_interval seconds"""
+        if not self.stats_interval:
+            return
+        threading.Thread(target=self.report_stats, name="microbit-stats", daemon=True).start()
+
+    def report_stats(self) -> None:
+        """Stats thread: print what happened since the last summary"""
+        previous = self.stats.snapshot()
+        previous_totals = self.link_totals()
+        previous_totals['errors'] = self.stats.errors
+        previous_totals['late'] = self.late_commands
+        previous_totals['shed'] = self.shed_commands
+        last = time.monotonic()
+        
+        while self.running:
+            time.sleep(self.stats_interval)
+            now = time.monotonic()
+            elapsed, last = now - last, now
+            current = self.stats.snapshot()
+            totals = self.link_totals()
+            totals['errors'] = self.stats.errors
+            totals['late'] = self.late_commands
+            totals['shed'] = self.shed_commands
+            
+            counts = {key: stages['total'].since(previous[key]['total']) if key in previous else stages['total']
+                      for key, stages in current.items()}
+            commands = sum(histogram.total for histogram in counts.values())
+            delta = {name: totals[name] - previous_totals[name] for name in totals}
+            print(f"📊 Stats, last {elapsed:.1f} s: {commands / elapsed:.0f} commands/s, "
+                  f"{delta['bytes_in'] / elapsed / 1024:.1f} KB/s in, queue {self.queue_depth()}, "
+                  f"malformed {delta['malformed']}, dropped frames {delta['dropped_frames']}, "
+                  f"errors {delta['errors']}, reconnects {delta['reconnects']}"
+                  + (f", late {delta['late']}" if self.schedule_delay else "")
+                  + (f", shed {delta['shed']}" if self.max_lag else ""))
+            
+            for key in sorted(counts):
+                total = counts[key]
+                if not total.total:
+                    continue
+                stages = {stage: histogram.since(previous[key][stage]) if key in previous else histogram
+                          for stage, histogram in current[key].items()}
+                print(f"   {' '.join(key):<18} {total.total / elapsed:7.0f}/s  "
+                      f"p50 {total.percentile(0.50) * 1000:6.2f} ms  "
+                      f"p95 {total.percentile(0.95) * 1000:6.2f} ms  "
+                      f"p99 {total.percentile(0.99) * 1000:6.2f} ms  "
+                      f"(p50 parse {stages['parse'].percentile(0.5) * 1000:.2f}, "
+                      f"queue {stages['queue'].percentile(0.5) * 1000:.2f}, "
+                      f"inject {stages['inject'].percentile(0.5) * 1000:.2f} ms)")
+            
+            previous, previous_totals = current, totals
+
+    def metrics_text(self) -> str:
+        """Prometheus text exposition of the bridge counters and histograms"""
+        snapshot = self.stats.snapshot()
+        lines = []
+        
+        def family(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+        
+        family("microbit_commands_total", "counter", "Input commands injected, by command type")
+        for (cmd_type, action), stages in sorted(snapshot.items()):
+            lines.append(f'microbit_commands_total{{type="{cmd_type}",action="{action}"}} {stages["total"].total}')
+        
+        family("microbit_command_latency_seconds", "histogram",
+               "Time per stage: parse, queue, inject (dispatch to backend return) and total")
+        for (cmd_type, action), stages in sorted(snapshot.items()):
+            for stage, histogram in stages.items():
+                labels = f'type="{cmd_type}",action="{action}",stage="{stage}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'microbit_command_latency_seconds_bucket{{{labels},le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'microbit_command_latency_seconds_bucket{{{labels},le="+Inf"}} {histogram.total}')
+                lines.append(f'microbit_command_latency_seconds_sum{{{labels}}} {histogram.sum:.9f}')
+                lines.append(f'microbit_command_latency_seconds_count{{{labels}}} {histogram.total}')
+        
+        family("microbit_command_errors_total", "counter", "Commands whose handler raised an error")
+        lines.append(f"microbit_command_errors_total {self.stats.errors}")
+        
+        family("microbit_commands_late_total", "counter",
+               "Device-stamped commands dispatched after their scheduled time")
+        lines.append(f"microbit_commands_late_total {self.late_commands}")
+        
+        family("microbit_commands_shed_total", "counter",
+               "Stale MOVE, SCROLL, VEL and SENSOR commands dropped by --max-lag")
+        lines.append(f"microbit_commands_shed_total {self.shed_commands}")
+        
+        family("microbit_queue_depth", "gauge", "Commands received but not injected yet")
+        lines.append(f"microbit_queue_depth {self.queue_depth()}")
+        
+        family("microbit_last_command_age_seconds", "gauge", "Seconds since the last injected command")
+        last = self.stats.last_command
+        lines.append(f"microbit_last_command_age_seconds {time.monotonic() - last if last else float('nan')}")
+        
+        per_link = (
+            ("microbit_connected", "gauge", "1 while the serial port is open",
+             lambda link: int(link.is_connected())),
+            ("microbit_connects_total", "counter", "Times the serial port was opened",
+             lambda link: link.connects),
+            ("microbit_serial_bytes_total", "counter", "Bytes read from the serial port",
+             lambda link: link.bytes_in),
+            ("microbit_baud_rate", "gauge", "Current serial link speed",
+             lambda link: link.baud_rate),
+            ("microbit_parse_failures_total", "counter", "Malformed text lines and corrupted binary frames",
+             lambda link: link.malformed_lines + link.text_framer.malformed + link.dropped_frames),
+        )
+        for name, kind, help_text, value in per_link:
+            family(name, kind, help_text)
+            for link in list(self.links):
+                lines.append(f'{name}{{device="{link.port or ""}"}} {value(link)}')
+        
+        return "\n".join(lines) + "\n"
+
+    def start_metrics_server(self) -> None:
+        """Serve metrics_text() over HTTP on its own thread"""
+        if not self.metrics_port:
+            return
+        
+        bridge = self
+        
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = bridge.metrics_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                bridge.log(f"Metrics request: {format % args}")
+        
+        class MetricsServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+            daemon_threads = True
+        
+        try:
+            self.metrics_server = MetricsServer((self.metrics_host, self.metrics_port), MetricsHandler)
+        except OSError as e:
+            print(f"⚠️  Metrics endpoint not started on {self.metrics_host}:{self.metrics_port}: {e}")
+            return
+        threading.Thread(target=self.metrics_server.serve_forever, name="microbit-metrics", daemon=True).start()
+        print(f"📈 Metrics at http://{self.metrics_host}:{self.metrics_port}/metrics")
+
+    def start_dispatcher(self) -> None:
+        """Start the thread that turns queued commands into input"""
+        self.dispatch_thread = threading.Thread(
+            target=self.dispatch_commands,
+            name="microbit-dispatch",
+            daemon=True
+        )
+        self.dispatch_thread.start()
+
+    def start_scheduler(self) -> None:
+        """Start the thread that releases stamped commands with --jitter-buffer"""
+        if not self.schedule_delay:
+            return
+        self.scheduler_thread = threading.Thread(
+            target=self.run_scheduler,
+            name="microbit-scheduler",
+            daemon=True
+        )
+        self.scheduler_thread.start()
 
     def run(self) -> None:
-        """Main loop to read serial and process commands with auto-reconnection"""
+        """Main loop: keep the serial reader connected and dispatch commands"""
         self.running = True
+        self.start_dispatcher()
+        self.start_stats_reporter()
+        self.start_metrics_server()
+        self.start_scheduler()
         
         try:
-            while self.running:
-                # Try to connect if not connected
-                if not self.serial_conn or not self.serial_conn.is_open:
-                    if not self.connect_serial():
-                        if self.auto_reconnect:
-                            print("🔍 Searching for micro:bit... (Ctrl+C to quit)")
-                            time.sleep(2)  # Wait 2 seconds before retrying
-                            continue
-                        else:
-                            print("❌ Could not connect to micro:bit. Exiting.")
-                            break
-                    else:
-                        print("🎮 micro:bit Keyboard Emu Bridge active! Use Ctrl+C to quit.")
-                
-                # Process serial data
-                try:
-                    if self.serial_conn and self.serial_conn.in_waiting:
-                        line = self.serial_conn.readline().decode('utf-8', errors='ignore')
-                        if line:
-                            command = self.parse_command(line)
-                            if command:
-                                self.process_command(command)
-                            elif not line.startswith("HID:") and self.debug:
-                                # Show non-HID messages in debug mode
-                                print(f"micro:bit: {line.strip()}")
-                except serial.SerialException:
-                    if self.auto_reconnect:
-                        print("⚠️  Serial connection lost - searching for micro:bit...")
-                    else:
-                        print("⚠️  Serial connection lost")
-                    
-                    if self.serial_conn:
-                        try:
-                            self.serial_conn.close()
-                        except:
-                            pass
-                        self.serial_conn = None
-                    
-                    if self.auto_reconnect:
-                        continue  # Go back to reconnection loop
-                    else:
-                        break  # Exit if auto-reconnect is disabled
-                except Exception as e:
-                    self.log(f"Processing error: {e}")
+            if self.all_devices:
+                self.run_all_devices()
+            else:
+                self.run_single_device()
+        except KeyboardInterrupt:
+            print("\n👋 Shutting down...")
+        finally:
+            self.cleanup()
+
+    def replay(self, path: str, speed: float = 1.0) -> None:
+        """Feed a --record recording through the framers and dispatcher
+
+        speed scales the recorded timing; 0 replays as fast as possible
+        """
+        self.running = True
+        self.start_dispatcher()
+        self.start_stats_reporter()
+        self.start_metrics_server()
+        self.start_scheduler()
+        
+        links: Dict[int, DeviceLink] = {}
+        session_start = 0.0
+        started = time.perf_counter()
+        try:
+            for record in read_recording(path):
+                if record is None:
+                    # New session: the micro:bit connections started over too
+                    links = {}
+                    session_start = time.perf_counter()
+                    continue
                 
-                time.sleep(0.001)  # Small delay to prevent high CPU usage
+                seconds, number, data = record
+                link = links.get(number)
+                if link is None:
+                    link = links[number] = DeviceLink(self, f"replay{len(self.links)}")
+                    self.links.append(link)
                 
+                if speed:
+                    delay = session_start + seconds / speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                link.handle_data(data, time.perf_counter())
+            
+            # Wait for the scheduler and dispatcher to inject the last of it
+            self.wait_scheduled()
+            self.command_queue.put(None)
+            self.dispatch_thread.join()
+            elapsed = time.perf_counter() - started
+            
+            commands = sum(link.commands_received for link in self.links)
+            total_bytes = sum(link.bytes_in for link in self.links)
+            print(f"▶️  Replayed {commands} commands ({total_bytes} bytes) from {path} "
+                  f"in {elapsed:.3f} s: {commands / elapsed if elapsed else 0:,.0f} commands/s")
         except KeyboardInterrupt:
             print("\n👋 Shutting down...")
         finally:
             self.cleanup()
 
+    def run_single_device(self) -> None:
+        """Serve one micro:bit, reconnecting whenever it goes away"""
+        link = DeviceLink(self, self.requested_port)
+        self.links = [link]
+        retry_delay = RECONNECT_MIN_DELAY
+        searching = False
+        
+        while self.running:
+            # Try to connect if not connected
+            if not link.is_connected():
+                if not link.connect():
+                    if self.auto_reconnect:
+                        if not searching:
+                            print("🔍 Searching for micro:bit... (Ctrl+C to quit)")
+                            searching = True
+                        # Retry quickly at first, then back off. A new device
+                        # node in /dev ends the wait early.
+                        if self.discovery.wait_for_device(retry_delay):
+                            retry_delay = RECONNECT_MIN_DELAY
+                        else:
+                            retry_delay = min(retry_delay * 2, RECONNECT_MAX_DELAY)
+                        continue
+                    else:
+                        print("❌ Could not connect to micro:bit. Exiting.")
+                        break
+                else:
+                    retry_delay = RECONNECT_MIN_DELAY
+                    searching = False
+                    print("🎮 micro:bit Keyboard Emu Bridge active! Use Ctrl+C to quit.")
+                    link.start_reader()
+                    link.wait_until_ready()
+            
+            # Sleep until the reader exits; the timeout keeps Ctrl+C responsive
+            link.reader_thread.join(timeout=0.5)
+            if link.reader_thread.is_alive() or not self.running:
+                continue
+            
+            link.disconnected_at = time.monotonic()
+            if self.auto_reconnect:
+                print("⚠️  Serial connection lost - searching for micro:bit...")
+                searching = True
+            else:
+                print("⚠️  Serial connection lost")
+            
+            link.disconnect()
+            
+            if not self.auto_reconnect:
+                break  # Exit if auto-reconnect is disabled
+
+    def run_all_devices(self) -> None:
+        """Serve every micro:bit that is plugged in, picking up new ones as they appear"""
+        retry_delay = RECONNECT_MIN_DELAY
+        print("🔍 Serving all micro:bits... (Ctrl+C to quit)")
+        
+        while self.running:
+            # Notice boards that went away
+            for link in self.links:
+                if link.serial_conn and not link.reader_thread.is_alive():
+                    link.disconnected_at = time.monotonic()
+                    link.disconnect()
+                    print(f"⚠️  {link.name} disconnected ({self.connected_count()} connected)")
+            
+            # Connect new boards, and old ones that came back on the same port
+            links_by_port = {link.port: link for link in self.links}
+            for port in self.discovery.scan():
+                link = links_by_port.get(port)
+                if link and link.is_connected():
+                    continue
+                if not link:
+                    link = DeviceLink(self, port)
+                    self.links.append(link)
+                if link.connect():
+                    link.start_reader()
+                    # Probe in the background so one silent board does not hold up the rest
+                    threading.Thread(target=link.wait_until_ready, daemon=True).start()
+                    print(f"🎮 {link.name} connected ({self.connected_count()} connected)")
+            
+            if self.discovery.wait_for_device(retry_delay):
+                retry_delay = RECONNECT_MIN_DELAY
+            else:
+                retry_delay = min(retry_delay * 2, RECONNECT_MAX_DELAY)
+
+    def connected_count(self) -> int:
+        """Number of micro:bits currently connected"""
+        return sum(1 for link in self.links if link.is_connected())
+
     def cleanup(self) -> None:
         """Clean up resources"""
         self.running = False
         
-        # Release all held mouse buttons
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+        
+        if self.recorder:
+            self.recorder.close()
+        
+        # Stop velocity-mode movement and key repeat
+        self.mouse_velocity = (0.0, 0.0)
+        self.velocity_changed.set()
+        self.repeat_changed.set()
+        
+        # Stamped commands still held by the scheduler are injected now
+        held = self.take_scheduled()
+        if held:
+            self.submit(held)
+        
+        # Let the dispatcher finish what is already queued, then stop it
+        if self.dispatch_thread and self.dispatch_thread.is_alive():
+            self.command_queue.put(None)
+            self.dispatch_thread.join(timeout=2.0)
+        
+        # Release all held keys and mouse buttons
+        try:
+            self.release_held_keys()
+        except Exception as e:
+            self.log(f"Key release error: {e}")
                 
         for button in self.held_mouse_buttons.copy():
             try:
-                self.mouse_controller.release(button)
+                self.backend.release_button(button)
             except:
                 pass
         
-        if self.serial_conn:
-            self.serial_conn.close()
-            print("🔌 Serial connection closed")
+        try:
+            self.backend.close()
+        except Exception as e:
+            self.log(f"Backend close error: {e}")
+        
+        for link in self.links:
+            if self.all_devices:
+                print(f"📊 {link.name}: {link.commands_received} commands")
+            if link.is_connected():
+                link.disconnect()
+                print(f"🔌 Serial connection closed{' on ' + link.name if self.all_devices else ''}")
+
+
+class AsyncMicrobitKeyboardEmuBridge(MicrobitKeyboardEmuBridge):
+    """asyncio bridge: serial ports are watched by the event loop and input is injected in an executor"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # One injection thread keeps commands in order; batches that arrive
+        # while it is busy are merged into the next one
+        self.injector = ThreadPoolExecutor(max_workers=1, thread_name_prefix="microbit-inject")
+        self.pending: List[HIDCommand] = []
+        self.injecting = False
+        
+        # Serial fds registered with loop.add_reader, removed while paused
+        self.reader_fds: Dict[DeviceLink, int] = {}
+        self.readers_paused = False
+
+    def submit(self, commands: List[HIDCommand]) -> None:
+        """Queue input commands for the injection thread (called on the loop)"""
+        self.pending.extend(commands)
+        if self.max_lag:
+            # Over the cap, stale motion makes room before reading pauses
+            while len(self.pending) > self.queue_limit and self.shed_oldest(self.pending):
+                pass
+        if not self.injecting:
+            self.start_injection()
+        elif len(self.pending) >= self.queue_limit and not self.readers_paused:
+            # Stop reading until the injector catches up, like a full queue
+            self.readers_paused = True
+            for fd in self.reader_fds.values():
+                self.loop.remove_reader(fd)
+
+    def submit_threadsafe(self, commands: List[HIDCommand]) -> None:
+        """Hand commands to submit() on the event loop"""
+        try:
+            self.loop.call_soon_threadsafe(self.submit, commands)
+        except RuntimeError:
+            # The loop is closed; cleanup() releases anything left held
+            pass
+
+    def start_injection(self) -> None:
+        """Send everything pending to the injection thread as one batch"""
+        batch, self.pending = self.pending, []
+        self.injecting = True
+        future = self.loop.run_in_executor(self.injector, self.process_batch, batch)
+        future.add_done_callback(self.injection_done)
+
+    def injection_done(self, future: "asyncio.Future") -> None:
+        """Start the next batch and resume paused readers"""
+        self.injecting = False
+        if self.pending and self.running:
+            self.start_injection()
+        
+        if self.readers_paused and len(self.pending) < self.queue_limit:
+            self.readers_paused = False
+            for link, fd in self.reader_fds.items():
+                self.loop.add_reader(fd, self.read_ready, link)
+        
+        self.grant_credits()
+
+    def queue_depth(self) -> int:
+        """Commands received but not injected yet"""
+        return len(self.pending)
+
+    def call_later(self, delay: float, callback: Callable, *args) -> asyncio.TimerHandle:
+        """Run callback after delay seconds on the event loop"""
+        return self.loop.call_later(delay, callback, *args)
+
+    def attach(self, link: DeviceLink) -> asyncio.Event:
+        """Start reading a connected link; the returned event is set when it is lost"""
+        link.lost = asyncio.Event()
+        conn = link.serial_conn
+        
+        try:
+            # Reads happen when the loop sees data, so they must not block
+            conn.timeout = 0
+            fd = conn.fileno()
+            self.loop.add_reader(fd, self.read_ready, link)
+            self.reader_fds[link] = fd
+        except (AttributeError, NotImplementedError):
+            # Windows: no pollable fd, block in an executor thread instead
+            conn.timeout = 1.0
+            self.loop.create_task(self.read_in_executor(link))
+        
+        return link.lost
+
+    def detach(self, link: DeviceLink) -> None:
+        """Stop watching a link's serial port"""
+        fd = self.reader_fds.pop(link, None)
+        if fd is not None:
+            self.loop.remove_reader(fd)
+        link.lost.set()
+
+    def read_ready(self, link: DeviceLink) -> None:
+        """add_reader callback: take everything waiting on the port"""
+        conn = link.serial_conn
+        try:
+            data = conn.read(conn.in_waiting or 1)
+        except (serial.SerialException, OSError, TypeError, AttributeError) as e:
+            link.log(f"Serial reader stopped: {e}")
+            self.detach(link)
+            return
+        if data:
+            link.handle_data(data, time.perf_counter())
+
+    async def read_in_executor(self, link: DeviceLink) -> None:
+        """Read a port without a pollable fd from a worker thread"""
+        conn = link.serial_conn
+        try:
+            while self.running and conn.is_open:
+                data = await self.loop.run_in_executor(None, lambda: conn.read(conn.in_waiting or 1))
+                if data:
+                    link.handle_data(data, time.perf_counter())
+        except (serial.SerialException, OSError, TypeError) as e:
+            link.log(f"Serial reader stopped: {e}")
+        link.lost.set()
+
+    async def wait_until_ready(self, link: DeviceLink) -> bool:
+        """Probe a fresh connection with HID:PING until the micro:bit answers"""
+        delay = PING_RETRY_DELAY
+        deadline = link.connected_at + READY_TIMEOUT
+        
+        while self.running:
+            link.send_line(b"HID:PING")
+            if link.fast_probe_due():
+                link.start_fast_probe()
+                await asyncio.sleep(FAST_PROBE_WINDOW)
+                link.end_fast_probe()
+            remaining = deadline - time.monotonic()
+            await asyncio.sleep(min(delay, max(remaining, 0)))
+            if link.ready.is_set():
+                link.report_ready()
+                return True
+            if remaining <= 0:
+                break
+            delay *= 2
+        
+        link.probe_failed()
+        return False
+
+    async def wait_for_device(self, timeout: float) -> bool:
+        """Sleep up to timeout, returning True early when a serial device appears"""
+        if platform.system() == "Windows":
+            await asyncio.sleep(timeout)
+            return False
+        
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.discovery.device_added():
+                return True
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(HOTPLUG_POLL_INTERVAL, remaining))
+
+    async def serve_link(self, link: DeviceLink) -> None:
+        """Read one connected link until it goes away"""
+        lost = self.attach(link)
+        await self.wait_until_ready(link)
+        await lost.wait()
+        
+        link.disconnected_at = time.monotonic()
+        link.disconnect()
+
+    async def serve_single_device(self) -> None:
+        """Serve one micro:bit, reconnecting whenever it goes away"""
+        link = DeviceLink(self, self.requested_port)
+        self.links = [link]
+        retry_delay = RECONNECT_MIN_DELAY
+        searching = False
+        
+        while self.running:
+            # Discovery lists and probes ports, keep it off the loop
+            if not await self.loop.run_in_executor(None, link.connect):
+                if not self.auto_reconnect:
+                    print("❌ Could not connect to micro:bit. Exiting.")
+                    break
+                if not searching:
+                    print("🔍 Searching for micro:bit... (Ctrl+C to quit)")
+                    searching = True
+                if await self.wait_for_device(retry_delay):
+                    retry_delay = RECONNECT_MIN_DELAY
+                else:
+                    retry_delay = min(retry_delay * 2, RECONNECT_MAX_DELAY)
+                continue
+            
+            retry_delay = RECONNECT_MIN_DELAY
+            searching = False
+            print("🎮 micro:bit Keyboard Emu Bridge active! Use Ctrl+C to quit.")
+            await self.serve_link(link)
+            if not self.running:
+                break
+            
+            if self.auto_reconnect:
+                print("⚠️  Serial connection lost - searching for micro:bit...")
+                searching = True
+            else:
+                print("⚠️  Serial connection lost")
+                break
+
+    async def serve_all_devices(self) -> None:
+        """Serve every micro:bit that is plugged in, picking up new ones as they appear"""
+        retry_delay = RECONNECT_MIN_DELAY
+        print("🔍 Serving all micro:bits... (Ctrl+C to quit)")
+        
+        while self.running:
+            links_by_port = {link.port: link for link in self.links}
+            for port in await self.loop.run_in_executor(None, self.discovery.scan):
+                link = links_by_port.get(port)
+                if link and link.is_connected():
+                    continue
+                if not link:
+                    link = DeviceLink(self, port)
+                    self.links.append(link)
+                # Opening and probing a port blocks, keep it off the loop
+                if await self.loop.run_in_executor(None, link.connect):
+                    print(f"🎮 {link.name} connected ({self.connected_count()} connected)")
+                    self.loop.create_task(self.serve_link_and_report(link))
+            
+            if await self.wait_for_device(retry_delay):
+                retry_delay = RECONNECT_MIN_DELAY
+            else:
+                retry_delay = min(retry_delay * 2, RECONNECT_MAX_DELAY)
+
+    async def serve_link_and_report(self, link: DeviceLink) -> None:
+        """serve_link for --all-devices, announcing the disconnect"""
+        await self.serve_link(link)
+        if self.running:
+            print(f"⚠️  {link.name} disconnected ({self.connected_count()} connected)")
+
+    async def serve(self) -> None:
+        """Main coroutine: connect, read and reconnect until stopped"""
+        self.loop = asyncio.get_event_loop()
+        self.running = True
+        self.start_stats_reporter()
+        self.start_metrics_server()
+        self.start_scheduler()
+        if self.all_devices:
+            await self.serve_all_devices()
+        else:
+            await self.serve_single_device()
+
+    def run(self) -> None:
+        """Run the bridge on a new event loop until Ctrl+C"""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self.serve())
+        except KeyboardInterrupt:
+            print("\n👋 Shutting down...")
+        finally:
+            self.running = False
+            for fd in self.reader_fds.values():
+                loop.remove_reader(fd)
+            self.reader_fds.clear()
+            
+            # asyncio.all_tasks() is Python 3.7+, Task.all_tasks() was removed in 3.9
+            all_tasks = getattr(asyncio, "all_tasks", None) or asyncio.Task.all_tasks
+            tasks = [task for task in all_tasks(loop) if not task.done()]
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+            self.cleanup()
+
+    def cleanup(self) -> None:
+        """Finish pending input, then clean up like the threaded bridge"""
+        self.running = False
+        self.injector.shutdown(wait=True)
+        self.pending.extend(self.take_scheduled())
+        if self.pending:
+            self.process_batch(self.pending)
+            self.pending = []
+        super().cleanup()
 
 
 def main():
@@ -475,6 +3418,36 @@ def main():
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
     parser.add_argument("--no-reconnect", action="store_true", help="Disable auto-reconnection on disconnect")
     parser.add_argument("--list-ports", action="store_true", help="List available serial ports")
+    parser.add_argument("--all-devices", action="store_true",
+                        help="Serve every connected micro:bit from this one process")
+    parser.add_argument("--asyncio", action="store_true",
+                        help="Run the serial side on an asyncio event loop instead of reader threads")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="pynput",
+                        help="Where input goes: pynput (default), uinput (Linux, no X11 needed) or null (discard)")
+    parser.add_argument("--stats", type=float, nargs="?", const=5.0, default=0.0, metavar="SECONDS",
+                        help="Print rates and latency percentiles every SECONDS (default 5)")
+    parser.add_argument("--metrics-port", type=int, default=0, metavar="PORT",
+                        help="Serve Prometheus metrics over HTTP on this port")
+    parser.add_argument("--metrics-host", default="127.0.0.1",
+                        help="Address for the metrics endpoint (default 127.0.0.1, local only)")
+    parser.add_argument("--macros", metavar="FILE",
+                        help="JSON macro table for HID:MACRO:<id> (see macros.example.json)")
+    parser.add_argument("--record", metavar="FILE",
+                        help="Append every serial read, with its timing, to FILE")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="Play a --record file through the bridge instead of a micro:bit")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed: 1 keeps the recorded timing, 2 is twice as fast")
+    parser.add_argument("--max", action="store_const", dest="speed", const=0.0,
+                        help="Replay without any delays, e.g. with --backend null as a benchmark")
+    parser.add_argument("--sensor-profile", choices=sorted(SENSOR_PROFILES), default="smooth",
+                        help="Filter and acceleration curve for HID:SENSOR tilt streams (needs numpy)")
+    parser.add_argument("--jitter-buffer", type=float, nargs="?", const=30.0, default=0.0, metavar="MS",
+                        help="Delay device-stamped commands by up to MS (default 30) to restore their spacing")
+    parser.add_argument("--max-lag", type=float, nargs="?", const=200.0, default=0.0, metavar="MS",
+                        help="Under overload, drop mouse motion older than MS (default 200) instead of replaying it late")
+    parser.add_argument("--max-baud", type=int, default=MAX_BAUD_RATE, choices=BAUD_RATES,
+                        help=f"Highest baud rate to negotiate with the micro:bit (default {MAX_BAUD_RATE})")
     
     args = parser.parse_args()
     
@@ -483,14 +3456,44 @@ def main():
         ports = serial.tools.list_ports.comports()
         for port in ports:
             print(f"  {port.device} - {port.description}")
+        print(f"Links open at {DEFAULT_BAUD_RATE} baud and negotiate up to {args.max_baud} baud on HID:INIT")
         return
     
-    bridge = MicrobitKeyboardEmuBridge(
+    try:
+        backend = BACKENDS[args.backend]()
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    
+    # Replays go through the threaded dispatcher, there is no serial port to watch
+    bridge_class = AsyncMicrobitKeyboardEmuBridge if args.asyncio and not args.replay else MicrobitKeyboardEmuBridge
+    bridge = bridge_class(
         port=args.port, 
         debug=args.debug, 
-        auto_reconnect=not args.no_reconnect
+        auto_reconnect=not args.no_reconnect,
+        max_baud_rate=args.max_baud,
+        all_devices=args.all_devices,
+        backend=backend,
+        stats_interval=args.stats,
+        metrics_port=args.metrics_port,
+        metrics_host=args.metrics_host,
+        record=args.record,
+        sensor_profile=args.sensor_profile,
+        schedule_delay=args.jitter_buffer / 1000.0,
+        max_lag=args.max_lag / 1000.0
     )
-    bridge.run()
+    
+    if args.macros:
+        try:
+            bridge.load_macros(args.macros)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not load macros: {e}")
+            sys.exit(1)
+    
+    if args.replay:
+        bridge.replay(args.replay, args.speed)
+    else:
+        bridge.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the micro:bit Keyboard Emu Bridge
+
+Run from the Python_HID_Bridge folder:
+    python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import microbit_hid_bridge as bridge
+
+
+@unittest.skipIf(sys.platform == "win32", "the simulator needs ptys")
+class LateStartTest(unittest.TestCase):
+    """A board whose program starts a while after the bridge opened the port"""
+
+    def run_board(self, start_delay: float):
+        import microbit_simulator as simulator
+        rng = random.Random(1)
+        board = simulator.SimulatedMicrobit(simulator.TRACES['circle'](rng), rng)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result, = simulator.run_bridges([board], 1.5, start_delay)
+        return board, result
+
+    def test_start_during_fast_probe(self):
+        # The bridge pings at the fast rate half a second in
+        for start_delay in (0.1, 0.55, 0.62, 0.7, 1.3):
+            with self.subTest(start_delay=start_delay):
+                board, result = self.run_board(start_delay)
+                self.assertTrue(result['credits'])
+                # The board may stop with its last command still queued
+                self.assertGreaterEqual(result['received'], board.commands - 1)
+
+
+class TimeStampTest(unittest.TestCase):
+    """HID:SYSTEM:TIME stamps from the serial line"""
+
+    def setUp(self):
+        self.bridge = bridge.MicrobitKeyboardEmuBridge(backend=bridge.RecordingBackend())
+        self.link = bridge.DeviceLink(self.bridge)
+        self.submitted = []
+        self.bridge.submit = self.submitted.extend
+
+    def test_bad_stamp_is_dropped(self):
+        self.link.handle_data(b"HID:SYSTEM:TIME:x\nHID:SYSTEM:TIME:\nHID:@:KEY:PRESS:A\nHID:KEY:PRESS:B\n")
+        self.assertEqual([command.data for command in self.submitted], [b"B"])
+        self.assertIsNone(self.link.pending_stamp)
+        self.assertEqual(self.link.malformed_lines + self.link.text_framer.malformed, 3)
+
+    def test_stamp_applies_to_next_command(self):
+        self.link.handle_data(b"HID:SYSTEM:TIME:1234\nHID:KEY:PRESS:A\n")
+        self.assertEqual(self.submitted[0].sent, 1234)
+
+
+
+class VelocityTest(unittest.TestCase):
+    """HID:MOUSE:VEL moves the cursor from the dispatch thread"""
+
+    def test_ticks_go_through_the_dispatcher(self):
+        backend = bridge.RecordingBackend()
+        threads = set()
+        move_pointer = backend.move_pointer
+
+        def record_thread(position, delta):
+            threads.add(threading.current_thread().name)
+            move_pointer(position, delta)
+
+        backend.move_pointer = record_thread
+        b = bridge.MicrobitKeyboardEmuBridge(backend=backend)
+        b.running = True
+        b.start_dispatcher()
+        try:
+            b.set_mouse_velocity(400, 0)
+            time.sleep(0.2)
+            b.set_mouse_velocity(0, 0)
+            time.sleep(0.05)
+            stopped = backend.position
+            time.sleep(0.05)
+        finally:
+            b.running = False
+            b.command_queue.put(None)
+            b.dispatch_thread.join(timeout=2.0)
+        self.assertEqual(threads, {"microbit-dispatch"})
+        self.assertGreater(stopped[0], 40)
+        self.assertEqual(backend.position, stopped)
+
+
+class BinaryButtonTest(unittest.TestCase):
+    """Button arguments of binary CLICK, HOLD and RELEASE frames"""
+
+    def test_out_of_range_button_is_dropped(self):
+        framer = bridge.BinaryFramer()
+        frames = b"".join(bridge.encode_binary_frame(opcode, (button,))
+                          for opcode in (0x12, 0x15, 0x16) for button in (-1, 4, 1000))
+        self.assertEqual(framer.feed(frames), [])
+        self.assertEqual(framer.dropped, 9)
+
+    def test_buttons_in_range(self):
+        framer = bridge.BinaryFramer()
+        commands = framer.feed(b"".join(bridge.encode_binary_frame(0x16, (button,)) for button in range(4)))
+        self.assertEqual([command.data for command in commands], list(bridge.MOUSE_BUTTON_IDS))
+        self.assertEqual(framer.dropped, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,25 @@
 namespace serialKeyboard
 {
 
+    // Binary protocol opcodes, see BINARY_OPCODES in the Python bridge
+    const OP_TYPE = 0x01;
+    const OP_PRESS = 0x02;
+    const OP_COMBO = 0x03;
+    const OP_HOLD = 0x04;
+    const OP_RELEASE = 0x05;
+
+    /**
+     * Send a keyboard command as a text line or a binary frame
+     */
+    function sendKeyCommand(action: string, opcode: number, data: string): void
+    {
+        if (serialHID.isBinaryMode()) {
+            serialHID.sendFrame(opcode, [], control.createBufferFromUTF8(data));
+        } else {
+            serialHID.sendCommand("HID:KEY:" + action + ":" + data);
+        }
+    }
+
     /**
      * Type text on the connected computer
      * @param text the text to type
@@ -13,7 +32,7 @@ namespace serialKeyboard
     //% weight=100
     export function typeText(text: string): void
     {
-        serialHID.sendCommand("HID:KEY:TYPE:" + text);
+        sendKeyCommand("TYPE", OP_TYPE, text);
     }
 
     /**
@@ -26,7 +45,7 @@ namespace serialKeyboard
     {
         // Validate single key input
         if (isValidSingleKey(key)) {
-            serialHID.sendCommand("HID:KEY:PRESS:" + key.toUpperCase());
+            sendKeyCommand("PRESS", OP_PRESS, key.toUpperCase());
         }
     }
 
@@ -38,7 +57,7 @@ namespace serialKeyboard
     //% weight=95
     export function sendString(text: string): void
     {
-        serialHID.sendCommand("HID:KEY:TYPE:" + text);
+        sendKeyCommand("TYPE", OP_TYPE, text);
     }
 
     /**
@@ -50,7 +69,7 @@ namespace serialKeyboard
     export function sendSpecialKeys(key: string): void
     {
         if (isValidSingleKey(key)) {
-            serialHID.sendCommand("HID:KEY:PRESS:" + key.toUpperCase());
+            sendKeyCommand("PRESS", OP_PRESS, key.toUpperCase());
         }
     }
 
@@ -62,7 +81,56 @@ namespace serialKeyboard
     //% weight=80
     export function sendKeyCombo(combo: string): void
     {
-        serialHID.sendCommand("HID:KEY:COMBO:" + combo);
+        sendKeyCommand("COMBO", OP_COMBO, combo);
+    }
+
+    /**
+     * Hold a key down until it is released
+     * The bridge repeats it like a real keyboard, so one message is enough
+     * @param key the key to hold (single character or special key like 'UP')
+     */
+    //% block="hold key %key"
+    //% weight=77
+    export function holdKey(key: string): void
+    {
+        if (isValidSingleKey(key)) {
+            sendKeyCommand("HOLD", OP_HOLD, key.toUpperCase());
+        }
+    }
+
+    /**
+     * Release a key held with hold key
+     * @param key the key to release
+     */
+    //% block="release key %key"
+    //% weight=76
+    export function releaseKey(key: string): void
+    {
+        if (isValidSingleKey(key)) {
+            sendKeyCommand("RELEASE", OP_RELEASE, key.toUpperCase());
+        }
+    }
+
+    /**
+     * Release every held key
+     */
+    //% block="release all keys"
+    //% weight=75
+    export function releaseAllKeys(): void
+    {
+        sendKeyCommand("RELEASE", OP_RELEASE, "ALL");
+    }
+
+    /**
+     * Run a macro from the bridge's macro table (--macros file)
+     * Only the short ID crosses the serial link
+     * @param id the macro ID (e.g. "SIG")
+     */
+    //% block="run macro %id"
+    //% weight=78
+    export function runMacro(id: string): void
+    {
+        serialHID.sendCommand("HID:MACRO:" + id);
     }
 
     /**
@@ -12,6 +12,327 @@ namespace serialHID
 {
 
     let initialized = false;
+    let initializing = false;
+    // Set while the handshake is re-run for a new bridge; sending waits
+    let handshaking = false;
+
+    // Link speed: start at 9600 for maximum reliability, then offer the
+    // bridge a faster rate during HID:INIT
+    const DEFAULT_BAUD_RATE = 9600;
+    const MAX_BAUD_RATE = 115200;
+    const BAUD_REPLY_TIMEOUT_MS = 300;
+    const BAUD_CONFIRM_TIMEOUT_MS = 500;
+    let baudRate = DEFAULT_BAUD_RATE;
+
+    // Compact binary protocol: COBS(opcode, zigzag varint args, data, CRC8) + 0x00
+    let useBinary = false;
+    let binaryMode = false;
+    const OP_RAW = 0x7F;
+    const OP_PING = 0x20;
+    const OP_TIME = 0x22;
+
+    // Device timestamps: each command carries input.runningTime() so the
+    // bridge can undo the bunching of USB and serial buffers (--jitter-buffer)
+    let timestamps = false;
+
+    // Credit flow control: the bridge grants a running total of commands we
+    // may send (HID:CREDIT:<limit>), so sends need no fixed pause. Until a
+    // grant arrives, or with older bridges, every send pauses instead.
+    const CREDIT_TIMEOUT_MS = 1000;
+    const FALLBACK_PAUSE_MS = 10;
+    let creditFlow = false;
+    let creditsSent = 0;
+    let creditLimit = 0;
+
+    // Outgoing commands wait in a ring buffer for the transmit fiber, so
+    // blocks return right away. Text mode queues lines, binary mode queues
+    // encoded frames. With credits, short commands leave together: lines
+    // packed into one HID:BATCH line, frames in one serial write.
+    const TX_QUEUE_SIZE = 32;
+    const MAX_BATCH_LENGTH = 96;
+    const TX_EVENT_ID = 9501;
+    const txLines: string[] = [];
+    const txFrames: Buffer[] = [];
+    let txHead = 0;
+    let txCount = 0;
+
+    // Last line received from the bridge
+    let bridgeReply = "";
+
+    function onBridgeLine(): void
+    {
+        bridgeReply = serial.readUntil(serial.delimiters(Delimiters.NewLine)).trim();
+
+        // The bridge probes a fresh connection with HID:PING instead of waiting.
+        // A new connection always starts in text mode, so binary frames would
+        // be lost on it: answer in text and redo the handshake.
+        if (bridgeReply == "HID:PING") {
+            bridgeReply = "";
+            binaryMode = false;
+            serial.writeLine("HID:PONG");
+            if (initialized && !handshaking) {
+                handshaking = true;
+                control.inBackground(rehandshake);
+            }
+        } else if (bridgeReply.indexOf("HID:CREDIT:") == 0) {
+            const limit = parseInt(bridgeReply.substr(11));
+            bridgeReply = "";
+            if (limit > creditLimit) {
+                creditLimit = limit;
+            }
+            creditFlow = true;
+        }
+    }
+
+    /**
+     * Agree the protocol and credits again with a bridge that just connected
+     * The link speed is kept: the bridge found us by pinging at our rate
+     */
+    function rehandshake(): void
+    {
+        binaryMode = useBinary && negotiateBinaryMode();
+        // A new bridge knows nothing about our earlier credits
+        requestCredits();
+        handshaking = false;
+        control.raiseEvent(TX_EVENT_ID, 1);
+    }
+
+    /**
+     * Ask the bridge for a fresh credit window, counting from zero again
+     * Sends are paced by FALLBACK_PAUSE_MS until the grant arrives
+     */
+    function requestCredits(): void
+    {
+        creditFlow = false;
+        creditsSent = 0;
+        creditLimit = 0;
+        if (binaryMode) {
+            serial.writeBuffer(encodeFrame(OP_RAW, [], control.createBufferFromUTF8("HID:INIT:CREDIT")));
+        } else {
+            serial.writeLine("HID:INIT:CREDIT");
+        }
+    }
+
+    /**
+     * Spend one credit, waiting for the bridge to grant more if none are left
+     */
+    function waitForCredit(): void
+    {
+        if (creditFlow) {
+            const start = input.runningTime();
+            while (creditsSent >= creditLimit) {
+                if (input.runningTime() - start > CREDIT_TIMEOUT_MS) {
+                    // Grant lost or bridge gone: start over, pausing meanwhile
+                    requestCredits();
+                    break;
+                }
+                basic.pause(1);
+            }
+        }
+        creditsSent++;
+    }
+
+    /**
+     * Spend one more credit if one is left without waiting
+     */
+    function takeSpareCredit(): boolean
+    {
+        if (creditFlow && creditsSent < creditLimit) {
+            creditsSent++;
+            return true;
+        }
+        return false;
+    }
+
+    /**
+     * Fixed pause after a send, only while the bridge grants no credits
+     */
+    function paceWithoutCredits(): void
+    {
+        if (!creditFlow) {
+            basic.pause(FALLBACK_PAUSE_MS);
+        }
+    }
+
+    /**
+     * Add a line or a frame to the transmit queue
+     * Waits only while the queue is full
+     */
+    function enqueue(line: string, frame: Buffer): void
+    {
+        while (txCount >= TX_QUEUE_SIZE) {
+            basic.pause(1);
+        }
+        const tail = (txHead + txCount) % TX_QUEUE_SIZE;
+        txLines[tail] = line;
+        txFrames[tail] = frame;
+        txCount++;
+        control.raiseEvent(TX_EVENT_ID, 1);
+    }
+
+    function dequeue(): number
+    {
+        const index = txHead;
+        txHead = (txHead + 1) % TX_QUEUE_SIZE;
+        txCount--;
+        return index;
+    }
+
+    /**
+     * Send the oldest queued line, with the following ones batched behind it
+     */
+    function transmitLines(): void
+    {
+        waitForCredit();
+        let line = txLines[dequeue()];
+
+        // Only bridges that grant credits understand HID:BATCH
+        if (line.indexOf("HID:") == 0 && line.indexOf(";") < 0) {
+            let batch = line.substr(4);
+            let packed = 1;
+            while (txCount > 0) {
+                const next = txLines[txHead];
+                if (!next || next.indexOf("HID:") != 0 || next.indexOf(";") >= 0
+                    || 10 + batch.length + next.length - 3 > MAX_BATCH_LENGTH
+                    || !takeSpareCredit()) {
+                    break;
+                }
+                batch += ";" + next.substr(4);
+                dequeue();
+                packed++;
+            }
+            if (packed > 1) {
+                line = "HID:BATCH:" + batch;
+            }
+        }
+
+        serial.writeLine(line);
+        paceWithoutCredits();
+    }
+
+    /**
+     * Send the oldest queued frame, with the following ones in the same write
+     */
+    function transmitFrames(): void
+    {
+        waitForCredit();
+        const frames = [txFrames[dequeue()]];
+        let length = frames[0].length;
+        while (txCount > 0 && txFrames[txHead] && length + txFrames[txHead].length <= MAX_BATCH_LENGTH
+            && takeSpareCredit()) {
+            const frame = txFrames[dequeue()];
+            frames.push(frame);
+            length += frame.length;
+        }
+
+        serial.writeBuffer(frames.length == 1 ? frames[0] : Buffer.concat(frames));
+        paceWithoutCredits();
+    }
+
+    /**
+     * Transmit fiber: drain the queue, sleeping while it is empty
+     */
+    function transmitLoop(): void
+    {
+        while (true) {
+            if (txCount == 0 || handshaking) {
+                control.waitForEvent(TX_EVENT_ID, 1);
+            } else if (txFrames[txHead]) {
+                // Frames queued before a bridge restart still go out as frames
+                transmitFrames();
+            } else {
+                transmitLines();
+            }
+        }
+    }
+
+    /**
+     * Wait until every queued command has been sent
+     */
+    //% block="wait until keyboard emu commands are sent"
+    //% weight=85
+    export function flush(): void
+    {
+        while (txCount > 0) {
+            basic.pause(1);
+        }
+    }
+
+    function waitForReply(prefix: string, timeout: number): string
+    {
+        const start = input.runningTime();
+        while (input.runningTime() - start < timeout) {
+            if (bridgeReply.indexOf(prefix) == 0) {
+                const reply = bridgeReply;
+                bridgeReply = "";
+                return reply;
+            }
+            basic.pause(10);
+        }
+        return "";
+    }
+
+    function switchBaudRate(rate: number): void
+    {
+        serial.setBaudRate(<BaudRate>rate);
+        baudRate = rate;
+    }
+
+    /**
+     * Offer the bridge our fastest rate at the given rate
+     * Returns true if a bridge answered and both sides agreed on a rate
+     */
+    function negotiateBaudRate(probeRate: number): boolean
+    {
+        switchBaudRate(probeRate);
+        // Empty line first so any noise from the rate change ends up on its own line
+        serial.writeLine("");
+        serial.writeLine("HID:INIT:SYSTEM:" + MAX_BAUD_RATE);
+
+        const reply = waitForReply("HID:BAUD:", BAUD_REPLY_TIMEOUT_MS);
+        if (!reply) {
+            return false;
+        }
+
+        // The bridge answered with the rate it switched to, confirm at that rate
+        switchBaudRate(parseInt(reply.substr(9)));
+        serial.writeLine("");
+        serial.writeLine("HID:INIT:BAUD:" + baudRate);
+
+        if (!waitForReply("HID:BAUD:OK", BAUD_CONFIRM_TIMEOUT_MS)) {
+            // The bridge falls back to the default rate on its own
+            switchBaudRate(DEFAULT_BAUD_RATE);
+        }
+        return true;
+    }
+
+    /**
+     * Ask the bridge to switch to binary frames
+     * Returns true if the bridge agreed
+     */
+    function negotiateBinaryMode(): boolean
+    {
+        serial.writeLine("HID:INIT:MODE:BIN");
+        if (!waitForReply("HID:MODE:BIN", BAUD_REPLY_TIMEOUT_MS)) {
+            return false;
+        }
+
+        // A lone delimiter starts the binary stream on a clean frame boundary
+        serial.writeBuffer(pins.createBuffer(1));
+        return true;
+    }
+
+    /**
+     * Use the compact binary protocol instead of text lines
+     * Call this before initializing; older bridges keep using text
+     * @param enabled true to use binary frames
+     */
+    //% block="use compact binary protocol %enabled"
+    //% weight=95
+    export function setBinaryProtocol(enabled: boolean): void
+    {
+        useBinary = enabled;
+    }
 
     /**
      * Initialize the Keyboard Emu system
@@ -21,21 +342,135 @@ namespace serialHID
     //% weight=100
     export function initialize(): void
     {
+        // Other fibers may send while the handshake is still waiting for replies
+        while (initializing) {
+            basic.pause(10);
+        }
+
         if (!initialized) {
-            // Set baud rate to 9600 for maximum reliability
-            serial.setBaudRate(BaudRate.BaudRate9600);
+            initializing = true;
 
             // Set write line padding to 0 to prevent extra spaces
             serial.setWriteLinePadding(0);
 
-            // Send initialization command
-            serial.writeLine("HID:INIT:SYSTEM");
+            serial.onDataReceived(serial.delimiters(Delimiters.NewLine), onBridgeLine);
+
+            // Send initialization command with a faster rate on offer. If the
+            // bridge kept a fast rate from before a reset, the second probe
+            // reaches it; older bridges never answer and we stay at 9600.
+            if (!negotiateBaudRate(DEFAULT_BAUD_RATE) && !negotiateBaudRate(MAX_BAUD_RATE)) {
+                switchBaudRate(DEFAULT_BAUD_RATE);
+            }
+
+            binaryMode = useBinary && negotiateBinaryMode();
 
-            // Wait for system to stabilize
-            basic.pause(200);
+            // Older bridges ignore this and we keep pausing after each send
+            requestCredits();
+            control.inBackground(transmitLoop);
 
             initialized = true;
+            initializing = false;
+        }
+    }
+
+    /**
+     * Check if commands are sent as binary frames
+     */
+    export function isBinaryMode(): boolean
+    {
+        if (!initialized) {
+            initialize();
+        }
+        return binaryMode;
+    }
+
+    function crc8(data: number[]): number
+    {
+        let crc = 0;
+        for (let i = 0; i < data.length; i++) {
+            crc ^= data[i];
+            for (let bit = 0; bit < 8; bit++) {
+                crc = (crc & 0x80) ? ((crc << 1) ^ 0x07) & 0xFF : (crc << 1) & 0xFF;
+            }
+        }
+        return crc;
+    }
+
+    /**
+     * Queue one binary frame for sending
+     * @param opcode the command opcode
+     * @param args signed integer arguments, sent as zigzag varints
+     * @param data trailing bytes (text), or null
+     */
+    export function sendFrame(opcode: number, args: number[], data: Buffer): void
+    {
+        if (!initialized) {
+            initialize();
+        }
+
+        const frame = encodeFrame(opcode, args, data);
+        if (timestamps) {
+            // The stamp and its frame share one queue slot and one credit
+            enqueue(null, Buffer.concat([encodeFrame(OP_TIME, [input.runningTime()], null), frame]));
+        } else {
+            enqueue(null, frame);
+        }
+    }
+
+    function encodeFrame(opcode: number, args: number[], data: Buffer): Buffer
+    {
+        const raw = [opcode];
+        for (let i = 0; i < args.length; i++) {
+            const n = Math.round(args[i]);
+            let zigzag = (n << 1) ^ (n >> 31);
+            while (zigzag >= 0x80 || zigzag < 0) {
+                raw.push((zigzag & 0x7F) | 0x80);
+                zigzag = zigzag >>> 7;
+            }
+            raw.push(zigzag);
+        }
+        if (data) {
+            for (let i = 0; i < data.length; i++) {
+                raw.push(data[i]);
+            }
         }
+        raw.push(crc8(raw));
+
+        // COBS: replace every zero with the distance to the next one
+        const encoded = [0];
+        let codeIndex = 0;
+        let code = 1;
+        for (let i = 0; i < raw.length; i++) {
+            if (raw[i] == 0) {
+                encoded[codeIndex] = code;
+                codeIndex = encoded.length;
+                encoded.push(0);
+                code = 1;
+            } else {
+                encoded.push(raw[i]);
+                code++;
+                if (code == 0xFF) {
+                    encoded[codeIndex] = code;
+                    codeIndex = encoded.length;
+                    encoded.push(0);
+                    code = 1;
+                }
+            }
+        }
+        encoded[codeIndex] = code;
+        encoded.push(0);
+
+        return Buffer.fromArray(encoded);
+    }
+
+    /**
+     * The serial link speed agreed with the bridge, in baud
+     */
+    //% block="keyboard emu link speed"
+    //% weight=5
+    export function linkBaudRate(): number
+    {
+        return baudRate;
     }
 
     /**
@@ -61,11 +496,31 @@ namespace serialHID
             initialize();
         }
 
-        // Send the command with proper line termination
-        serial.writeLine(command);
+        if (binaryMode) {
+            // Text inside a frame, so it can't break the binary stream
+            sendFrame(OP_RAW, [], control.createBufferFromUTF8(command));
+            return;
+        }
+
+        if (timestamps && command.indexOf("HID:") == 0) {
+            command = "HID:@" + input.runningTime() + ":" + command.substr(4);
+        }
 
-        // Small delay to prevent buffer overflow
-        basic.pause(10);
+        // The transmit fiber sends it with proper line termination
+        enqueue(command, null);
+    }
+
+    /**
+     * Stamp every command with the micro:bit's clock
+     * A bridge started with --jitter-buffer then injects commands with the
+     * spacing they were sent at, even if they arrive bunched together
+     * @param enabled true to send timestamps
+     */
+    //% block="send timestamps with commands %enabled"
+    //% weight=75
+    export function setTimestamps(enabled: boolean): void
+    {
+        timestamps = enabled;
     }
 
     /**
@@ -75,7 +530,89 @@ namespace serialHID
     //% weight=80
     export function ping(): void
     {
-        sendCommand("HID:PING");
+        if (isBinaryMode()) {
+            sendFrame(OP_PING, [], null);
+        } else {
+            sendCommand("HID:PING");
+        }
+    }
+
+    // Input state for HID:STATE, one bit per name. Must match STATE_NAMES
+    // in the Python bridge.
+    const STATE_NAMES = [
+        "MOUSE_LEFT", "MOUSE_RIGHT", "MOUSE_MIDDLE",
+        "CTRL", "SHIFT", "ALT", "WIN",
+        "UP", "DOWN", "LEFT", "RIGHT",
+        "ENTER", "SPACE", "ESC", "TAB", "BACKSPACE", "DELETE", "HOME", "END", "PAGE_UP", "PAGE_DOWN",
+        "F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8", "F9", "F10", "F11", "F12",
+        "A", "B", "C", "D", "E", "F", "G", "H", "I", "J", "K", "L", "M",
+        "N", "O", "P", "Q", "R", "S", "T", "U", "V", "W", "X", "Y", "Z",
+        "0", "1", "2", "3", "4", "5", "6", "7", "8", "9"
+    ];
+    const HEX_DIGITS = "0123456789ABCDEF";
+    const stateWords = [0, 0, 0];
+
+    /**
+     * Mark a key or mouse button as down or up and send the new state if it changed
+     * The bridge presses and releases only what changed, so a lost or repeated
+     * state can never leave a key stuck
+     * @param name a key like "UP" or "A", or MOUSE_LEFT, MOUSE_RIGHT, MOUSE_MIDDLE
+     * @param down true while the key or button is held
+     */
+    //% block="set input %name down %down"
+    //% weight=70
+    export function setInputState(name: string, down: boolean): void
+    {
+        const bit = STATE_NAMES.indexOf(name.toUpperCase());
+        if (bit < 0) {
+            return;
+        }
+
+        const word = bit >> 5;
+        const mask = 1 << (bit & 31);
+        const old = stateWords[word];
+        stateWords[word] = down ? old | mask : old & ~mask;
+        if (stateWords[word] != old) {
+            sendState();
+        }
+    }
+
+    /**
+     * Send the complete input state as HID:STATE:<hex bitmask>
+     */
+    //% block="send input state"
+    //% weight=65
+    export function sendState(): void
+    {
+        let hex = "";
+        for (let word = stateWords.length - 1; word >= 0; word--) {
+            for (let shift = 28; shift >= 0; shift -= 4) {
+                const digit = (stateWords[word] >>> shift) & 0xF;
+                // Leading zeros are left out
+                if (digit || hex.length) {
+                    hex += HEX_DIGITS.charAt(digit);
+                }
+            }
+        }
+        sendCommand("HID:STATE:" + (hex || "0"));
+    }
+
+    /**
+     * Keep sending the input state at a fixed rate, so traffic stays
+     * predictable however busy the controls are
+     * @param interval milliseconds between states
+     */
+    //% block="send input state every %interval ms"
+    //% interval.defl=100
+    //% weight=60
+    export function sendStateEvery(interval: number): void
+    {
+        control.inBackground(function () {
+            while (true) {
+                sendState();
+                basic.pause(interval);
+            }
+        });
     }
 
     /**
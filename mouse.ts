@@ -5,6 +5,77 @@
 namespace serialMouse
 {
 
+    // Velocity mode: the bridge keeps moving the cursor between updates,
+    // so unchanged velocities are only re-sent as a keep-alive
+    const VELOCITY_KEEPALIVE_MS = 500;
+    let lastVelocityX = 0;
+    let lastVelocityY = 0;
+    let lastVelocityTime = 0;
+
+    // Accelerometer streaming: raw samples go to the bridge, which filters
+    // them into a cursor velocity (see SENSOR_PROFILES in the Python bridge)
+    let tiltStreaming = false;
+
+    // Binary frames carry whole pixels, so the fraction of each move is
+    // carried into the next one, like the bridge does with decimal text moves
+    let moveRemainderX = 0;
+    let moveRemainderY = 0;
+
+    // Binary protocol opcodes, see BINARY_OPCODES in the Python bridge
+    const OP_MOVE = 0x10;
+    const OP_VEL = 0x11;
+    const OP_CLICK = 0x12;
+    const OP_SCROLL = 0x14;
+    const OP_HOLD = 0x15;
+    const OP_RELEASE = 0x16;
+    const BUTTON_IDS = ["LEFT", "RIGHT", "MIDDLE", "ALL"];
+
+    /**
+     * Send a mouse command with numeric arguments as a text line or a binary frame
+     */
+    function sendValueCommand(action: string, opcode: number, args: number[]): void
+    {
+        if (serialHID.isBinaryMode()) {
+            serialHID.sendFrame(opcode, args, null);
+        } else {
+            serialHID.sendCommand("HID:MOUSE:" + action + ":" + args.join(","));
+        }
+    }
+
+    /**
+     * Send a mouse move as a text line or a binary frame
+     */
+    function sendMove(x: number, y: number): void
+    {
+        if (!serialHID.isBinaryMode()) {
+            sendValueCommand("MOVE", OP_MOVE, [x, y]);
+            return;
+        }
+
+        x += moveRemainderX;
+        y += moveRemainderY;
+        const dx = Math.round(x);
+        const dy = Math.round(y);
+        moveRemainderX = x - dx;
+        moveRemainderY = y - dy;
+        if (dx != 0 || dy != 0) {
+            serialHID.sendFrame(OP_MOVE, [dx, dy], null);
+        }
+    }
+
+    /**
+     * Send a mouse button command as a text line or a binary frame
+     */
+    function sendButtonCommand(action: string, opcode: number, button: string): void
+    {
+        const id = BUTTON_IDS.indexOf(button.toUpperCase());
+        if (id >= 0 && serialHID.isBinaryMode()) {
+            serialHID.sendFrame(opcode, [id], null);
+        } else {
+            serialHID.sendCommand("HID:MOUSE:" + action + ":" + button);
+        }
+    }
+
     /**
      * Move the mouse cursor
      * @param x horizontal movement (negative = left, positive = right)
@@ -16,7 +87,7 @@ namespace serialMouse
     //% y.min=-127 y.max=127
     export function moveMouse(x: number, y: number): void
     {
-        serialHID.sendCommand("HID:MOUSE:MOVE:" + x + "," + y);
+        sendMove(x, y);
     }
 
     /**
@@ -30,7 +101,93 @@ namespace serialMouse
     //% y.min=-127 y.max=127
     export function move(x: number, y: number): void
     {
-        serialHID.sendCommand("HID:MOUSE:MOVE:" + x + "," + y);
+        sendMove(x, y);
+    }
+
+    /**
+     * Keep the mouse cursor moving at a steady speed
+     * The computer moves the cursor smoothly until the velocity changes, so
+     * this can be called in a loop: only changes and a keep-alive are sent
+     * @param vx horizontal speed in pixels per second (negative = left, positive = right)
+     * @param vy vertical speed in pixels per second (negative = up, positive = down)
+     */
+    //% block="set mouse velocity x %vx y %vy"
+    //% weight=95
+    //% vx.min=-1000 vx.max=1000
+    //% vy.min=-1000 vy.max=1000
+    export function setVelocity(vx: number, vy: number): void
+    {
+        vx = Math.round(vx);
+        vy = Math.round(vy);
+        const now = input.runningTime();
+
+        if (vx == lastVelocityX && vy == lastVelocityY) {
+            // A stopped cursor needs no keep-alive
+            if ((vx == 0 && vy == 0) || now - lastVelocityTime < VELOCITY_KEEPALIVE_MS) {
+                return;
+            }
+        }
+
+        lastVelocityX = vx;
+        lastVelocityY = vy;
+        lastVelocityTime = now;
+        sendValueCommand("VEL", OP_VEL, [vx, vy]);
+    }
+
+    /**
+     * Stream the accelerometer to the computer and steer the cursor by tilting
+     * The bridge calibrates on the first samples, so hold the micro:bit still
+     * in its rest position when this starts
+     * @param interval milliseconds between samples
+     * @param perMessage samples sent together in one message
+     */
+    //% block="stream tilt mouse every %interval ms, %perMessage samples per message"
+    //% weight=94
+    //% interval.min=5 interval.max=200 interval.defl=20
+    //% perMessage.min=1 perMessage.max=10 perMessage.defl=4
+    export function streamTilt(interval: number = 20, perMessage: number = 4): void
+    {
+        if (tiltStreaming) {
+            return;
+        }
+        tiltStreaming = true;
+        control.inBackground(function () {
+            let samples: string[] = [];
+            while (tiltStreaming) {
+                samples.push(input.acceleration(Dimension.X) + "," +
+                    input.acceleration(Dimension.Y) + "," +
+                    input.acceleration(Dimension.Z));
+                if (samples.length >= perMessage) {
+                    serialHID.sendCommand("HID:SENSOR:ACC:" + samples.join(";"));
+                    samples = [];
+                }
+                basic.pause(interval);
+            }
+        });
+    }
+
+    /**
+     * Stop streaming the accelerometer; the cursor stops shortly after
+     */
+    //% block="stop tilt mouse"
+    //% weight=93
+    export function stopTilt(): void
+    {
+        tiltStreaming = false;
+        // The bridge set the speed itself, so this is sent even if unchanged here
+        lastVelocityX = 0;
+        lastVelocityY = 0;
+        sendValueCommand("VEL", OP_VEL, [0, 0]);
+    }
+
+    /**
+     * Make the current tilt the new rest position
+     */
+    //% block="recalibrate tilt mouse"
+    //% weight=92
+    export function recalibrateTilt(): void
+    {
+        serialHID.sendCommand("HID:SENSOR:CAL");
     }
 
     /**
@@ -41,7 +198,7 @@ namespace serialMouse
     //% weight=90
     export function clickMouse(button: string): void
     {
-        serialHID.sendCommand("HID:MOUSE:CLICK:" + button);
+        sendButtonCommand("CLICK", OP_CLICK, button);
     }
 
     /**
@@ -52,7 +209,7 @@ namespace serialMouse
     //% weight=80
     export function pressMouse(button: string): void
     {
-        serialHID.sendCommand("HID:MOUSE:PRESS:" + button);
+        sendButtonCommand("PRESS", OP_HOLD, button);
     }
 
     /**
@@ -63,7 +220,7 @@ namespace serialMouse
     //% weight=70
     export function releaseMouse(button: string): void
     {
-        serialHID.sendCommand("HID:MOUSE:RELEASE:" + button);
+        sendButtonCommand("RELEASE", OP_RELEASE, button);
     }
 
     /**
@@ -75,7 +232,7 @@ namespace serialMouse
     //% amount.min=-10 amount.max=10
     export function scrollMouse(amount: number): void
     {
-        serialHID.sendCommand("HID:MOUSE:SCROLL:" + amount);
+        sendValueCommand("SCROLL", OP_SCROLL, [amount]);
     }
 
     /**
@@ -127,7 +284,7 @@ namespace serialMouse
     //% weight=10
     export function releaseAll(): void
     {
-        serialHID.sendCommand("HID:MOUSE:RELEASE:ALL");
+        sendButtonCommand("RELEASE", OP_RELEASE, "ALL");
     }
 
     export enum MouseButton
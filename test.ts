@@ -26,6 +26,8 @@ serialKeyboard.pressKey("i");  // Should type "i"
 // Test mouse functions  
 serialMouse.moveMouse(10, 10);
 serialMouse.move(10, 10); // Alternative API
+serialMouse.setVelocity(100, -50);
+serialMouse.setVelocity(0, 0);
 serialMouse.leftClick();
 serialMouse.scrollMouse(1);
 